@@ -1,9 +1,29 @@
 from flask import Flask
+from .config import (
+        TRANSCRIPTION_ENGINE, WHISPER_MODEL, WHISPER_DEVICE, WHISPER_PRECISION, WHISPER_PRELOAD, WHISPER_WARMUP,
+        ARTIFACT_X_SENDFILE,
+    )
 
 def create_app():
     app = Flask(__name__)
 
+    # Behind nginx/Apache the web server sends artifact files itself (X-Sendfile); otherwise the
+    # WSGI server's file wrapper is used, which gunicorn turns into sendfile()
+    app.config["USE_X_SENDFILE"] = ARTIFACT_X_SENDFILE
+
+    # Loading here, before a pre-fork server (e.g. gunicorn --preload) forks, lets workers
+    # share the weights copy-on-write; otherwise the model is loaded on first transcription
+    if WHISPER_PRELOAD:
+        from .utils import preload_transcription_backend
+        preload_transcription_backend(
+            TRANSCRIPTION_ENGINE, WHISPER_MODEL, WHISPER_DEVICE, WHISPER_PRECISION, warm_up=WHISPER_WARMUP
+        )
+
     from .routes import main
     app.register_blueprint(main)
 
+    # Resume jobs that were queued or running when the previous process stopped
+    from .jobs import get_job_queue
+    get_job_queue()
+
     return app
@@ -0,0 +1,411 @@
+"""
+Batch mode: summarize many videos from the command line, overlapping the pipeline stages across
+videos. Each stage has its own bounded pool of worker threads and the stages are connected by
+bounded queues, so FFmpeg extracts video N+1 while Whisper transcribes video N and the GPT calls
+for video N-1 are in flight, and a slow stage holds back the ones before it instead of letting
+decoded audio pile up in memory.
+
+    extract:    hash, decode the audio track into memory, extract keyframes (FFmpeg)
+    transcribe: Whisper / faster-whisper
+    describe:   scene descriptions and summary (OpenAI)
+
+Videos that use the windowed mode (see pipeline.use_windowed_mode) are never decoded whole: the
+transcribe stage runs them through the windowed pipeline, which transcribes, describes and
+summarizes them one window at a time.
+
+Results are appended to a JSONL file, one line per video, as videos finish; stage results go
+through the same result cache as the server, so videos processed before are not paid for twice.
+At the end the runner prints each stage's utilization: busy time over workers x wall time.
+
+Usage (from the backend directory):
+    python -m app.batch videos/ other.mp4 --output results.jsonl [--manifest videos.jsonl] \
+        [--extract-workers 1 --transcribe-workers 1 --describe-workers 2 --queue-size 2] [--resume]
+
+A manifest has one video per line: either a path, or a JSON object with video_path and optional
+language, length and style overriding the command-line options.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from app.config import WHISPER_MODEL
+from app.cache import RESULT_CACHE, HASH_CHUNK_SIZE
+from app.metrics import METRICS, stage_timer
+from app.pipeline import (
+        stage_cache_keys, summary_cache_key, scenes_complete, load_audio, transcribe_samples, plan_frames,
+        select_keyframes, describe_scenes, summarize_results, use_windowed_mode, run_windowed_pipeline,
+    )
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm")
+
+_DONE = object()
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Compute the SHA-256 of a file, reading it in chunks.
+    :param path: Path to the file.
+    :param chunk_size: Number of bytes read per iteration.
+    :return: Hex digest, the same content hash /upload computes.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def collect_videos(paths, manifest=None):
+    """
+    Build the list of videos to process.
+    :param paths: Video files or directories, searched recursively for video files.
+    :param manifest: Optional manifest file with one path or JSON object (video_path and options) per line.
+    :return: List of dictionaries with video_path and the options given for that video.
+    """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                videos.extend(
+                    {"video_path": os.path.join(root, name)}
+                    for name in sorted(files) if name.lower().endswith(VIDEO_EXTENSIONS)
+                )
+        else:
+            videos.append({"video_path": path})
+
+    if manifest:
+        manifest_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as manifest_file:
+            for line in manifest_file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                entry = json.loads(line) if line.startswith("{") else {"video_path": line}
+                entry["video_path"] = os.path.join(manifest_dir, entry["video_path"])
+                videos.append(entry)
+    return videos
+
+def completed_videos(output_path):
+    """
+    Read the videos an earlier run already wrote successfully to the output file.
+    :param output_path: JSONL output file.
+    :return: Set of video paths without an error.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path) as output_file:
+        for line in output_file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Line cut short by an interrupted run
+            if not record.get("error"):
+                done.add(record["video"])
+    return done
+
+class StageStats:
+    """
+    Busy time, processed items and failures of one batch stage, shared by its workers.
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.busy_seconds = 0.0
+        self.items = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed, failed):
+        with self._lock:
+            self.busy_seconds += elapsed
+            self.items += 1
+            self.errors += int(failed)
+
+    def utilization(self, wall_seconds):
+        return self.busy_seconds / (self.workers * wall_seconds) if wall_seconds > 0 else 0.0
+
+def _start_stage(stats, work, inbox, outbox, downstream_workers):
+    """
+    Start the worker threads of a stage. Jobs that failed in an earlier stage are passed along
+    untouched; when the last worker sees the end of the input it tells every downstream worker.
+    :return: List of started threads.
+    """
+    remaining = [stats.workers]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            job = inbox.get()
+            if job is _DONE:
+                break
+            if job["error"] is None:
+                start = time.perf_counter()
+                try:
+                    work(job)
+                except Exception as e:
+                    print(f"Error in {stats.name} stage for {job['video']}: {e}")
+                    job["error"] = f"{stats.name}: {e}"
+                    job.pop("samples", None)
+                stats.record(time.perf_counter() - start, job["error"] is not None)
+            outbox.put(job)
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(downstream_workers):
+                outbox.put(_DONE)
+
+    threads = [
+        threading.Thread(target=worker, name=f"batch-{stats.name}-{i}", daemon=True) for i in range(stats.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+class BatchRunner:
+    """
+    Runs the extract, transcribe and describe stages over many videos with a bounded pool and a
+    bounded input queue per stage.
+    """
+
+    def __init__(self, work_dir, api_key=None, whisper_model=None, extract_workers=1, transcribe_workers=1,
+                 describe_workers=2, queue_size=2):
+        """
+        :param work_dir: Directory for the extracted keyframes, one subdirectory per video.
+        :param api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable.
+        :param whisper_model: Whisper model size; defaults to the WHISPER_MODEL setting.
+        :param extract_workers: Videos decoded at once (FFmpeg).
+        :param transcribe_workers: Videos transcribed at once. With the whisper engine a model
+            transcribes one audio at a time, so use TRANSCRIPTION_WORKERS or faster-whisper to go wider.
+        :param describe_workers: Videos whose scene and summary requests run at once.
+        :param queue_size: Videos waiting between two stages; bounds the decoded audio held in memory.
+        """
+        self.work_dir = work_dir
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.whisper_model = whisper_model or WHISPER_MODEL
+        self.queue_size = queue_size
+        self.stats = [
+            StageStats("extract", extract_workers),
+            StageStats("transcribe", transcribe_workers),
+            StageStats("describe", describe_workers),
+        ]
+
+    def _extract(self, job):
+        content_hash = hash_file(job["video"])
+        job["content_hash"] = content_hash
+        job["cache_keys"] = stage_cache_keys(
+            content_hash, job["language"], job["length"], job["style"], self.whisper_model
+        )
+        job["transcription"] = RESULT_CACHE.get_result(job["cache_keys"]["transcription"])
+        job["scene_descriptions"] = RESULT_CACHE.get_result(job["cache_keys"]["scenes"])
+
+        if (job["transcription"] is None or job["scene_descriptions"] is None) and use_windowed_mode(job["video"]):
+            job["windowed"] = True
+            return
+        if job["transcription"] is None:
+            job["samples"] = load_audio(job["video"], job["timings"])
+        if job["scene_descriptions"] is None:
+            keyframes_dir = os.path.join(self.work_dir, content_hash, "keyframes")
+            with stage_timer("keyframes", job["timings"]):
+                job["scene_plan"] = plan_frames(job["video"], keyframes_dir)
+                job["keyframes"] = select_keyframes(job["video"], keyframes_dir, job["scene_plan"])
+            METRICS.increment("frames_total", len(job["keyframes"]), stage="keyframes")
+            if not job["keyframes"]:
+                raise RuntimeError("No keyframes extracted, cannot proceed with scene analysis.")
+
+    def _transcribe(self, job):
+        if job.get("windowed"):
+            self._run_windowed(job)
+            return
+        if job["transcription"] is not None:
+            return
+        job["transcription"] = transcribe_samples(
+            job.pop("samples"), job["language"], self.whisper_model, job["timings"]
+        )
+        RESULT_CACHE.put_result(
+            job["cache_keys"]["transcription"], job["content_hash"], "transcription", job["transcription"]
+        )
+
+    def _run_windowed(self, job):
+        # The windowed pipeline keeps its checkpoints and frames next to the video, so it gets a link in the work directory
+        video_dir = os.path.join(self.work_dir, job["content_hash"])
+        os.makedirs(video_dir, exist_ok=True)
+        video_path = os.path.join(video_dir, "video" + os.path.splitext(job["video"])[1])
+        if not os.path.lexists(video_path):
+            os.symlink(os.path.abspath(job["video"]), video_path)
+        result = run_windowed_pipeline(
+            video_path, None, job["length"], job["style"], job["language"], job["content_hash"], self.api_key,
+            whisper_model=self.whisper_model, timings=job["timings"],
+        )
+        job["transcription"] = {"text": result["transcription"], "language": result["language"]}
+        job["scene_descriptions"] = result["scene_descriptions"]
+        job["summary"] = {"summary": result["summary"], "tags": result["tags"]}
+        job["usage"].update(result["usage"])
+
+    def _describe(self, job):
+        if job.get("windowed"):
+            return
+        keys = job["cache_keys"]
+        if job["scene_descriptions"] is None:
+            scene_descriptions = describe_scenes(
+                job["keyframes"], self.api_key, job["language"], job["timings"],
+                plan=job["scene_plan"], usage=job["usage"],
+            )
+            if scenes_complete(scene_descriptions):
+                RESULT_CACHE.put_result(keys["scenes"], job["content_hash"], "scenes", scene_descriptions)
+            job["scene_descriptions"] = scene_descriptions
+
+        summary_key = summary_cache_key(
+            job["content_hash"], job["language"], job["length"], job["style"],
+            job["transcription"], job["scene_descriptions"],
+        )
+        summary_result = RESULT_CACHE.get_result(summary_key)
+        if summary_result is None:
+            summary_result = summarize_results(
+                job["transcription"], job["scene_descriptions"], job["length"], job["style"], self.api_key,
+                job["timings"], job["usage"],
+            )
+            # A summary of partial scene descriptions is not cached
+            if scenes_complete(job["scene_descriptions"]):
+                RESULT_CACHE.put_result(summary_key, job["content_hash"], "summary", summary_result)
+        job["summary"] = summary_result
+
+    def run(self, videos, output_file, length="concise", style="formal", language=None):
+        """
+        Process videos through the stages and write one JSON line per video as it finishes.
+        :param videos: Video entries from collect_videos.
+        :param output_file: Writable text file receiving the JSONL records.
+        :param length: Default summary length.
+        :param style: Default summary style.
+        :param language: Default language override, or None to use the detected language.
+        :return: Report with wall time, throughput and per-stage utilization.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stats] + [queue.Queue()]
+        work = [self._extract, self._transcribe, self._describe]
+        downstream = [stats.workers for stats in self.stats[1:]] + [1]
+
+        start = time.perf_counter()
+        threads = []
+        for i, stats in enumerate(self.stats):
+            threads += _start_stage(stats, work[i], queues[i], queues[i + 1], downstream[i])
+
+        def feed():
+            for entry in videos:
+                queues[0].put({
+                    "video": entry["video_path"],
+                    "language": entry.get("language", language),
+                    "length": entry.get("length", length),
+                    "style": entry.get("style", style),
+                    "timings": {},
+                    "usage": {},
+                    "error": None,
+                })
+            for _ in range(self.stats[0].workers):
+                queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="batch-feed", daemon=True)
+        feeder.start()
+
+        processed = failed = 0
+        while True:
+            job = queues[-1].get()
+            if job is _DONE:
+                break
+            processed += 1
+            failed += job["error"] is not None
+            output_file.write(json.dumps(self._record(job)) + "\n")
+            output_file.flush()
+        wall = time.perf_counter() - start
+
+        return {
+            "videos": processed,
+            "failed": failed,
+            "wall_seconds": wall,
+            "throughput_videos_per_minute": processed * 60 / wall if wall > 0 else 0.0,
+            "stages": {
+                stats.name: {
+                    "workers": stats.workers,
+                    "items": stats.items,
+                    "errors": stats.errors,
+                    "busy_seconds": round(stats.busy_seconds, 3),
+                    "utilization": round(stats.utilization(wall), 3),
+                }
+                for stats in self.stats
+            },
+        }
+
+    def _record(self, job):
+        if job.get("content_hash") and (job.get("keyframes") or job.get("windowed")):
+            # Frames are only needed until the scenes are described
+            shutil.rmtree(os.path.join(self.work_dir, job["content_hash"]), ignore_errors=True)
+        transcription = job.get("transcription") or {}
+        summary = job.get("summary") or {}
+        return {
+            "video": job["video"],
+            "content_hash": job.get("content_hash"),
+            "transcription": transcription.get("text"),
+            "language": transcription.get("language"),
+            "scene_descriptions": job.get("scene_descriptions"),
+            "summary": summary.get("summary"),
+            "tags": summary.get("tags"),
+            "error": job["error"],
+            "timings": job["timings"],
+            "usage": job["usage"],
+        }
+
+def print_report(report):
+    print(f"{report['videos']} videos ({report['failed']} failed) in {report['wall_seconds']:.1f} s, "
+          f"{report['throughput_videos_per_minute']:.2f} videos/min")
+    print(f"{'stage':>12} {'workers':>8} {'items':>6} {'errors':>7} {'busy (s)':>9} {'utilization':>12}")
+    for name, stage in report["stages"].items():
+        print(f"{name:>12} {stage['workers']:>8} {stage['items']:>6} {stage['errors']:>7} "
+              f"{stage['busy_seconds']:>9.1f} {stage['utilization']:>12.1%}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="Video files or directories")
+    parser.add_argument("--manifest", help="File with one video path or JSON object per line")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file the results are appended to")
+    parser.add_argument("--resume", action="store_true", help="Skip videos already written without error")
+    parser.add_argument("--work-dir", help="Directory for extracted keyframes (default: a temporary directory)")
+    parser.add_argument("--length", default="concise")
+    parser.add_argument("--style", default="formal")
+    parser.add_argument("--language", help="Language override (default: the detected language)")
+    parser.add_argument("--whisper-model", default=WHISPER_MODEL)
+    parser.add_argument("--extract-workers", type=int, default=1)
+    parser.add_argument("--transcribe-workers", type=int, default=1)
+    parser.add_argument("--describe-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=2, help="Videos waiting between two stages")
+    args = parser.parse_args(argv)
+
+    videos = collect_videos(args.paths, args.manifest)
+    if args.resume:
+        done = completed_videos(args.output)
+        videos = [video for video in videos if video["video_path"] not in done]
+    if not videos:
+        print("No videos to process")
+        return 0
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="video_batch_")
+    try:
+        runner = BatchRunner(
+            work_dir, whisper_model=args.whisper_model, extract_workers=args.extract_workers,
+            transcribe_workers=args.transcribe_workers, describe_workers=args.describe_workers,
+            queue_size=args.queue_size,
+        )
+        with open(args.output, "a") as output_file:
+            report = runner.run(videos, output_file, args.length, args.style, args.language)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print_report(report)
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
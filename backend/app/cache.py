@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from app.db import connect
+from app.config import (
+        UPLOAD_BASE_DIR, RESULT_CACHE_MAX_BYTES, UPLOAD_DIR_TTL_SECONDS, LLM_CACHE_ENABLED, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS,
+    )
+from app.utils.openai_client import set_response_cache
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def save_and_hash_upload(file_storage, destination_path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Stream an uploaded file to disk while computing its SHA-256 digest.
+    :param file_storage: Werkzeug FileStorage (or any object with a readable `stream`).
+    :param destination_path: Path where the upload is written.
+    :param chunk_size: Number of bytes read per iteration.
+    :return: Tuple of (hex content hash, size in bytes).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(destination_path, "wb") as output_file:
+        while True:
+            chunk = file_storage.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            output_file.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def make_cache_key(stage, content_hash, **params):
+    """
+    Build a cache key from a content hash and the parameters that affect a stage's output.
+    :param stage: Pipeline stage name (e.g., transcription, scenes, summary).
+    :param content_hash: SHA-256 of the uploaded video.
+    :param params: Parameters that change the stage result (language, model, ...).
+    :return: Hex digest usable as a cache key.
+    """
+    payload = json.dumps({"stage": stage, "content_hash": content_hash, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _last_modified(path):
+    # Newest modification time of a directory tree: the pipeline writes checkpoints and keyframes while it works
+    latest = os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+            except OSError:
+                pass
+    return latest
+
+class ResultCache:
+    """
+    Content-addressed cache for upload artifacts (audio, keyframes) and stage results
+    (transcription, scene descriptions, summary), backed by SQLite with size-based LRU eviction.
+    Eviction only drops index rows: an evicted upload directory may still be read by a running job,
+    so directories are deleted by purge_stale_uploads once they are out of the index and untouched.
+    """
+
+    def __init__(self, cache_dir, max_bytes, upload_dir=None, upload_ttl_seconds=UPLOAD_DIR_TTL_SECONDS):
+        """
+        :param cache_dir: Directory holding the SQLite index.
+        :param max_bytes: Upper bound for artifact directories plus stored results.
+        :param upload_dir: Directory holding the upload directories swept by purge_stale_uploads.
+        :param upload_ttl_seconds: Seconds an upload directory missing from the index is kept after its last write.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.upload_dir = upload_dir
+        self.upload_ttl_seconds = upload_ttl_seconds
+        self.db_path = os.path.join(cache_dir, "index.sqlite3")
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with connect(self.db_path) as conn:
+                # Artifacts used to be keyed by content hash alone; those rows do not say how they were extracted
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(artifacts)")}
+                if columns and "key" not in columns:
+                    conn.execute("DROP TABLE artifacts")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS artifacts ("
+                    "key TEXT PRIMARY KEY, content_hash TEXT NOT NULL, video_dir TEXT NOT NULL, "
+                    "payload TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key TEXT PRIMARY KEY, content_hash TEXT NOT NULL, stage TEXT NOT NULL, "
+                    "payload TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS artifacts_video_dir ON artifacts (video_dir)")
+            self._initialized = True
+        return connect(self.db_path)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get_artifacts(self, content_hash, **params):
+        """
+        Look up the extraction artifacts stored for a video.
+        :param content_hash: SHA-256 of the uploaded video.
+        :param params: Extraction settings the artifacts must have been produced with (write_audio, ...).
+        :return: Stored upload payload, or None on a miss.
+        """
+        key = make_cache_key("artifacts", content_hash, **params)
+        with self._connect() as conn:
+            row = conn.execute("SELECT video_dir, payload FROM artifacts WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.isdir(row[0]):
+                if row is not None:
+                    conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                self._count("misses")
+                return None
+            conn.execute("UPDATE artifacts SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._count("hits")
+        return json.loads(row[1])
+
+    def put_artifacts(self, content_hash, video_dir, payload, **params):
+        """
+        Record the extraction artifacts of a freshly processed upload.
+        :param content_hash: SHA-256 of the uploaded video.
+        :param video_dir: Upload directory owning the artifacts.
+        :param payload: JSON-serializable upload response (paths to video, audio, keyframes).
+        :param params: Extraction settings the artifacts were produced with, as passed to get_artifacts.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, content_hash, video_dir, payload, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (make_cache_key("artifacts", content_hash, **params), content_hash, video_dir, json.dumps(payload),
+                 _directory_size(video_dir), time.time()),
+            )
+        self._evict()
+
+    def find_content_hash(self, video_dir):
+        """
+        Resolve the content hash of an upload directory.
+        :param video_dir: Upload directory returned by /upload.
+        :return: Content hash, or None if the directory is not cached.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content_hash FROM artifacts WHERE video_dir = ?", (video_dir,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_result(self, key):
+        """
+        Look up a stored stage result.
+        :param key: Key built with make_cache_key.
+        :return: Stored value, or None on a miss.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(row[0])
+
+    def put_result(self, key, content_hash, stage, value):
+        """
+        Store a stage result.
+        :param key: Key built with make_cache_key.
+        :param content_hash: SHA-256 of the video the result belongs to.
+        :param stage: Pipeline stage name.
+        :param value: JSON-serializable stage output.
+        """
+        payload = json.dumps(value)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, content_hash, stage, payload, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, content_hash, stage, payload, len(payload), time.time()),
+            )
+        self._evict()
+
+    def _evict(self):
+        with self._connect() as conn:
+            total = conn.execute(
+                "SELECT (SELECT COALESCE(SUM(size), 0) FROM artifacts) + (SELECT COALESCE(SUM(size), 0) FROM results)"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            entries = conn.execute(
+                "SELECT 'artifacts', key, video_dir, size, last_access FROM artifacts "
+                "UNION ALL SELECT 'results', key, NULL, size, last_access FROM results "
+                "ORDER BY last_access"
+            ).fetchall()
+            for table, key, video_dir, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if table == "artifacts":
+                    conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                else:
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                total -= size
+                self._count("evictions")
+
+    def purge_stale_uploads(self):
+        """
+        Delete upload directories that are no longer in the artifact index and have not been written
+        or touched within the TTL, so a directory a job is still using is never removed under it.
+        :return: Number of deleted directories.
+        """
+        if self.upload_dir is None or not os.path.isdir(self.upload_dir):
+            return 0
+        with self._connect() as conn:
+            indexed = {row[0] for row in conn.execute("SELECT video_dir FROM artifacts")}
+        cutoff = time.time() - self.upload_ttl_seconds
+        purged = 0
+        for name in os.listdir(self.upload_dir):
+            video_dir = os.path.join(self.upload_dir, name)
+            # Dot directories hold the indexes and partial uploads
+            if name.startswith(".") or video_dir in indexed or not os.path.isdir(video_dir):
+                continue
+            try:
+                stale = _last_modified(video_dir) < cutoff
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(video_dir, ignore_errors=True)
+                purged += 1
+        return purged
+
+    def stats(self):
+        """
+        Report hit/miss counters and current cache usage.
+        :return: Dictionary with counters, entry counts and byte usage.
+        """
+        with self._connect() as conn:
+            artifacts, artifact_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts"
+            ).fetchone()
+            results, result_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_ratio": counters["hits"] / lookups if lookups else 0.0,
+            "artifact_entries": artifacts,
+            "result_entries": results,
+            "bytes": artifact_bytes + result_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of chat completion responses keyed by a hash of model, prompt and schema
+    (see openai_client.response_cache_key). Entries expire after a TTL and the least recently
+    used ones are evicted once the stored responses exceed max_bytes.
+    """
+
+    def __init__(self, db_path, max_bytes, ttl_seconds):
+        """
+        :param db_path: Path of the SQLite database, created on the first stored response.
+        :param max_bytes: Upper bound for the stored responses.
+        :param ttl_seconds: Lifetime of an entry in seconds (0 keeps entries until evicted).
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            with connect(self.db_path) as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, model TEXT, payload TEXT NOT NULL, size INTEGER NOT NULL, "
+                    "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._initialized = True
+        return connect(self.db_path)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        """
+        Look up a stored response.
+        :param key: Request hash from response_cache_key.
+        :return: Serialized response, or None on a miss or an expired entry.
+        """
+        # Lookups never create the database, so processes that only miss leave nothing on disk
+        if not self._initialized and not os.path.exists(self.db_path):
+            self._count("misses")
+            return None
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._expired(row[1], now):
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("expired")
+                row = None
+            elif row is not None:
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return row[0]
+
+    def put(self, key, model, value):
+        """
+        Store a response.
+        :param key: Request hash from response_cache_key.
+        :param model: Model that produced the response.
+        :param value: Serialized response.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, payload, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, value, len(value), now, now),
+            )
+        self._evict(now)
+
+    def _evict(self, now):
+        with self._connect() as conn:
+            if self.ttl_seconds > 0:
+                conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                self._count("evictions")
+
+    def stats(self):
+        """
+        Report hit/miss counters and current usage.
+        :return: Dictionary with counters, entry count and byte usage.
+        """
+        entries, size = 0, 0
+        if self._initialized or os.path.exists(self.db_path):
+            with self._connect() as conn:
+                entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_ratio": counters["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+RESULT_CACHE = ResultCache(
+    os.path.join(UPLOAD_BASE_DIR, ".cache"), max_bytes=RESULT_CACHE_MAX_BYTES, upload_dir=UPLOAD_BASE_DIR
+)
+
+LLM_CACHE = LLMResponseCache(
+    os.path.join(UPLOAD_BASE_DIR, ".cache", "llm.sqlite3"), max_bytes=LLM_CACHE_MAX_BYTES, ttl_seconds=LLM_CACHE_TTL_SECONDS
+)
+if LLM_CACHE_ENABLED:
+    set_response_cache(LLM_CACHE)
@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+CHECKPOINT_DIR_NAME = "checkpoints"
+
+def input_digest(value):
+    """
+    Fingerprint a JSON-serializable stage input or output.
+    :param value: Value to fingerprint.
+    :return: Hex SHA-256 of its canonical JSON form.
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+def file_fingerprint(path):
+    """
+    Cheap fingerprint of a file for when its content hash is unknown.
+    :param path: Path to the file.
+    :return: Dictionary with size and modification time.
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def stage_manifest(stage, inputs, params):
+    """
+    Describe what a stage's output depends on.
+    :param stage: Stage name.
+    :param inputs: Mapping of input name to fingerprint (content hash, upstream output digest, ...).
+    :param params: Parameters that change the stage's output.
+    :return: Manifest dictionary, compared as a whole when a checkpoint is loaded.
+    """
+    return {"stage": stage, "inputs": inputs, "params": params}
+
+class CheckpointStore:
+    """
+    Stage outputs checkpointed as JSON files in an upload's directory, each stored with the
+    manifest of inputs and parameters it was produced from. A stage whose manifest matches its
+    checkpoint is skipped, so a retry after a failure only repeats the stage that failed and the
+    ones downstream of it.
+    """
+
+    def __init__(self, video_dir):
+        """
+        :param video_dir: Upload directory; checkpoints go to its checkpoints/ subdirectory.
+        """
+        self.checkpoint_dir = os.path.join(video_dir, CHECKPOINT_DIR_NAME)
+
+    def path(self, stage):
+        return os.path.join(self.checkpoint_dir, f"{stage}.json")
+
+    def load(self, stage, manifest):
+        """
+        Read a stage's checkpoint.
+        :param stage: Stage name.
+        :param manifest: Manifest the stage would run with now.
+        :return: The checkpointed output, or None if there is none or it was produced from other inputs.
+        """
+        try:
+            with open(self.path(stage)) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get("manifest") != manifest:
+            return None
+        return checkpoint["output"]
+
+    def save(self, stage, manifest, output):
+        """
+        Write a stage's checkpoint. The file is replaced atomically, so an interrupted write never
+        leaves a checkpoint that looks valid.
+        :param stage: Stage name.
+        :param manifest: Manifest the output was produced from.
+        :param output: JSON-serializable stage output.
+        """
+        try:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=self.checkpoint_dir, suffix=".tmp", delete=False) as tmp_file:
+                json.dump({"manifest": manifest, "output": output, "created_at": time.time()}, tmp_file)
+            os.replace(tmp_file.name, self.path(stage))
+        except OSError as e:
+            print(f"Error writing {stage} checkpoint: {e}")
@@ -0,0 +1,54 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_BASE_DIR = os.path.abspath(os.path.join(os.getcwd(), "uploads"))
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 ** 2))
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", 24 * 3600))
+ARTIFACT_CACHE_MAX_AGE = int(os.getenv("ARTIFACT_CACHE_MAX_AGE", 365 * 24 * 3600))
+ARTIFACT_X_SENDFILE = os.getenv("ARTIFACT_X_SENDFILE", "false").lower() in ("1", "true", "yes")
+WRITE_AUDIO_FILE = os.getenv("WRITE_AUDIO_FILE", "false").lower() in ("1", "true", "yes")
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_ALLOWED_MODELS = os.getenv("WHISPER_ALLOWED_MODELS", "tiny,base,small").split(",")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "auto")
+TRANSCRIPTION_ENGINE = os.getenv("TRANSCRIPTION_ENGINE", "whisper")
+WHISPER_PRECISION = os.getenv("WHISPER_PRECISION", "int8" if TRANSCRIPTION_ENGINE == "faster-whisper" else "fp32")
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD", "false").lower() in ("1", "true", "yes")
+WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "false").lower() in ("1", "true", "yes")
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", 1))
+TRANSCRIPTION_CHUNK_SECONDS = int(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", 120))
+KEYFRAME_STRATEGY = os.getenv("KEYFRAME_STRATEGY", "iframes")
+FRAME_MAX_EDGE = int(os.getenv("FRAME_MAX_EDGE", 1024))
+FRAME_JPEG_QUALITY = int(os.getenv("FRAME_JPEG_QUALITY", 85))
+VISION_BATCH_SIZE = int(os.getenv("VISION_BATCH_SIZE", 4))
+VISION_MAX_CONCURRENCY = int(os.getenv("VISION_MAX_CONCURRENCY", 4))
+FRAME_DEDUP_METHOD = os.getenv("FRAME_DEDUP_METHOD", "dhash")
+FRAME_DEDUP_THRESHOLD = int(os.getenv("FRAME_DEDUP_THRESHOLD", 6))
+SCENE_TOKEN_BUDGET = int(os.getenv("SCENE_TOKEN_BUDGET", 40000))
+SCENE_LATENCY_BUDGET_SECONDS = float(os.getenv("SCENE_LATENCY_BUDGET_SECONDS", 60))
+SCENE_MIN_FRAMES = int(os.getenv("SCENE_MIN_FRAMES", 4))
+SCENE_MAX_FRAMES = int(os.getenv("SCENE_MAX_FRAMES", 60))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 4000))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", 4))
+LONG_VIDEO_MODE = os.getenv("LONG_VIDEO_MODE", "auto")
+LONG_VIDEO_MIN_SECONDS = int(os.getenv("LONG_VIDEO_MIN_SECONDS", 3600))
+LONG_VIDEO_WINDOW_SECONDS = int(os.getenv("LONG_VIDEO_WINDOW_SECONDS", 600))
+LONG_VIDEO_FRAMES_PER_WINDOW = int(os.getenv("LONG_VIDEO_FRAMES_PER_WINDOW", 3))
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 10 * 1024 ** 3))
+# Upload directories no longer in the result cache are deleted once untouched for this long
+UPLOAD_DIR_TTL_SECONDS = int(os.getenv("UPLOAD_DIR_TTL_SECONDS", 24 * 3600))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+SEARCH_DB_PATH = os.getenv("SEARCH_DB_PATH", os.path.join(UPLOAD_BASE_DIR, ".search", "index.sqlite3"))
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(UPLOAD_BASE_DIR, ".jobs", "jobs.sqlite3"))
+JOB_WORKER_BACKEND = os.getenv("JOB_WORKER_BACKEND", "thread")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", 16))
+# Seconds a worker process holds its jobs without a heartbeat before another process may take them over
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 60))
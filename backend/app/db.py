@@ -0,0 +1,18 @@
+import sqlite3
+from contextlib import contextmanager
+
+@contextmanager
+def connect(db_path, timeout=30):
+    """
+    Open a SQLite connection for one transaction. sqlite3's own context manager only commits or
+    rolls back and leaves the connection open until it is garbage collected, so this one also closes it.
+    :param db_path: Path to the SQLite database file.
+    :param timeout: Seconds to wait for another connection's lock.
+    :return: Context manager yielding the connection, committed on success and rolled back on error.
+    """
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from app.db import connect
+from app.config import JOB_DB_PATH, JOB_WORKER_BACKEND, JOB_WORKERS, JOB_QUEUE_LIMIT, JOB_LEASE_SECONDS
+from app.pipeline import STAGES, run_summary_pipeline
+
+DEFAULT_RETRY_AFTER = 30
+DEFAULT_LEASE_SECONDS = 60
+
+class QueueFullError(Exception):
+    """Raised when the job queue has reached its depth limit."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+class JobStore:
+    """
+    SQLite-backed persistence for summary jobs, shared by the API process and the workers.
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path: Path to the SQLite database file.
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, stages TEXT NOT NULL, "
+                "result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+                "owner TEXT, lease_expires REAL)"
+            )
+            # Databases created before leases existed get the owner columns added in place
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("lease_expires", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def create(self, params, owner=None, lease_seconds=DEFAULT_LEASE_SECONDS, max_active=None):
+        """
+        Persist a new queued job. The depth check and the insert run in one write transaction, so
+        concurrent submissions from several processes cannot overshoot max_active.
+        :param params: Keyword arguments for run_summary_pipeline.
+        :param owner: Id of the queue that will run the job, or None to leave it for any queue to reclaim.
+        :param lease_seconds: How long the owner holds the job without renewing its lease.
+        :param max_active: Maximum queued plus running jobs, or None for no limit.
+        :return: The new job id, or None if max_active jobs are already active.
+        """
+        job_id = uuid.uuid4().hex
+        stages = {stage: "pending" for stage in STAGES}
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if max_active is not None:
+                active = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+                ).fetchone()[0]
+                if active >= max_active:
+                    return None
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, stages, created_at, owner, lease_expires) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(params), json.dumps(stages), now, owner,
+                 now + lease_seconds if owner is not None else None),
+            )
+        return job_id
+
+    def get(self, job_id):
+        """
+        Load a job.
+        :param job_id: Job id.
+        :return: Job dictionary, or None if it does not exist.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, params, stages, result, error, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "params": json.loads(row[2]),
+            "stages": json.loads(row[3]),
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "error": row[5],
+            "created_at": row[6],
+            "started_at": row[7],
+            "finished_at": row[8],
+        }
+
+    def claim(self, job_id, owner=None):
+        """
+        Atomically move a queued job held by owner to running.
+        :param job_id: Job id.
+        :param owner: Queue id the job was assigned to (None for unowned jobs).
+        :return: True if this caller now runs the job.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? "
+                "WHERE id = ? AND status = 'queued' AND owner IS ?",
+                (time.time(), job_id, owner),
+            )
+        return cursor.rowcount == 1
+
+    def set_stage(self, job_id, stage, status):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row[0])
+            stages[stage] = status
+            conn.execute("UPDATE jobs SET stages = ? WHERE id = ?", (json.dumps(stages), job_id))
+
+    def finish(self, job_id, result):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+
+    def average_duration(self, limit=20):
+        """
+        Average run time of the most recently finished jobs.
+        :param limit: Number of recent jobs to consider.
+        :return: Seconds, or None when no job has finished yet.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT AVG(finished_at - started_at) FROM (SELECT finished_at, started_at FROM jobs "
+                "WHERE status = 'done' AND started_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?)",
+                (limit,),
+            ).fetchone()
+        return row[0]
+
+    def renew_leases(self, owner, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Extend the lease of every unfinished job held by owner.
+        :param owner: Queue id.
+        :param lease_seconds: New lease length from now.
+        :return: Number of renewed jobs.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time() + lease_seconds, owner),
+            )
+        return cursor.rowcount
+
+    def reclaim_expired(self, owner, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Take over unfinished jobs whose owner stopped renewing its lease (a crashed or stopped
+        process) and jobs that never had an owner. Jobs held by live queues are left alone.
+        :param owner: Queue id taking the jobs over.
+        :param lease_seconds: Lease length granted to owner.
+        :return: Ids of the reclaimed jobs, oldest first.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL, lease_expires = NULL "
+                "WHERE status IN ('queued', 'running') AND (lease_expires IS NULL OR lease_expires < ?)",
+                (now,),
+            )
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND owner IS NULL ORDER BY created_at"
+            ).fetchall()
+            conn.execute(
+                "UPDATE jobs SET owner = ?, lease_expires = ? WHERE status = 'queued' AND owner IS NULL",
+                (owner, now + lease_seconds),
+            )
+        return [row[0] for row in rows]
+
+def run_job(db_path, job_id, owner=None):
+    """
+    Execute a queued job and record its progress. Module-level so process workers can import it.
+    :param db_path: Path to the job database.
+    :param job_id: Job id.
+    :param owner: Queue id the job was assigned to; the job is skipped if another queue took it over.
+    """
+    store = JobStore(db_path)
+    if not store.claim(job_id, owner):
+        return
+
+    job = store.get(job_id)
+    try:
+        result = run_summary_pipeline(
+            **job["params"],
+            on_stage=lambda stage, status: store.set_stage(job_id, stage, status),
+        )
+        store.finish(job_id, result)
+    except Exception as e:
+        print(f"Error running job {job_id}: {e}")
+        store.fail(job_id, str(e))
+
+class JobQueue:
+    """
+    Bounded worker pool that runs summary jobs persisted in a JobStore.
+    """
+
+    def __init__(self, store, backend="thread", max_workers=2, max_pending=16, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        :param store: JobStore used to persist job state.
+        :param backend: Worker backend, "thread" or "process".
+        :param max_workers: Number of concurrent jobs.
+        :param max_pending: Maximum queued plus running jobs before submissions are rejected.
+        :param lease_seconds: How long jobs stay assigned to this queue without a heartbeat; the
+            heartbeat renews them every third of that.
+        """
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown job worker backend: {backend}")
+        self.store = store
+        self.backend = backend
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.lease_seconds = lease_seconds
+        # Unique per queue, so workers of several processes (or hosts) sharing the database tell their jobs apart
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = None
+        self._heartbeat = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.backend == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            return self._executor
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None and not self._stopped.is_set():
+                self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        # Keep this queue's leases alive and pick up the jobs of queues that stopped renewing theirs
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                self.store.renew_leases(self.owner, self.lease_seconds)
+                self.recover()
+            except sqlite3.Error as e:
+                print(f"Error renewing job leases: {e}")
+
+    def retry_after(self):
+        """
+        Estimate how long a rejected client should wait before resubmitting.
+        :return: Seconds to advertise in the Retry-After header.
+        """
+        average = self.store.average_duration()
+        if average is None:
+            return DEFAULT_RETRY_AFTER
+        return max(1, int(average * self.max_pending / self.max_workers))
+
+    def submit(self, params):
+        """
+        Persist and enqueue a job.
+        :param params: Keyword arguments for run_summary_pipeline.
+        :return: The new job id.
+        :raises QueueFullError: If the queue depth limit has been reached.
+        """
+        job_id = self.store.create(params, self.owner, self.lease_seconds, max_active=self.max_pending)
+        if job_id is None:
+            raise QueueFullError(self.retry_after())
+        self._start_heartbeat()
+        self._get_executor().submit(run_job, self.store.db_path, job_id, self.owner)
+        return job_id
+
+    def recover(self):
+        """
+        Resubmit jobs whose owner's lease expired, e.g. jobs left by a process that crashed or was
+        restarted. Jobs of live queues in other processes are not touched.
+        :return: Number of resubmitted jobs.
+        """
+        job_ids = self.store.reclaim_expired(self.owner, self.lease_seconds)
+        for job_id in job_ids:
+            self._get_executor().submit(run_job, self.store.db_path, job_id, self.owner)
+        self._start_heartbeat()
+        return len(job_ids)
+
+    def shutdown(self, wait=True):
+        self._stopped.set()
+        # Joined outside the lock: a beat in progress may need it to resubmit jobs
+        heartbeat, self._heartbeat = self._heartbeat, None
+        if heartbeat is not None:
+            heartbeat.join()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """
+    Return the process-wide job queue, taking over jobs with expired leases on first use.
+    :return: Configured JobQueue instance.
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                JobStore(JOB_DB_PATH),
+                backend=JOB_WORKER_BACKEND,
+                max_workers=JOB_WORKERS,
+                max_pending=JOB_QUEUE_LIMIT,
+                lease_seconds=JOB_LEASE_SECONDS,
+            )
+            _job_queue.recover()
+        return _job_queue
@@ -0,0 +1,145 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+class Histogram:
+    """
+    Cumulative latency histogram with fixed bucket upper bounds, in the Prometheus layout.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+class MetricsRegistry:
+    """
+    In-process counters and stage latency histograms. Recording is a dictionary update under a
+    lock, so instrumenting the hot path costs well under a microsecond per observation.
+    Metrics from process workers (JOB_WORKER_BACKEND=process) stay in those processes.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def observe(self, name, value, **labels):
+        """
+        Record a value in a histogram.
+        :param name: Metric name.
+        :param value: Observed value (seconds for latencies).
+        :param labels: Label names and values.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Add to a counter.
+        :param name: Metric name.
+        :param amount: Amount to add.
+        :param labels: Label names and values.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, name, **labels):
+        with self._lock:
+            return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def render(self, gauges=None):
+        """
+        Render every metric in the Prometheus text exposition format.
+        :param gauges: Optional mapping of extra metric name to value, e.g. from other components.
+        :return: Exposition text.
+        """
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.counts), h.sum, h.count) for key, h in histograms]
+
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+
+        for (name, labels), counts, total, count in histograms:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+
+@contextmanager
+def stage_timer(stage, timings=None):
+    """
+    Time a pipeline stage into the stage_duration_seconds histogram, counting failures in
+    stage_errors_total.
+    :param stage: Stage name (e.g., upload_write, audio_decode, transcription, scenes, summary).
+    :param timings: Optional dictionary receiving the stage duration in seconds, for per-response breakdowns.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        METRICS.increment("stage_errors_total", stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        METRICS.observe("stage_duration_seconds", elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
+
+def record_token_usage(stage, usage):
+    """
+    Add the token usage collected by openai_client.track_usage to the per-stage token counters.
+    :param stage: Stage that made the requests.
+    :param usage: Dictionary with requests, prompt_tokens, completion_tokens and estimated_tokens.
+    """
+    METRICS.increment("openai_requests_total", usage["requests"], stage=stage)
+    METRICS.increment("openai_prompt_tokens_total", usage["prompt_tokens"], stage=stage)
+    METRICS.increment("openai_completion_tokens_total", usage["completion_tokens"], stage=stage)
+    METRICS.increment("openai_estimated_tokens_total", usage["estimated_tokens"], stage=stage)
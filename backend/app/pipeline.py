@@ -0,0 +1,693 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from app.config import (
+        TRANSCRIPTION_ENGINE, WHISPER_MODEL, WHISPER_DEVICE, WHISPER_PRECISION, TRANSCRIPTION_WORKERS, TRANSCRIPTION_CHUNK_SECONDS,
+        KEYFRAME_STRATEGY, FRAME_MAX_EDGE, FRAME_JPEG_QUALITY, FRAME_DEDUP_METHOD, FRAME_DEDUP_THRESHOLD,
+        VISION_BATCH_SIZE, VISION_MAX_CONCURRENCY, SUMMARY_CHUNK_TOKENS, SUMMARY_MAX_CONCURRENCY,
+        SCENE_TOKEN_BUDGET, SCENE_LATENCY_BUDGET_SECONDS, SCENE_MIN_FRAMES, SCENE_MAX_FRAMES,
+        LONG_VIDEO_MODE, LONG_VIDEO_MIN_SECONDS, LONG_VIDEO_WINDOW_SECONDS, LONG_VIDEO_FRAMES_PER_WINDOW,
+    )
+from app.cache import RESULT_CACHE, make_cache_key
+from app.metrics import METRICS, stage_timer, record_token_usage
+from app.search import SEARCH_INDEX
+from app.checkpoints import CheckpointStore, stage_manifest, input_digest, file_fingerprint
+from app.utils import (
+        extract_keyframes, list_keyframes, decode_audio, iter_audio_windows,
+        transcribe_audio,
+        analyze_scenes_with_gpt_vision,
+        generate_summary_with_gpt,
+        deduplicate_frames, remap_scene_frames,
+        VISION_MODEL, SUMMARY_MODEL,
+    )
+from app.utils.video_utils import AUDIO_SAMPLE_RATE, extract_frames_at, probe_duration
+from app.utils.openai_client import track_usage
+from app.utils.budget_utils import plan_scene_budget
+
+STAGES = ["transcription", "keyframes", "scenes", "summary"]
+SCENE_DENSITY_SAMPLE_FRAMES = 240
+
+def _notify(on_stage, stage, status):
+    if on_stage is not None:
+        on_stage(stage, status)
+
+def _emit(on_event, event, data):
+    if on_event is not None:
+        on_event(event, data)
+
+def _add_usage(usage, stage, tracked):
+    if usage is not None:
+        totals = usage.setdefault(stage, dict.fromkeys(tracked, 0))
+        for name, value in tracked.items():
+            totals[name] += value
+
+def stage_parameters(language, length, style, whisper_model):
+    """
+    Collect the parameters that change each stage's output.
+    :param language: Language override, or None.
+    :param length: Summary length.
+    :param style: Summary style.
+    :param whisper_model: Whisper model size.
+    :return: Dictionary of stage name to parameters.
+    """
+    budget = {
+        "token_budget": SCENE_TOKEN_BUDGET, "latency_budget": SCENE_LATENCY_BUDGET_SECONDS,
+        "min_frames": SCENE_MIN_FRAMES, "max_frames": SCENE_MAX_FRAMES,
+    }
+    return {
+        "transcription": {
+            "language": language, "engine": TRANSCRIPTION_ENGINE, "model": whisper_model, "precision": WHISPER_PRECISION,
+            "chunk_seconds": TRANSCRIPTION_CHUNK_SECONDS if TRANSCRIPTION_WORKERS > 1 else None,
+        },
+        "keyframes": {
+            "strategy": KEYFRAME_STRATEGY, "max_edge": FRAME_MAX_EDGE, "jpeg_quality": FRAME_JPEG_QUALITY, **budget,
+        },
+        "scenes": {
+            "language": language, "model": VISION_MODEL,
+            "max_edge": FRAME_MAX_EDGE, "dedup_method": FRAME_DEDUP_METHOD, "dedup_threshold": FRAME_DEDUP_THRESHOLD,
+            **budget,
+        },
+        "summary": {
+            "language": language, "length": length, "style": style, "model": SUMMARY_MODEL,
+            "chunk_tokens": SUMMARY_CHUNK_TOKENS,
+        },
+    }
+
+def stage_cache_keys(content_hash, language, length, style, whisper_model):
+    """
+    Build the result cache keys of the transcription and scenes stages for a video. Both only depend
+    on the video and the parameters; the summary's key also depends on its inputs (see summary_cache_key).
+    :param content_hash: SHA-256 of the video.
+    :param language: Language override, or None.
+    :param length: Summary length.
+    :param style: Summary style.
+    :param whisper_model: Whisper model size.
+    :return: Dictionary of stage name to cache key.
+    """
+    params = stage_parameters(language, length, style, whisper_model)
+    return {
+        stage: make_cache_key(stage, content_hash, **params[stage]) for stage in ("transcription", "scenes")
+    }
+
+def summary_inputs(transcription, scene_descriptions):
+    """
+    :return: Digests of the summary's inputs, as used in its checkpoint manifest and cache key.
+    """
+    return {"transcription": input_digest(transcription), "scenes": input_digest(scene_descriptions)}
+
+def summary_cache_key(content_hash, language, length, style, transcription, scene_descriptions):
+    """
+    Build the result cache key of a summary, so a summary made from other (e.g. incomplete) scene
+    descriptions or another transcription is never returned for these.
+    :param content_hash: SHA-256 of the video.
+    :param language: Language override, or None.
+    :param length: Summary length.
+    :param style: Summary style.
+    :param transcription: Transcription the summary is made from.
+    :param scene_descriptions: Scene descriptions the summary is made from.
+    :return: Cache key.
+    """
+    params = stage_parameters(language, length, style, None)["summary"]
+    return make_cache_key("summary", content_hash, **params, inputs=summary_inputs(transcription, scene_descriptions))
+
+def scenes_complete(scene_descriptions):
+    """
+    :return: Whether every frame was described; partial results are neither checkpointed nor cached.
+    """
+    return "error" not in scene_descriptions and not scene_descriptions.get("failed_frames")
+
+def _index_for_search(video_path, content_hash, transcription, scene_descriptions, summary_result):
+    # Search is best effort: a failure here must not fail the summary, the next run indexes the video again
+    try:
+        SEARCH_INDEX.index_video(
+            os.path.basename(os.path.dirname(video_path)), video_path, content_hash,
+            transcription, scene_descriptions, summary_result,
+        )
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error indexing video for search: {e}")
+
+def load_audio(audio_source, timings=None):
+    """
+    Decode the audio track of a video (or an audio file) into memory.
+    :param audio_source: Path to the video or audio file.
+    :param timings: Optional dictionary receiving the stage duration.
+    :return: 16 kHz mono float32 samples.
+    """
+    try:
+        with stage_timer("audio_decode", timings):
+            samples = decode_audio(audio_source)
+    except Exception as e:
+        raise RuntimeError(f"Whisper transcription error: {str(e)}")
+    METRICS.increment("bytes_processed_total", samples.nbytes, stage="audio_decode")
+    return samples
+
+def transcribe_samples(samples, language, whisper_model, timings=None, on_segments=None):
+    """
+    Transcribe decoded audio with the configured engine, model and worker settings.
+    :param samples: 16 kHz mono float32 samples from load_audio.
+    :param language: Language override, or None to detect it.
+    :param whisper_model: Whisper model size.
+    :param timings: Optional dictionary receiving the stage duration.
+    :param on_segments: Optional callback receiving segments as they are transcribed.
+    :return: Transcription text, language and segments.
+    """
+    METRICS.increment("audio_seconds_total", len(samples) / AUDIO_SAMPLE_RATE, stage="transcription")
+    with stage_timer("transcription", timings):
+        return transcribe_audio(
+            samples, language, workers=TRANSCRIPTION_WORKERS, chunk_seconds=TRANSCRIPTION_CHUNK_SECONDS,
+            model_name=whisper_model, device=WHISPER_DEVICE, precision=WHISPER_PRECISION,
+            engine=TRANSCRIPTION_ENGINE, on_segments=on_segments,
+        )
+
+def plan_frames(video_path, keyframes_dir):
+    """
+    Plan the scene analysis of a video within the configured token and latency budgets (see
+    budget_utils.plan_scene_budget). The scene-change density is estimated from the frames already
+    extracted into keyframes_dir, near-duplicates counting as one scene; /upload keeps every I-frame
+    there, so a static talk and a fast-cut trailer of the same length get different frame counts.
+    :param video_path: Path to the video.
+    :param keyframes_dir: Directory of previously extracted keyframes, possibly missing.
+    :return: Plan with num_frames, max_edge, detail, tokens_per_frame, batch_size, estimated_tokens and
+        estimated_seconds, plus the duration and scene_changes_per_minute it was made from (None if unknown).
+    """
+    try:
+        duration = probe_duration(video_path)
+    except (RuntimeError, OSError):
+        duration = None
+    scene_changes_per_minute = None
+    frames = list_keyframes(keyframes_dir, SCENE_DENSITY_SAMPLE_FRAMES)
+    if duration and frames:
+        dedup = deduplicate_frames(frames, threshold=FRAME_DEDUP_THRESHOLD, method=FRAME_DEDUP_METHOD)
+        scene_changes_per_minute = round(len(dedup["kept"]) * 60 / duration, 2)
+    plan = plan_scene_budget(
+        duration, scene_changes_per_minute, token_budget=SCENE_TOKEN_BUDGET, latency_budget=SCENE_LATENCY_BUDGET_SECONDS,
+        batch_size=VISION_BATCH_SIZE, max_concurrency=VISION_MAX_CONCURRENCY,
+        min_frames=SCENE_MIN_FRAMES, max_frames=SCENE_MAX_FRAMES,
+    )
+    return {**plan, "duration": duration, "scene_changes_per_minute": scene_changes_per_minute}
+
+def select_keyframes(video_path, keyframes_dir, plan):
+    """
+    Pick the planned number of keyframes, reusing the frames /upload extracted when there are enough.
+    :param video_path: Path to the video.
+    :param keyframes_dir: Keyframes directory of the upload.
+    :param plan: Plan from plan_frames.
+    :return: Keyframe paths, in video order.
+    """
+    keyframes = list_keyframes(keyframes_dir, plan["num_frames"])
+    # The I-frame strategy keeps every I-frame, the others only the frames they sampled
+    if keyframes and (KEYFRAME_STRATEGY == "iframes" or len(keyframes) >= plan["num_frames"]):
+        return keyframes
+    return extract_keyframes(
+        video_path, keyframes_dir, num_frames=plan["num_frames"],
+        strategy=KEYFRAME_STRATEGY, max_edge=FRAME_MAX_EDGE, jpeg_quality=FRAME_JPEG_QUALITY,
+    )
+
+def describe_scenes(keyframes, api_key, language, timings=None, on_batch=None, plan=None, usage=None):
+    """
+    Describe keyframes with the vision model, sending only one frame per near-duplicate group.
+    :param keyframes: Keyframe paths, in video order.
+    :param api_key: OpenAI API key.
+    :param language: Language for the descriptions.
+    :param timings: Optional dictionary receiving the stage duration.
+    :param on_batch: Optional callback receiving each described batch, in the original keyframe numbering.
+    :param plan: Optional plan from plan_frames setting the resolution, detail, output tokens and batch size.
+    :param usage: Optional dictionary receiving the stage's token usage under "scenes".
+    :return: Scene descriptions numbered like keyframes.
+    """
+    options = {"max_edge": FRAME_MAX_EDGE, "batch_size": VISION_BATCH_SIZE}
+    if plan is not None:
+        options = {
+            "max_edge": plan["max_edge"], "batch_size": plan["batch_size"],
+            "detail": plan["detail"], "tokens_per_frame": plan["tokens_per_frame"],
+        }
+    with stage_timer("scenes", timings), track_usage() as tracked:
+        dedup = deduplicate_frames(
+            keyframes, threshold=FRAME_DEDUP_THRESHOLD, method=FRAME_DEDUP_METHOD,
+            detail=options.get("detail", "high"), max_edge=options["max_edge"],
+        )
+        unique_keyframes = [keyframes[i] for i in dedup["kept"]]
+        scene_descriptions = analyze_scenes_with_gpt_vision(
+            unique_keyframes, api_key, language, jpeg_quality=FRAME_JPEG_QUALITY,
+            max_concurrency=VISION_MAX_CONCURRENCY, **options,
+            on_batch=None if on_batch is None else (
+                lambda frames: on_batch(remap_scene_frames({"frames": frames}, keyframes, dedup))
+            ),
+        )
+    record_token_usage("scenes", tracked)
+    _add_usage(usage, "scenes", tracked)
+    METRICS.increment("frames_total", len(unique_keyframes), stage="scenes")
+    if "payload" in scene_descriptions:
+        METRICS.increment("bytes_processed_total", scene_descriptions["payload"]["bytes_after"], stage="scenes")
+    return remap_scene_frames(scene_descriptions, keyframes, dedup)
+
+def summarize_results(transcription, scene_descriptions, length, style, api_key, timings=None, usage=None,
+                      plan=None):
+    """
+    Generate the summary and tags from a transcription and scene descriptions. Scenes with a
+    timestamp (from the windowed pipeline) go into the timeline next to the speech, so the
+    map-reduce summary chunks them like the transcript instead of sending them all in every prompt.
+    :param usage: Optional dictionary receiving the stage's token usage under "summary".
+    :param plan: Optional dictionary receiving the summary token plan (input_tokens and max_tokens).
+    :return: Dictionary with summary and tags.
+    """
+    frames = scene_descriptions.get("frames", [])
+    if frames and all("pts" in frame for frame in frames):
+        timeline = sorted(
+            transcription.get("segments", []) + [
+                {"start": frame["pts"], "end": frame["pts"], "text": f"[Scene] {frame['description']}"}
+                for frame in frames
+            ],
+            key=lambda part: part["start"],
+        )
+        transcription = {**transcription, "text": " ".join(part["text"] for part in timeline), "segments": timeline}
+        scene_descriptions = {**scene_descriptions, "frames": []}
+    with stage_timer("summary", timings), track_usage() as tracked:
+        summary, tags = generate_summary_with_gpt(
+            transcription=transcription["text"],
+            language=transcription["language"],
+            scene_descriptions=scene_descriptions,
+            length=length,
+            style=style,
+            api_key=api_key,
+            segments=transcription.get("segments"),
+            chunk_tokens=SUMMARY_CHUNK_TOKENS,
+            max_concurrency=SUMMARY_MAX_CONCURRENCY,
+            token_plan=plan,
+        )
+    record_token_usage("summary", tracked)
+    _add_usage(usage, "summary", tracked)
+    return {"summary": summary, "tags": tags}
+
+def combine_plans(plans):
+    """
+    Add up the scene plans of the windows of a long video.
+    :param plans: Plans of the windows whose scenes were described.
+    :return: Plan with the summed frames, duration and estimates, the per-frame settings shared by
+        the windows and the number of windows, or None when plans is empty.
+    """
+    if not plans:
+        return None
+    return {
+        **plans[0],
+        "num_frames": sum(plan["num_frames"] for plan in plans),
+        "estimated_tokens": sum(plan["estimated_tokens"] for plan in plans),
+        "estimated_seconds": round(sum(plan["estimated_seconds"] for plan in plans), 1),
+        "duration": round(sum(plan["duration"] for plan in plans), 3),
+        "windows": len(plans),
+    }
+
+def plan_window(start, end, duration=None, spent_tokens=0, spent_seconds=0.0,
+                max_frames=LONG_VIDEO_FRAMES_PER_WINDOW):
+    """
+    Plan the scene analysis of one window of a long video. Up to the end of each window the
+    windows may spend the share of the scene token and latency budgets that the time covered is of
+    the whole video, so together they stay within the budgets; a window that cannot pay for a
+    single frame gets none and leaves what it saved to the next one.
+    :param start: Start of the window in seconds.
+    :param end: End of the window in seconds.
+    :param duration: Video duration in seconds, or None when unknown (the budgets are not applied).
+    :param spent_tokens: Estimated tokens of the earlier windows.
+    :param spent_seconds: Estimated seconds of the earlier windows.
+    :param max_frames: Most frames for the window.
+    :return: Plan as from plan_frames, or None when the window gets no frames.
+    """
+    token_budget = latency_budget = None
+    if duration:
+        share = min(1.0, end / duration)
+        if SCENE_TOKEN_BUDGET:
+            token_budget = SCENE_TOKEN_BUDGET * share - spent_tokens
+        if SCENE_LATENCY_BUDGET_SECONDS:
+            latency_budget = SCENE_LATENCY_BUDGET_SECONDS * share - spent_seconds
+    plan = plan_scene_budget(
+        end - start, token_budget=token_budget, latency_budget=latency_budget,
+        batch_size=VISION_BATCH_SIZE, max_concurrency=VISION_MAX_CONCURRENCY, min_frames=1, max_frames=max_frames,
+    )
+    if token_budget is not None and plan["estimated_tokens"] > token_budget:
+        return None
+    if latency_budget is not None and plan["estimated_seconds"] > latency_budget:
+        return None
+    return {**plan, "duration": end - start, "scene_changes_per_minute": None}
+
+def use_windowed_mode(video_path):
+    """
+    Decide whether a video goes through the bounded-memory windowed pipeline (LONG_VIDEO_MODE
+    "always"/"never", or "auto" for videos of at least LONG_VIDEO_MIN_SECONDS).
+    :param video_path: Path to the video.
+    :return: True for the windowed pipeline.
+    """
+    if LONG_VIDEO_MODE in ("always", "never"):
+        return LONG_VIDEO_MODE == "always"
+    try:
+        return probe_duration(video_path) >= LONG_VIDEO_MIN_SECONDS
+    except (RuntimeError, OSError):
+        # Unknown duration (no FFprobe, unreadable container): the regular pipeline decides
+        return False
+
+def run_windowed_pipeline(video_path, audio_path, length="concise", style="formal", language=None,
+                          content_hash=None, api_key=None, on_stage=None, whisper_model=None, on_event=None,
+                          timings=None, window_seconds=LONG_VIDEO_WINDOW_SECONDS,
+                          frames_per_window=LONG_VIDEO_FRAMES_PER_WINDOW):
+    """
+    Bounded-memory pipeline for very long videos: the audio is decoded one window at a time, and
+    each window is transcribed, gets frames sampled by seeking and described, and is released
+    before the next one is decoded. Each window is checkpointed, so a retry resumes after the last
+    finished window. Only the transcript text and scene descriptions accumulate; they are
+    summarized as one timeline through the map-reduce summary, so no prompt grows with the duration.
+    The combined transcription, scenes and summary go into the result cache like run_summary_pipeline's.
+    Takes the same arguments and returns the same payload as run_summary_pipeline.
+    :param window_seconds: Maximum window length in seconds.
+    :param frames_per_window: Most frames sampled evenly within each window; fewer are sampled when
+        the window's share of the scene token and latency budgets does not fit them.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    whisper_model = whisper_model or WHISPER_MODEL
+    video_dir = os.path.dirname(video_path)
+    keyframes_dir = os.path.join(video_dir, "keyframes")
+    params = stage_parameters(language, length, style, whisper_model)
+    checkpoints = CheckpointStore(video_dir)
+    video_input = content_hash or file_fingerprint(video_path)
+    window_params = {
+        "window_seconds": window_seconds, "frames_per_window": frames_per_window,
+        "transcription": params["transcription"], "keyframes": params["keyframes"], "scenes": params["scenes"],
+    }
+
+    texts, segments, frames = [], [], []
+    usage = {}
+    plans = []
+    spent_tokens, spent_seconds = 0, 0.0
+    complete = True
+    summary_plan = {}
+    detected_language = language
+    audio_source = audio_path if audio_path and os.path.exists(audio_path) else video_path
+    try:
+        duration = probe_duration(video_path)
+    except (RuntimeError, OSError):
+        duration = None
+    for stage in ("transcription", "keyframes", "scenes"):
+        _notify(on_stage, stage, "running")
+    for index, (start, samples) in enumerate(iter_audio_windows(audio_source, window_seconds), start=1):
+        end = start + len(samples) / AUDIO_SAMPLE_RATE
+        name = f"window_{index:04d}"
+        manifest = stage_manifest(name, {"video": video_input, "start": round(start, 3)}, window_params)
+        _emit(on_event, "audio", {"duration": end - start, "window": index, "start": start})
+
+        window = checkpoints.load(name, manifest)
+        if window is None:
+            METRICS.increment("bytes_processed_total", samples.nbytes, stage="audio_decode")
+            transcription = transcribe_samples(samples, detected_language, whisper_model, timings)
+            del samples
+            window_segments = [
+                {**segment, "start": segment["start"] + start, "end": segment["end"] + start}
+                for segment in transcription["segments"]
+            ]
+
+            plan = plan_window(start, end, duration, spent_tokens, spent_seconds, frames_per_window)
+            sampled = []
+            if plan:
+                step = (end - start) / plan["num_frames"]
+                timestamps = [round(start + (i + 0.5) * step, 3) for i in range(plan["num_frames"])]
+                with stage_timer("keyframes", timings):
+                    sampled = extract_frames_at(
+                        video_path, os.path.join(keyframes_dir, name), timestamps,
+                        max_edge=FRAME_MAX_EDGE, jpeg_quality=FRAME_JPEG_QUALITY,
+                    )
+                METRICS.increment("frames_total", len(sampled), stage="keyframes")
+            scene_descriptions = {"frames": []}
+            if sampled:
+                scene_descriptions = describe_scenes(
+                    [frame["path"] for frame in sampled], api_key, language, timings, plan=plan, usage=usage,
+                )
+            window = {
+                "text": transcription["text"],
+                "language": transcription["language"],
+                "segments": window_segments,
+                "frames": [
+                    {**frame, "pts": sampled[frame["frame_number"] - 1]["pts"]}
+                    for frame in scene_descriptions.get("frames", [])
+                ],
+                "plan": plan if sampled else None,
+            }
+            # A window with failed frames is redone on the next run
+            if scenes_complete(scene_descriptions):
+                checkpoints.save(name, manifest, window)
+            else:
+                complete = False
+        else:
+            del samples
+
+        if window.get("plan"):
+            plans.append(window["plan"])
+            spent_tokens += window["plan"]["estimated_tokens"]
+            spent_seconds += window["plan"]["estimated_seconds"]
+        # Every later window is transcribed in the language detected in the first one
+        detected_language = detected_language or window["language"]
+        if window["text"]:
+            texts.append(window["text"])
+        segments += window["segments"]
+        frames += [
+            {**frame, "frame_number": len(frames) + i + 1, "replaces": []}
+            for i, frame in enumerate(window["frames"])
+        ]
+        _emit(on_event, "transcript_segments", {"segments": window["segments"]})
+        _emit(on_event, "scene_batch", {"frames": frames[len(frames) - len(window["frames"]):]})
+    for stage in ("transcription", "keyframes", "scenes"):
+        _notify(on_stage, stage, "done")
+
+    transcription = {"text": " ".join(texts), "language": detected_language, "segments": segments}
+    scene_descriptions = {"frames": frames}
+    _emit(on_event, "transcription", {"text": transcription["text"], "language": transcription["language"]})
+
+    # Stored like run_summary_pipeline's stages, so /resummarize and later runs find the long video too
+    cache_keys = stage_cache_keys(content_hash, language, length, style, whisper_model) if content_hash else {}
+    if cache_keys and complete:
+        RESULT_CACHE.put_result(cache_keys["transcription"], content_hash, "transcription", transcription)
+        RESULT_CACHE.put_result(cache_keys["scenes"], content_hash, "scenes", scene_descriptions)
+        cache_keys["summary"] = summary_cache_key(content_hash, language, length, style, transcription, scene_descriptions)
+
+    summary_manifest = stage_manifest("summary", summary_inputs(transcription, scene_descriptions), params["summary"])
+    summary_result = checkpoints.load("summary", summary_manifest)
+    if summary_result is None and "summary" in cache_keys:
+        summary_result = RESULT_CACHE.get_result(cache_keys["summary"])
+    if summary_result is None:
+        _notify(on_stage, "summary", "running")
+        summary_result = summarize_results(
+            transcription, scene_descriptions, length, style, api_key, timings, usage, plan=summary_plan,
+        )
+        # A summary of partial scene descriptions is returned but not kept, the next run redoes both
+        if complete:
+            checkpoints.save("summary", summary_manifest, summary_result)
+            if "summary" in cache_keys:
+                RESULT_CACHE.put_result(cache_keys["summary"], content_hash, "summary", summary_result)
+        _notify(on_stage, "summary", "done")
+    else:
+        _notify(on_stage, "summary", "cached")
+    _index_for_search(video_path, content_hash, transcription, scene_descriptions, summary_result)
+
+    return {
+        "transcription": transcription["text"],
+        "language": transcription["language"],
+        "scene_descriptions": scene_descriptions,
+        "summary": summary_result["summary"],
+        "tags": summary_result["tags"],
+        "scene_plan": combine_plans(plans),
+        "summary_plan": summary_plan or None,
+        "usage": usage,
+    }
+
+def run_summary_pipeline(video_path, audio_path, length="concise", style="formal", language=None,
+                         content_hash=None, api_key=None, on_stage=None, whisper_model=None, on_event=None,
+                         timings=None):
+    """
+    Run transcription, keyframe extraction, scene analysis and summarization for an uploaded video.
+    Each stage's output is checkpointed in the upload directory with the manifest of inputs and
+    parameters it came from, and a stage whose manifest is unchanged is skipped, so a retry after
+    a failure only repeats the failed stage. The finished video is added to the search index.
+    :param video_path: Path to the uploaded video.
+    :param audio_path: Path to the extracted audio, or None to decode the audio from the video.
+    :param length: Summary length (e.g., concise, detailed).
+    :param style: Summary style (e.g., formal, casual, technical).
+    :param language: Language override, or None to use the detected language.
+    :param content_hash: SHA-256 of the video; resolved from the result cache when omitted.
+    :param api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable.
+    :param on_stage: Optional callback called as on_stage(stage, status) with status running/done/cached.
+    :param whisper_model: Whisper model size; defaults to the WHISPER_MODEL setting.
+    :param on_event: Optional callback called as on_event(event, data) with partial results as they are
+        produced: "audio" (decoded duration), "transcript_segments", "transcription", "keyframes" and
+        "scene_batch". It may be called from worker threads.
+    :param timings: Optional dictionary receiving the duration in seconds of every stage that ran.
+    :return: Response payload with transcription, language, scene descriptions, summary and tags, the
+        scene and summary token plans (None when the stage was reused) and the estimated and actual token
+        usage of the stages that called OpenAI.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    whisper_model = whisper_model or WHISPER_MODEL
+    video_dir = os.path.dirname(video_path)
+    keyframes_dir = os.path.join(video_dir, "keyframes")
+    usage = {}
+    plans = []
+    summary_plan = {}
+
+    def frame_plan():
+        # Planning probes the video, so it only happens when keyframes or scenes have to be computed
+        if not plans:
+            plans.append(plan_frames(video_path, keyframes_dir))
+        return plans[0]
+
+    content_hash = content_hash or RESULT_CACHE.find_content_hash(video_dir)
+    if use_windowed_mode(video_path):
+        return run_windowed_pipeline(
+            video_path, audio_path, length, style, language, content_hash, api_key, on_stage, whisper_model,
+            on_event, timings,
+        )
+    cache_keys = stage_cache_keys(content_hash, language, length, style, whisper_model) if content_hash else {}
+    params = stage_parameters(language, length, style, whisper_model)
+    checkpoints = CheckpointStore(video_dir)
+    video_input = content_hash or file_fingerprint(video_path)
+
+    def cached(stage, manifest):
+        # The upload's own checkpoint first, then results stored for identical bytes
+        value = checkpoints.load(stage, manifest)
+        if value is None and stage in cache_keys:
+            value = RESULT_CACHE.get_result(cache_keys[stage])
+            if value is not None:
+                checkpoints.save(stage, manifest, value)
+        if value is not None:
+            _notify(on_stage, stage, "cached")
+        return value
+
+    def store(stage, manifest, value):
+        checkpoints.save(stage, manifest, value)
+        if stage in cache_keys:
+            RESULT_CACHE.put_result(cache_keys[stage], content_hash, stage, value)
+
+    transcription_manifest = stage_manifest("transcription", {"video": video_input}, params["transcription"])
+
+    def run_transcription():
+        _notify(on_stage, "transcription", "running")
+        # Without a stored WAV the audio track is decoded straight from the video into memory
+        audio_source = audio_path if audio_path and os.path.exists(audio_path) else video_path
+        samples = load_audio(audio_source, timings)
+        _emit(on_event, "audio", {"duration": len(samples) / AUDIO_SAMPLE_RATE})
+        result = transcribe_samples(
+            samples, language, whisper_model, timings,
+            on_segments=lambda segments: _emit(on_event, "transcript_segments", {"segments": segments}),
+        )
+        store("transcription", transcription_manifest, result)
+        _notify(on_stage, "transcription", "done")
+        return result
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Transcription runs in the background while keyframes and scenes are processed
+        transcription = cached("transcription", transcription_manifest)
+        transcription_future = executor.submit(run_transcription) if transcription is None else None
+        if transcription is not None:
+            _emit(on_event, "transcription", {"text": transcription["text"], "language": transcription["language"]})
+
+        keyframes_manifest = stage_manifest("keyframes", {"video": video_input}, params["keyframes"])
+        keyframes = checkpoints.load("keyframes", keyframes_manifest)
+        if keyframes is not None and all(os.path.exists(path) for path in keyframes):
+            _notify(on_stage, "keyframes", "cached")
+        else:
+            _notify(on_stage, "keyframes", "running")
+            # Reuse the frames produced by /upload instead of decoding the video again
+            with stage_timer("keyframes", timings):
+                keyframes = select_keyframes(video_path, keyframes_dir, frame_plan())
+            METRICS.increment("frames_total", len(keyframes), stage="keyframes")
+            if not keyframes:
+                raise RuntimeError("No keyframes extracted, cannot proceed with scene analysis.")
+            checkpoints.save("keyframes", keyframes_manifest, keyframes)
+            _notify(on_stage, "keyframes", "done")
+
+        scenes_manifest = stage_manifest(
+            "scenes", {"keyframes": input_digest([[os.path.basename(path), os.path.getsize(path)] for path in keyframes])},
+            params["scenes"],
+        )
+        scene_descriptions = cached("scenes", scenes_manifest)
+        if scene_descriptions is None:
+            _emit(on_event, "keyframes", {"frame_paths": keyframes})
+
+            # Run scene analysis after keyframes are extracted, sending only one frame per near-duplicate group
+            _notify(on_stage, "scenes", "running")
+            scene_descriptions = describe_scenes(
+                keyframes, api_key, language, timings,
+                on_batch=lambda batch: _emit(on_event, "scene_batch", batch), plan=frame_plan(), usage=usage,
+            )
+            # Partial results are not checkpointed, so a retry describes the frames again
+            if scenes_complete(scene_descriptions):
+                store("scenes", scenes_manifest, scene_descriptions)
+            _notify(on_stage, "scenes", "done")
+        else:
+            _emit(on_event, "scene_batch", {"frames": scene_descriptions.get("frames", [])})
+
+        if transcription_future is not None:
+            transcription = transcription_future.result()
+            _emit(on_event, "transcription", {"text": transcription["text"], "language": transcription["language"]})
+
+    summary_manifest = stage_manifest("summary", summary_inputs(transcription, scene_descriptions), params["summary"])
+    if content_hash:
+        cache_keys["summary"] = summary_cache_key(content_hash, language, length, style, transcription, scene_descriptions)
+    summary_result = cached("summary", summary_manifest)
+    if summary_result is None:
+        _notify(on_stage, "summary", "running")
+        summary_result = summarize_results(
+            transcription, scene_descriptions, length, style, api_key, timings, usage, plan=summary_plan,
+        )
+        # A summary of partial scene descriptions is returned but not kept, the next run redoes both
+        if scenes_complete(scene_descriptions):
+            store("summary", summary_manifest, summary_result)
+        _notify(on_stage, "summary", "done")
+    _index_for_search(video_path, content_hash, transcription, scene_descriptions, summary_result)
+
+    return {
+        "transcription": transcription["text"],
+        "language": transcription["language"],
+        "scene_descriptions": scene_descriptions,
+        "summary": summary_result["summary"],
+        "tags": summary_result["tags"],
+        "scene_plan": plans[0] if plans else None,
+        "summary_plan": summary_plan or None,
+        "usage": usage,
+    }
+
+def resummarize(content_hash, length="concise", style="formal", language=None, api_key=None, whisper_model=None):
+    """
+    Regenerate the summary of an already processed video from its stored transcription and scene
+    descriptions, so changing the length or style costs one summary request (none if that request
+    was made before, thanks to the LLM response cache).
+    :param content_hash: SHA-256 of the video, as returned by /upload.
+    :param length: Summary length (e.g., concise, detailed).
+    :param style: Summary style (e.g., formal, casual, technical).
+    :param language: Language override the video was processed with, or None.
+    :param api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable.
+    :param whisper_model: Whisper model size the video was transcribed with; defaults to the WHISPER_MODEL setting.
+    :return: Response payload with transcription, language, scene descriptions, summary, tags, the summary
+        token plan (None when the summary was stored) and token usage.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    usage = {}
+    summary_plan = {}
+    cache_keys = stage_cache_keys(content_hash, language, length, style, whisper_model or WHISPER_MODEL)
+
+    transcription = RESULT_CACHE.get_result(cache_keys["transcription"])
+    scene_descriptions = RESULT_CACHE.get_result(cache_keys["scenes"])
+    if transcription is None or scene_descriptions is None:
+        raise LookupError("No stored transcription and scene descriptions for this video, run /generate_summary first")
+
+    summary_key = summary_cache_key(content_hash, language, length, style, transcription, scene_descriptions)
+    summary_result = RESULT_CACHE.get_result(summary_key)
+    if summary_result is None:
+        summary_result = summarize_results(
+            transcription, scene_descriptions, length, style, api_key, usage=usage, plan=summary_plan,
+        )
+        RESULT_CACHE.put_result(summary_key, content_hash, "summary", summary_result)
+
+    return {
+        "transcription": transcription["text"],
+        "language": transcription["language"],
+        "scene_descriptions": scene_descriptions,
+        "summary": summary_result["summary"],
+        "tags": summary_result["tags"],
+        "summary_plan": summary_plan or None,
+        "usage": usage,
+    }
@@ -1,22 +1,174 @@
 import os
+import json
 import uuid
+import queue
+import shutil
 import asyncio
+import threading
 from os.path import abspath
 from datetime import datetime
-from dotenv import load_dotenv
-from flask import Blueprint, request, jsonify
-from app.utils import (
-        extract_audio, extract_keyframes,
-        transcribe_audio,
-        analyze_scenes_with_gpt_vision,
-        generate_summary_with_gpt,
+from flask import Blueprint, Response, request, jsonify, url_for, send_from_directory, stream_with_context
+from werkzeug.exceptions import NotFound
+from app.utils import extract_media
+from app.config import (
+        UPLOAD_BASE_DIR, UPLOAD_CHUNK_SIZE, WRITE_AUDIO_FILE, KEYFRAME_STRATEGY, FRAME_MAX_EDGE, FRAME_JPEG_QUALITY,
+        WHISPER_ALLOWED_MODELS, ARTIFACT_CACHE_MAX_AGE,
     )
+from app.cache import RESULT_CACHE, LLM_CACHE, save_and_hash_upload
+from app.uploads import UPLOAD_STORE, UploadOffsetError
+from app.metrics import METRICS, stage_timer
+from app.search import SEARCH_INDEX
+from app.utils.openai_client import CLIENT_METRICS
+from app.pipeline import run_summary_pipeline, resummarize
+from app.jobs import get_job_queue, QueueFullError
 
 main = Blueprint("main", __name__)
 
-UPLOAD_BASE_DIR = os.path.abspath(os.path.join(os.getcwd(), "uploads"))
+SSE_KEEPALIVE_SECONDS = 15
 
-load_dotenv()
+def _wants_timings():
+    # Per-response stage timings are opt-in, e.g. POST /generate_summary?timings=1
+    return request.args.get("timings", "").lower() in ("1", "true", "yes")
+
+def _new_upload_dir():
+    RESULT_CACHE.purge_stale_uploads()
+    # Generate a unique subdirectory for this upload
+    unique_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    video_dir = os.path.join(UPLOAD_BASE_DIR, unique_id)
+    os.makedirs(video_dir, exist_ok=True)
+    return unique_id, video_dir
+
+def _video_dir(video_id):
+    # Upload ids are directory names under UPLOAD_BASE_DIR; separators and dot names are rejected
+    if not video_id or video_id.startswith(".") or os.path.basename(video_id) != video_id:
+        return None
+    video_dir = os.path.join(UPLOAD_BASE_DIR, video_id)
+    return video_dir if os.path.isdir(video_dir) else None
+
+def _find_artifact(directory, prefix="", suffix=""):
+    # Name of the first file of a directory with the given prefix and suffix, e.g. the upload's video
+    if not os.path.isdir(directory):
+        return None
+    for name in sorted(os.listdir(directory)):
+        if name.startswith(prefix) and name.endswith(suffix) and os.path.isfile(os.path.join(directory, name)):
+            return name
+    return None
+
+def _artifact_url(path):
+    """
+    URL of the endpoint serving a file of an upload directory.
+    :param path: Path of the video, audio file or keyframe.
+    :return: Relative URL, or None for paths outside the upload directories.
+    """
+    if not path:
+        return None
+    parts = os.path.relpath(os.path.abspath(path), UPLOAD_BASE_DIR).split(os.sep)
+    if parts[0] == os.pardir or len(parts) < 2:
+        return None
+    if parts[1] == "keyframes" and len(parts) > 2:
+        return url_for("main.keyframe_artifact", video_id=parts[0], name="/".join(parts[2:]))
+    if parts[1] == "audio" and len(parts) == 3:
+        return url_for("main.audio_artifact", video_id=parts[0])
+    if len(parts) == 2:
+        return url_for("main.video_artifact", video_id=parts[0])
+    return None
+
+def _with_artifact_urls(upload_result):
+    # Clients fetch artifacts over HTTP by upload id instead of reading server paths
+    video_path = upload_result["video_path"]
+    return {
+        **upload_result,
+        "video_id": os.path.basename(os.path.dirname(video_path)),
+        "video_url": _artifact_url(video_path),
+        "audio_url": _artifact_url(upload_result.get("audio_path")),
+        "keyframe_urls": [_artifact_url(path) for path in upload_result.get("keyframes", [])],
+    }
+
+def _with_frame_urls(result):
+    # Adds frame_url to the frames of a summary payload or a scene_batch event
+    scenes = result.get("scene_descriptions", result)
+    if not isinstance(scenes, dict) or "frames" not in scenes:
+        return result
+    frames = [{**frame, "frame_url": _artifact_url(frame.get("frame_path"))} for frame in scenes["frames"]]
+    if scenes is result:
+        return {**result, "frames": frames}
+    return {**result, "scene_descriptions": {**scenes, "frames": frames}}
+
+def _send_artifact(directory, name):
+    """
+    Send a file with Range, ETag and Last-Modified support and long-lived public caching: an
+    upload's artifacts never change once written. The file goes out through the WSGI file wrapper (sendfile()
+    on servers like gunicorn) or X-Sendfile when USE_X_SENDFILE is set.
+    :param directory: Directory of the file.
+    :param name: File name relative to the directory, or None when there is no such artifact.
+        Names escaping the directory are refused.
+    :return: Flask response.
+    """
+    if name is not None:
+        try:
+            return send_from_directory(directory, name, conditional=True, etag=True, max_age=ARTIFACT_CACHE_MAX_AGE)
+        except NotFound:
+            pass
+    return jsonify({"error": "Artifact not found"}), 404
+
+def _process_upload(unique_id, video_path, content_hash, write_audio, timings):
+    """
+    Extract audio and keyframes from a stored upload, or reuse the artifacts of identical bytes.
+    :param unique_id: Upload directory name.
+    :param video_path: Path of the stored video, inside the upload directory.
+    :param content_hash: SHA-256 of the video.
+    :param write_audio: Whether to write the audio track as a WAV file.
+    :param timings: Optional dictionary receiving stage durations.
+    :return: Flask response tuple.
+    """
+    video_dir = os.path.dirname(video_path)
+    # Artifacts are only reused when they were extracted the way this upload would be
+    extraction = {
+        "write_audio": write_audio, "keyframe_strategy": KEYFRAME_STRATEGY, "max_edge": FRAME_MAX_EDGE,
+        "jpeg_quality": FRAME_JPEG_QUALITY,
+    }
+
+    # Identical bytes were already processed: drop the copy and reuse the stored artifacts
+    cached_upload = RESULT_CACHE.get_artifacts(content_hash, **extraction)
+    if cached_upload is not None:
+        shutil.rmtree(video_dir, ignore_errors=True)
+        response = {**_with_artifact_urls(cached_upload), "content_hash": content_hash, "cached": True}
+        if timings is not None:
+            response["timings"] = timings
+        return jsonify(response), 200
+
+    # Transcription decodes audio from the video in memory, so the WAV is only written on request
+    audio_path = None
+    if write_audio:
+        audio_dir = os.path.join(video_dir, "audio")
+        os.makedirs(audio_dir, exist_ok=True)
+        audio_path = os.path.join(audio_dir, f"{unique_id}_audio.wav")
+    keyframes_dir = os.path.join(video_dir, "keyframes")
+
+    try:
+        # Audio and keyframes come out of a single FFmpeg pass, so they are timed together
+        with stage_timer("extract_media", timings):
+            _, keyframes = extract_media(
+                video_path, audio_path, keyframes_dir,
+                strategy=KEYFRAME_STRATEGY, max_edge=FRAME_MAX_EDGE, jpeg_quality=FRAME_JPEG_QUALITY,
+            )
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+    METRICS.increment("frames_total", len(keyframes), stage="extract_media")
+
+    upload_result = {
+        "message": "Video uploaded, audio extracted, and keyframes generated" if audio_path
+                   else "Video uploaded and keyframes generated",
+        "video_path": video_path,
+        "audio_path": audio_path,
+        "keyframes": keyframes
+    }
+    RESULT_CACHE.put_artifacts(content_hash, video_dir, upload_result, **extraction)
+
+    response = {**_with_artifact_urls(upload_result), "content_hash": content_hash, "cached": False}
+    if timings is not None:
+        response["timings"] = timings
+    return jsonify(response), 200
 
 @main.route("/upload", methods=["POST"])
 def upload_video():
@@ -27,92 +179,317 @@ def upload_video():
     if file.filename == "":
         return jsonify({"error": "No selected file"}), 400
     
-    # Generate a unique subdirectory for this upload
-    unique_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
-    video_dir = os.path.join(UPLOAD_BASE_DIR, unique_id)
-    os.makedirs(video_dir, exist_ok=True)
+    timings = {} if _wants_timings() else None
+    unique_id, video_dir = _new_upload_dir()
 
     # Save uploaded video
     video_filename = f"{unique_id}_{file.filename}"
     video_path = os.path.join(video_dir, video_filename)
-    file.save(video_path)
+    with stage_timer("upload_write", timings):
+        content_hash, size = save_and_hash_upload(file, video_path)
+    METRICS.increment("bytes_processed_total", size, stage="upload_write")
 
-    # Extract audio
-    audio_dir = os.path.join(video_dir, "audio")
-    os.makedirs(audio_dir, exist_ok=True)
-    audio_path = os.path.join(audio_dir, f"{unique_id}_audio.wav")
+    write_audio = request.form.get("write_audio", str(WRITE_AUDIO_FILE)).lower() in ("1", "true", "yes")
+    return _process_upload(unique_id, video_path, content_hash, write_audio, timings)
 
+# Resumable uploads: POST /uploads starts one, PUT /uploads/<id> appends the chunk starting at the
+# Upload-Offset header, GET /uploads/<id> reports the confirmed offset to resume from, and
+# POST /uploads/<id>/complete processes the video like /upload
+@main.route("/uploads", methods=["POST"])
+def create_upload():
+    data = request.get_json() or {}
+    filename = os.path.basename(data.get("filename") or "")
+    size = data.get("size")
+    if not filename:
+        return jsonify({"error": "No file name provided"}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({"error": "size must be a positive number of bytes"}), 400
+
+    upload_id = UPLOAD_STORE.create(filename, size)
+    return jsonify({
+        "upload_id": upload_id,
+        "offset": 0,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "upload_url": url_for("main.upload_status", upload_id=upload_id),
+    }), 201
+
+@main.route("/uploads/<upload_id>", methods=["GET"])
+def upload_status(upload_id):
+    upload = UPLOAD_STORE.get(upload_id)
+    if upload is None:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(upload), 200
+
+@main.route("/uploads/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id):
     try:
-        extract_audio(video_path, audio_path)
-    except RuntimeError as e:
-        return jsonify({"error": str(e)}), 500
+        offset = int(request.headers.get("Upload-Offset", request.args.get("offset", "")))
+    except ValueError:
+        return jsonify({"error": "Upload-Offset header is required"}), 400
 
-    # Extract keyframes directly into the `keyframes` folder in the video's directory
-    keyframes_dir = os.path.join(video_dir, "keyframes")
     try:
-        keyframes = extract_keyframes(video_path, keyframes_dir)
-    except RuntimeError as e:
-        return jsonify({"error": str(e)}), 500
+        with stage_timer("upload_write"):
+            upload = UPLOAD_STORE.write_chunk(upload_id, offset, request.stream)
+    except UploadOffsetError as e:
+        return jsonify({"error": str(e), "offset": e.offset}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    if upload is None:
+        return jsonify({"error": "Upload not found"}), 404
 
-    return jsonify({
-        "message": "Video uploaded, audio extracted, and keyframes generated",
+    METRICS.increment("bytes_processed_total", upload["offset"] - offset, stage="upload_write")
+    return jsonify(upload), 200
+
+@main.route("/uploads/<upload_id>/complete", methods=["POST"])
+def complete_upload(upload_id):
+    upload = UPLOAD_STORE.get(upload_id)
+    if upload is None:
+        return jsonify({"error": "Upload not found"}), 404
+
+    timings = {} if _wants_timings() else None
+    unique_id, video_dir = _new_upload_dir()
+    video_path = os.path.join(video_dir, f"{unique_id}_{upload['filename']}")
+    try:
+        completed = UPLOAD_STORE.complete(upload_id, video_path)
+    except UploadOffsetError as e:
+        shutil.rmtree(video_dir, ignore_errors=True)
+        return jsonify({"error": f"Upload is incomplete, resume at offset {e.offset}", "offset": e.offset}), 409
+    if completed is None:
+        shutil.rmtree(video_dir, ignore_errors=True)
+        return jsonify({"error": "Upload not found"}), 404
+
+    content_hash, _ = completed
+    data = request.get_json(silent=True) or {}
+    write_audio = str(data.get("write_audio", WRITE_AUDIO_FILE)).lower() in ("1", "true", "yes")
+    return _process_upload(unique_id, video_path, content_hash, write_audio, timings)
+
+# Artifacts of a processed upload by upload id (the video_id returned by /upload)
+@main.route("/videos/<video_id>/video", methods=["GET"])
+def video_artifact(video_id):
+    video_dir = _video_dir(video_id)
+    if video_dir is None:
+        return jsonify({"error": "Video not found"}), 404
+    return _send_artifact(video_dir, _find_artifact(video_dir, prefix=f"{video_id}_"))
+
+@main.route("/videos/<video_id>/audio", methods=["GET"])
+def audio_artifact(video_id):
+    video_dir = _video_dir(video_id)
+    if video_dir is None:
+        return jsonify({"error": "Video not found"}), 404
+    audio_dir = os.path.join(video_dir, "audio")
+    return _send_artifact(audio_dir, _find_artifact(audio_dir, suffix=".wav"))
+
+@main.route("/videos/<video_id>/keyframes/<path:name>", methods=["GET"])
+def keyframe_artifact(video_id, name):
+    video_dir = _video_dir(video_id)
+    if video_dir is None:
+        return jsonify({"error": "Video not found"}), 404
+    return _send_artifact(os.path.join(video_dir, "keyframes"), name)
+
+@main.route("/metrics", methods=["GET"])
+def metrics():
+    gauges = {f"openai_client_{name}": value for name, value in CLIENT_METRICS.snapshot().items()}
+    gauges.update({
+        f"result_cache_{name}": value for name, value in RESULT_CACHE.stats().items() if name != "max_bytes"
+    })
+    return METRICS.render(gauges), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@main.route("/search", methods=["GET"])
+def search():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter q"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    hits = SEARCH_INDEX.search(query, limit=limit, video_id=request.args.get("video_id"))
+    hits = [{**hit, "keyframe_url": _artifact_url(hit["keyframe"])} for hit in hits]
+    return jsonify({"query": query, "hits": hits}), 200
+
+@main.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify({**RESULT_CACHE.stats(), "llm_responses": LLM_CACHE.stats()}), 200
+
+def _summary_params(data):
+    """
+    Validate a summary request body.
+    :param data: JSON body sent to /generate_summary or /jobs.
+    :return: Tuple of (pipeline keyword arguments, error message).
+    """
+    data = data or {}
+    audio_path = data.get("audio_path")
+    video_path = data.get("video_path")
+
+    # Clients that do not share the server's filesystem name the upload by its video_id
+    video_dir = None if video_path else _video_dir(data.get("video_id"))
+    if video_dir is not None:
+        video_name = _find_artifact(video_dir, prefix=f"{data['video_id']}_")
+        video_path = video_name and os.path.join(video_dir, video_name)
+        audio_name = _find_artifact(os.path.join(video_dir, "audio"), suffix=".wav")
+        audio_path = audio_path or (audio_name and os.path.join(video_dir, "audio", audio_name))
+
+    # audio_path is optional: without it the audio is decoded from the video
+    if audio_path and not os.path.exists(audio_path):
+        return None, "Audio file not found"
+    if not video_path or not os.path.exists(video_path):
+        return None, "Video file not found"
+    # Touching the upload directory marks it as in use, so purge_stale_uploads keeps it while the pipeline runs
+    upload_dir = os.path.dirname(abspath(video_path))
+    if os.path.dirname(upload_dir) == UPLOAD_BASE_DIR:
+        os.utime(upload_dir)
+    # Cached results are shared by every upload of the same bytes, so the hash comes from the server's own
+    # record of the upload; a client-supplied one could read another video's results
+    content_hash = RESULT_CACHE.find_content_hash(upload_dir)
+    whisper_model = data.get("whisper_model")
+    if whisper_model is not None and whisper_model not in WHISPER_ALLOWED_MODELS:
+        return None, f"Unsupported Whisper model, choose one of: {', '.join(WHISPER_ALLOWED_MODELS)}"
+
+    return {
         "video_path": video_path,
         "audio_path": audio_path,
-        "keyframes": keyframes
-    }), 200
+        "length": data.get("length", "concise"),
+        "style": data.get("style", "formal"),
+        "language": data.get("language"),
+        "content_hash": content_hash,
+        "whisper_model": whisper_model,
+    }, None
 
 @main.route("/generate_summary", methods=["POST"])
 async def generate_summary():
-    data = request.get_json()
-    audio_path = data.get("audio_path")
-    video_path = data.get("video_path")
-    length = data.get("length", "concise")
-    style = data.get("style", "formal")
-    language = data.get("language")
-    api_key = os.getenv("OPENAI_API_KEY")
-    
-    video_dir = os.path.dirname(video_path)
-    keyframes_dir = os.path.join(video_dir, "keyframes")
+    params, error = _summary_params(request.get_json())
+    if error:
+        return jsonify({"error": error}), 400
 
-    if not audio_path or not os.path.exists(audio_path):
-        return jsonify({"error": "Audio file not found"}), 400
-    if not video_path or not os.path.exists(video_path):
-        return jsonify({"error": "Video file not found"}), 400
+    timings = {} if _wants_timings() else None
+    try:
+        result = await asyncio.to_thread(run_summary_pipeline, **params, timings=timings)
+        if timings is not None:
+            result = {**result, "timings": timings}
+        return jsonify(_with_frame_urls(result)), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Same request as /generate_summary, answered as Server-Sent Events: "stage" events and partial results
+# ("audio", "transcript_segments", "transcription", "keyframes", "scene_batch") as they are produced,
+# then "summary" with the /generate_summary payload, or "error"
+@main.route("/generate_summary/stream", methods=["POST"])
+def generate_summary_stream():
+    params, error = _summary_params(request.get_json())
+    if error:
+        return jsonify({"error": error}), 400
+
+    events = queue.Queue()
+
+    def run():
+        try:
+            result = run_summary_pipeline(
+                **params,
+                on_stage=lambda stage, status: events.put(("stage", {"stage": stage, "status": status})),
+                on_event=lambda event, data: events.put((event, data)),
+            )
+            events.put(("summary", result))
+        except Exception as e:
+            events.put(("error", {"error": str(e)}))
+        events.put(None)
+
+    # The pipeline keeps running (and fills the result cache) even if the client disconnects
+    threading.Thread(target=run, name="summary-stream", daemon=True).start()
+
+    def stream():
+        while True:
+            try:
+                item = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                # Comment lines keep proxies from closing an idle connection during long stages
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                return
+            event, data = item
+            yield _sse_message(event, _with_frame_urls(data) if event in ("scene_batch", "summary") else data)
+
+    # The request context is kept for the generator, which builds the frame URLs
+    return Response(
+        stream_with_context(stream()), mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@main.route("/resummarize", methods=["POST"])
+async def resummarize_video():
+    data = request.get_json() or {}
+    # The hash is looked up from the upload rather than taken from the client, like in _summary_params
+    video_dir = _video_dir(data.get("video_id"))
+    if video_dir is None:
+        return jsonify({"error": "video_id of an existing upload is required"}), 400
+    content_hash = RESULT_CACHE.find_content_hash(video_dir)
+    if content_hash is None:
+        return jsonify({"error": "No cached results for this upload, generate the summary again"}), 404
+    whisper_model = data.get("whisper_model")
+    if whisper_model is not None and whisper_model not in WHISPER_ALLOWED_MODELS:
+        return jsonify({"error": f"Unsupported Whisper model, choose one of: {', '.join(WHISPER_ALLOWED_MODELS)}"}), 400
 
     try:
-        # Asynchronously run transcription and scene processing
-        async def run_tasks():
-            transcription_task = asyncio.create_task(asyncio.to_thread(transcribe_audio, audio_path, language))
-            
-            keyframes = await asyncio.to_thread(extract_keyframes, video_path, keyframes_dir)
-
-            if not keyframes:
-                raise RuntimeError("No keyframes extracted, cannot proceed with scene analysis.")
-
-            # Run scene analysis after keyframes are extracted
-            scene_descriptions = await asyncio.to_thread(analyze_scenes_with_gpt_vision, keyframes, api_key, language)
-            transcription = await transcription_task
-
-            return transcription, scene_descriptions
-
-        transcription, scene_descriptions = await run_tasks()
-
-        summary, tags = generate_summary_with_gpt(
-            transcription=transcription["text"],
-            language=transcription["language"],
-            scene_descriptions=scene_descriptions,
-            length=length,
-            style=style,
-            api_key=api_key,
+        result = await asyncio.to_thread(
+            resummarize, content_hash,
+            length=data.get("length", "concise"), style=data.get("style", "formal"),
+            language=data.get("language"), whisper_model=whisper_model,
         )
+        return jsonify(_with_frame_urls(result)), 200
 
-        return jsonify({
-            "transcription": transcription["text"],
-            "language": transcription["language"],
-            "scene_descriptions": scene_descriptions,
-            "summary": summary,
-            "tags": tags,
-        }), 200
-
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@main.route("/jobs", methods=["POST"])
+def submit_job():
+    params, error = _summary_params(request.get_json())
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        job_id = get_job_queue().submit(params)
+    except QueueFullError as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("main.job_status", job_id=job_id),
+        "result_url": url_for("main.job_result", job_id=job_id),
+    }), 202
+
+@main.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "stages": job["stages"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }), 200
+
+@main.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == "failed":
+        return jsonify({"error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"status": job["status"], "stages": job["stages"]}), 409
+
+    return jsonify(_with_frame_urls(job["result"])), 200
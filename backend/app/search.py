@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import threading
+from app.db import connect
+from app.config import SEARCH_DB_PATH
+
+SEARCH_MAX_CANDIDATES = 2000
+MAX_ROWID = 2 ** 63 - 1
+
+class SearchIndex:
+    """
+    SQLite FTS5 index over processed videos: one entry per transcript segment, scene description,
+    summary and tag list. Entries live in a regular table with an external-content FTS5 table kept
+    in sync by triggers, so re-indexing a video replaces its rows through an ordinary index on
+    video_id and queries are answered from the FTS5 index ranked by BM25.
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path: Path of the SQLite database, created on the first indexed video.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        with self._lock:
+            if not self._initialized:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                with connect(self.db_path) as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(
+                        "CREATE TABLE IF NOT EXISTS videos ("
+                        "video_id TEXT PRIMARY KEY, content_hash TEXT, video_path TEXT, language TEXT, "
+                        "summary TEXT, tags TEXT, indexed_at REAL NOT NULL);"
+                        "CREATE TABLE IF NOT EXISTS entries ("
+                        "id INTEGER PRIMARY KEY, video_id TEXT NOT NULL, kind TEXT NOT NULL, "
+                        "start_time REAL, end_time REAL, frame_path TEXT, text TEXT NOT NULL);"
+                        "CREATE INDEX IF NOT EXISTS entries_video ON entries (video_id);"
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+                        "text, content='entries', content_rowid='id', tokenize='unicode61 remove_diacritics 2');"
+                        "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN "
+                        "INSERT INTO entries_fts (rowid, text) VALUES (new.id, new.text); END;"
+                        "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN "
+                        "INSERT INTO entries_fts (entries_fts, rowid, text) VALUES ('delete', old.id, old.text); END;"
+                    )
+                self._initialized = True
+        return connect(self.db_path)
+
+    def index_video(self, video_id, video_path, content_hash, transcription, scene_descriptions, summary_result):
+        """
+        Index (or re-index) a processed video, replacing its previous entries.
+        Keyframes usually carry no timestamps, so a scene's time (unless its frame has a "pts") and a
+        segment's keyframe are estimated from the keyframe's position, the frames being spread evenly
+        over the video.
+        :param video_id: Upload id of the video.
+        :param video_path: Path of the video.
+        :param content_hash: SHA-256 of the video, or None.
+        :param transcription: Transcription with text, language and segments.
+        :param scene_descriptions: Scene descriptions with frame_number and frame_path per frame.
+        :param summary_result: Dictionary with summary and tags.
+        :return: Number of indexed entries.
+        """
+        segments = transcription.get("segments") or []
+        duration = max((segment["end"] for segment in segments), default=None)
+        keyframes = {}
+        for frame in scene_descriptions.get("frames", []):
+            keyframes[frame["frame_number"]] = frame.get("frame_path")
+            for replaced in frame.get("replaces", []):
+                keyframes[replaced["frame_number"]] = replaced["frame_path"]
+        frame_count = max(keyframes, default=0)
+
+        def keyframe_at(seconds):
+            if not frame_count or not duration:
+                return None
+            return keyframes.get(min(frame_count, int(seconds / duration * frame_count) + 1))
+
+        rows = [
+            ("segment", segment["start"], segment["end"], keyframe_at((segment["start"] + segment["end"]) / 2),
+             segment["text"].strip())
+            for segment in segments if segment["text"].strip()
+        ]
+        if not segments and transcription.get("text"):
+            rows.append(("transcript", None, None, None, transcription["text"]))
+        for frame in scene_descriptions.get("frames", []):
+            start = frame.get("pts", (frame["frame_number"] - 0.5) / frame_count * duration if duration else None)
+            rows.append(("scene", start, None, frame.get("frame_path"), frame["description"]))
+        rows.append(("summary", None, None, None, summary_result["summary"]))
+        if summary_result.get("tags"):
+            rows.append(("tags", None, None, None, " ".join(summary_result["tags"])))
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE video_id = ?", (video_id,))
+            conn.executemany(
+                "INSERT INTO entries (video_id, kind, start_time, end_time, frame_path, text) VALUES (?, ?, ?, ?, ?, ?)",
+                [(video_id, *row) for row in rows],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO videos (video_id, content_hash, video_path, language, summary, tags, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (video_id, content_hash, video_path, transcription.get("language"), summary_result["summary"],
+                 json.dumps(summary_result.get("tags", [])), time.time()),
+            )
+        return len(rows)
+
+    def search(self, query, limit=20, video_id=None, max_candidates=SEARCH_MAX_CANDIDATES):
+        """
+        Find the entries matching a query, best first.
+        BM25 ranking costs time for every matching entry, so when more than max_candidates entries
+        match (words found in nearly every video) only the newest max_candidates matches are ranked.
+        :param query: Words to look for; every word must match. Words are matched literally, so FTS5
+            operators in user input cannot produce syntax errors.
+        :param limit: Maximum number of hits.
+        :param video_id: Optional upload id restricting the search to one video.
+        :param max_candidates: Maximum number of matching entries ranked.
+        :return: List of hits with video id and path, kind, start/end time, keyframe, highlighted snippet and score.
+        """
+        words = query.split()
+        if not words:
+            return []
+        if not self._initialized and not os.path.exists(self.db_path):
+            return []
+        match = " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+        with self._connect() as conn:
+            # FTS5 only narrows its scan on rowid ranges; a video's entries are inserted together, so they are contiguous
+            if video_id is not None:
+                lower, upper = conn.execute(
+                    "SELECT MIN(id), MAX(id) FROM entries WHERE video_id = ?", (video_id,)
+                ).fetchone()
+                if lower is None:
+                    return []
+            else:
+                boundary = conn.execute(
+                    "SELECT rowid FROM entries_fts WHERE entries_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                    (match, max_candidates - 1),
+                ).fetchone()
+                lower, upper = (boundary[0] if boundary else 0), MAX_ROWID
+            rows = conn.execute(
+                "SELECT e.video_id, v.video_path, e.kind, e.start_time, e.end_time, e.frame_path, f.snip, f.rank "
+                "FROM (SELECT rowid, snippet(entries_fts, 0, '[', ']', '...', 16) AS snip, rank FROM entries_fts "
+                "WHERE entries_fts MATCH ? AND rowid BETWEEN ? AND ? ORDER BY rank LIMIT ?) f "
+                "JOIN entries e ON e.id = f.rowid LEFT JOIN videos v ON v.video_id = e.video_id ORDER BY f.rank",
+                (match, lower, upper, limit),
+            ).fetchall()
+        return [
+            {
+                "video_id": row[0], "video_path": row[1], "kind": row[2], "start": row[3], "end": row[4],
+                "keyframe": row[5], "snippet": row[6], "score": -row[7],
+            }
+            for row in rows
+        ]
+
+    def stats(self):
+        """
+        :return: Dictionary with the number of indexed videos and entries.
+        """
+        if not self._initialized and not os.path.exists(self.db_path):
+            return {"videos": 0, "entries": 0}
+        with self._connect() as conn:
+            videos = conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"videos": videos, "entries": entries}
+
+SEARCH_INDEX = SearchIndex(SEARCH_DB_PATH)
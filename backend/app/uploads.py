@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from app.config import UPLOAD_BASE_DIR, UPLOAD_SESSION_TTL_SECONDS
+from app.cache import HASH_CHUNK_SIZE
+
+class UploadOffsetError(Exception):
+    """Raised when a chunk does not start at the upload's confirmed offset."""
+
+    def __init__(self, offset):
+        super().__init__(f"Chunk must start at offset {offset}")
+        self.offset = offset
+
+class ChunkedUploadStore:
+    """
+    Resumable uploads written to disk chunk by chunk. Each upload lives in its own directory with
+    the partial file and its metadata; the bytes on disk are the confirmed offset, so an interrupted
+    upload resumes from there, even after a restart. The SHA-256 is computed as chunks arrive and
+    only recomputed from disk when the process lost it.
+    """
+
+    def __init__(self, base_dir, ttl_seconds=UPLOAD_SESSION_TTL_SECONDS):
+        """
+        :param base_dir: Directory holding the partial uploads.
+        :param ttl_seconds: Uploads untouched for longer than this are discarded.
+        """
+        self.base_dir = base_dir
+        self.ttl_seconds = ttl_seconds
+        self._hashers = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, upload_id):
+        upload_dir = os.path.join(self.base_dir, os.path.basename(upload_id))
+        return upload_dir, os.path.join(upload_dir, "data"), os.path.join(upload_dir, "meta.json")
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def create(self, filename, size):
+        """
+        Start an upload.
+        :param filename: Original file name.
+        :param size: Total size in bytes.
+        :return: The new upload id.
+        """
+        self.purge_stale()
+        upload_id = uuid.uuid4().hex
+        upload_dir, data_path, meta_path = self._paths(upload_id)
+        os.makedirs(upload_dir)
+        open(data_path, "wb").close()
+        with open(meta_path, "w") as meta_file:
+            json.dump({"filename": filename, "size": size, "created_at": time.time()}, meta_file)
+        with self._lock:
+            self._hashers[upload_id] = (0, hashlib.sha256())
+        return upload_id
+
+    def get(self, upload_id):
+        """
+        Describe an upload.
+        :param upload_id: Upload id.
+        :return: Dictionary with filename, size and the confirmed offset, or None if it does not exist.
+        """
+        _, data_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            offset = os.path.getsize(data_path)
+        except FileNotFoundError:
+            return None
+        return {"upload_id": upload_id, "filename": meta["filename"], "size": meta["size"], "offset": offset}
+
+    def _hasher(self, upload_id, data_path, offset):
+        with self._lock:
+            state = self._hashers.get(upload_id)
+        if state is not None and state[0] == offset:
+            return state[1]
+        # The running hash was lost (restart) or is out of step: rebuild it from the bytes on disk
+        hasher = hashlib.sha256()
+        with open(data_path, "rb") as data_file:
+            for chunk in iter(lambda: data_file.read(HASH_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        return hasher
+
+    def write_chunk(self, upload_id, offset, stream, chunk_size=HASH_CHUNK_SIZE):
+        """
+        Append a chunk read from a stream, holding at most chunk_size bytes in memory.
+        :param upload_id: Upload id.
+        :param offset: Offset the chunk starts at; it must equal the confirmed offset.
+        :param stream: Readable binary stream with the chunk bytes.
+        :param chunk_size: Number of bytes read per iteration.
+        :return: Upload description with the new confirmed offset, or None if the upload does not exist.
+        :raises UploadOffsetError: If offset is not the confirmed offset.
+        :raises ValueError: If the chunk runs past the declared size.
+        """
+        with self._upload_lock(upload_id):
+            upload = self.get(upload_id)
+            if upload is None:
+                return None
+            if offset != upload["offset"]:
+                raise UploadOffsetError(upload["offset"])
+
+            _, data_path, _ = self._paths(upload_id)
+            hasher = self._hasher(upload_id, data_path, offset)
+            written = offset
+            try:
+                with open(data_path, "ab") as data_file:
+                    while True:
+                        chunk = stream.read(chunk_size)
+                        if not chunk:
+                            break
+                        if written + len(chunk) > upload["size"]:
+                            raise ValueError(f"Chunk runs past the declared size of {upload['size']} bytes")
+                        data_file.write(chunk)
+                        hasher.update(chunk)
+                        written += len(chunk)
+            finally:
+                # Whatever reached the file is confirmed, so a dropped connection resumes after it
+                with self._lock:
+                    self._hashers[upload_id] = (written, hasher)
+            return {**upload, "offset": written}
+
+    def complete(self, upload_id, destination_path):
+        """
+        Finish an upload, moving the file to its destination.
+        :param upload_id: Upload id.
+        :param destination_path: Final path of the file.
+        :return: Tuple of (hex content hash, size in bytes), or None if the upload does not exist.
+        :raises UploadOffsetError: If bytes are still missing.
+        """
+        with self._upload_lock(upload_id):
+            upload = self.get(upload_id)
+            if upload is None:
+                return None
+            if upload["offset"] != upload["size"]:
+                raise UploadOffsetError(upload["offset"])
+
+            upload_dir, data_path, _ = self._paths(upload_id)
+            content_hash = self._hasher(upload_id, data_path, upload["offset"]).hexdigest()
+            shutil.move(data_path, destination_path)
+            self.discard(upload_id)
+            return content_hash, upload["size"]
+
+    def discard(self, upload_id):
+        upload_dir, _, _ = self._paths(upload_id)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+
+    def purge_stale(self):
+        """
+        Discard uploads that received no data within the TTL.
+        :return: Number of discarded uploads.
+        """
+        if not os.path.isdir(self.base_dir):
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        purged = 0
+        for upload_id in os.listdir(self.base_dir):
+            upload_dir, data_path, _ = self._paths(upload_id)
+            try:
+                last_write = os.path.getmtime(data_path if os.path.exists(data_path) else upload_dir)
+            except OSError:
+                continue
+            stale = last_write < cutoff
+            if stale:
+                self.discard(upload_id)
+                purged += 1
+        return purged
+
+UPLOAD_STORE = ChunkedUploadStore(os.path.join(UPLOAD_BASE_DIR, ".partial"))
@@ -1,11 +1,19 @@
-from .video_utils import extract_audio, extract_keyframes
+from .video_utils import (
+        extract_audio, extract_keyframes, extract_media, list_keyframes, decode_audio, iter_audio_windows,
+    )
 from .transcription_utils import transcribe_audio
-from .scene_utils import analyze_scenes_with_gpt_vision
-from .summarize_utils import generate_summary_with_gpt
+from .model_registry import get_whisper_model, preload_whisper_model, WHISPER_MODEL_NAME
+from .transcription_backends import get_transcription_backend, preload_transcription_backend
+from .scene_utils import analyze_scenes_with_gpt_vision, VISION_MODEL
+from .frame_utils import deduplicate_frames, remap_scene_frames
+from .summarize_utils import generate_summary_with_gpt, SUMMARY_MODEL
 
 __all__ = [
-            "extract_audio", "extract_keyframes", 
-            "transcribe_audio", 
-            "analyze_scenes_with_gpt_vision",
-            "generate_summary_with_gpt"
+            "extract_audio", "extract_keyframes", "extract_media", "list_keyframes", "decode_audio",
+            "iter_audio_windows",
+            "transcribe_audio", "get_whisper_model", "preload_whisper_model", "WHISPER_MODEL_NAME",
+            "get_transcription_backend", "preload_transcription_backend",
+            "analyze_scenes_with_gpt_vision", "VISION_MODEL",
+            "deduplicate_frames", "remap_scene_frames",
+            "generate_summary_with_gpt", "SUMMARY_MODEL"
            ]
\ No newline at end of file
@@ -0,0 +1,102 @@
+import math
+from .frame_utils import estimate_image_tokens
+
+DEFAULT_FRAMES = 10
+MIN_FRAMES = 4
+MAX_FRAMES = 60
+FRAMES_PER_MINUTE = 2
+FRAME_ASPECT_RATIO = 16 / 9
+VISION_PROMPT_TOKENS = 60
+VISION_FRAME_PROMPT_TOKENS = 5
+REQUEST_SECONDS = 2.0
+OUTPUT_TOKENS_PER_SECOND = 80
+
+# Quality levels tried from best to cheapest: (max edge, vision detail, description tokens per frame)
+QUALITY_LEVELS = [
+    (1024, "high", 300),
+    (768, "high", 250),
+    (512, "high", 200),
+    (512, "low", 150),
+]
+
+SUMMARY_TOKEN_RANGES = {"concise": (400, 800), "detailed": (800, 2000)}
+SUMMARY_TOKENS_PER_INPUT_TOKEN = 0.1
+
+def _scene_cost(num_frames, max_edge, detail, description_tokens, batch_size, max_concurrency):
+    """
+    Estimate the tokens and seconds of describing num_frames frames at one quality level.
+    :return: Tuple of (tokens, seconds).
+    """
+    requests = math.ceil(num_frames / batch_size)
+    image_tokens = estimate_image_tokens(max_edge, round(max_edge / FRAME_ASPECT_RATIO), detail)
+    tokens = (
+        requests * VISION_PROMPT_TOKENS
+        + num_frames * (image_tokens + VISION_FRAME_PROMPT_TOKENS + description_tokens)
+    )
+    # Requests run in rounds of max_concurrency; a round lasts as long as its longest reply
+    rounds = math.ceil(requests / max_concurrency)
+    seconds = rounds * (REQUEST_SECONDS + min(batch_size, num_frames) * description_tokens / OUTPUT_TOKENS_PER_SECOND)
+    return tokens, seconds
+
+def plan_scene_budget(duration=None, scene_changes_per_minute=None, token_budget=None, latency_budget=None,
+                      batch_size=4, max_concurrency=4, min_frames=MIN_FRAMES, max_frames=MAX_FRAMES):
+    """
+    Choose how many frames to describe, at which resolution and with how many output tokens, so
+    the scene analysis covers the video without exceeding a token or latency budget.
+    The wanted frame count grows with the duration and the scene-change density. Coverage is kept
+    first: when the frames do not fit the budget the resolution and description length are lowered,
+    and frames are only dropped once the cheapest level does not fit either.
+    :param duration: Video duration in seconds, or None when unknown (DEFAULT_FRAMES are wanted).
+    :param scene_changes_per_minute: Scene changes (or keyframes) per minute, or None.
+    :param token_budget: Maximum tokens (input and output) for the scene analysis, or None.
+    :param latency_budget: Maximum seconds for the scene analysis, or None.
+    :param batch_size: Maximum frames per vision request.
+    :param max_concurrency: Maximum vision requests in flight.
+    :param min_frames: Fewest frames wanted for any video.
+    :param max_frames: Most frames wanted for any video.
+    :return: Dictionary with num_frames, max_edge, detail, tokens_per_frame (output limit), batch_size,
+        estimated_tokens and estimated_seconds.
+    """
+    if duration:
+        rate = max(FRAMES_PER_MINUTE, scene_changes_per_minute or 0)
+        wanted = min(max_frames, max(min_frames, math.ceil(duration / 60 * rate)))
+    else:
+        wanted = DEFAULT_FRAMES
+
+    def fits(tokens, seconds):
+        return (not token_budget or tokens <= token_budget) and (not latency_budget or seconds <= latency_budget)
+
+    def batch_for(num_frames):
+        # Short clips spread their few frames over parallel requests instead of one long reply
+        return max(1, min(batch_size, math.ceil(num_frames / max_concurrency)))
+
+    def plan(num_frames, level):
+        max_edge, detail, description_tokens = level
+        batch = batch_for(num_frames)
+        tokens, seconds = _scene_cost(num_frames, max_edge, detail, description_tokens, batch, max_concurrency)
+        return {
+            "num_frames": num_frames, "max_edge": max_edge, "detail": detail, "tokens_per_frame": description_tokens,
+            "batch_size": batch, "estimated_tokens": tokens, "estimated_seconds": round(seconds, 1),
+        }
+
+    for level in QUALITY_LEVELS:
+        candidate = plan(wanted, level)
+        if fits(candidate["estimated_tokens"], candidate["estimated_seconds"]):
+            return candidate
+
+    # Even the cheapest level is over budget: keep the most frames that fit, at least one
+    for num_frames in range(wanted - 1, 0, -1):
+        candidate = plan(num_frames, QUALITY_LEVELS[-1])
+        if fits(candidate["estimated_tokens"], candidate["estimated_seconds"]):
+            return candidate
+    return plan(1, QUALITY_LEVELS[-1])
+
+def plan_summary_tokens(input_tokens, length="concise"):
+    """
+    Choose the output token limit of a summary request from the size of its input.
+    :param input_tokens: Tokens of the prompt.
+    :param length: Summary length (e.g., concise, detailed); other lengths use the detailed range.
+    :return: max_tokens for the request.
+    """
+    low, high = SUMMARY_TOKEN_RANGES.get(length, SUMMARY_TOKEN_RANGES["detailed"])
+    return int(min(high, max(low, input_tokens * SUMMARY_TOKENS_PER_INPUT_TOKEN)))
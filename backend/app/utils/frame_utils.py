@@ -0,0 +1,176 @@
+import math
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+PHASH_SAMPLE_SIZE = 32
+DEFAULT_HAMMING_THRESHOLD = 6
+
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+
+def load_grayscale_thumbnails(image_paths, width, height):
+    """
+    Decode images into a single grayscale batch at thumbnail resolution.
+    :param image_paths: List of image file paths.
+    :param width: Thumbnail width in pixels.
+    :param height: Thumbnail height in pixels.
+    :return: Tuple of (uint8 array shaped (images, height, width), list of original (width, height) sizes).
+    """
+    thumbnails = np.empty((len(image_paths), height, width), dtype=np.uint8)
+    sizes = []
+    for i, image_path in enumerate(image_paths):
+        with Image.open(image_path) as image:
+            sizes.append(image.size)
+            # JPEG draft mode lets the decoder downscale by 1/2..1/8 before we resize
+            image.draft("L", (width * 4, height * 4))
+            thumbnails[i] = np.asarray(image.convert("L").resize((width, height), Image.BILINEAR))
+    return thumbnails, sizes
+
+def _pack_bits(bits):
+    return np.packbits(bits.reshape(bits.shape[0], -1), axis=1).view(">u8").ravel()
+
+def dhash(thumbnails):
+    """
+    Compute difference hashes for a batch of (N, 8, 9) grayscale thumbnails.
+    :param thumbnails: uint8 array shaped (images, HASH_SIZE, HASH_SIZE + 1).
+    :return: uint64 array with one 64-bit hash per image.
+    """
+    return _pack_bits(thumbnails[:, :, 1:] > thumbnails[:, :, :-1])
+
+def _dct_matrix(size):
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * math.sqrt(2 / size)
+    matrix[0] /= math.sqrt(2)
+    return matrix
+
+def phash(thumbnails):
+    """
+    Compute DCT-based perceptual hashes for a batch of (N, 32, 32) grayscale thumbnails.
+    :param thumbnails: uint8 array shaped (images, PHASH_SAMPLE_SIZE, PHASH_SAMPLE_SIZE).
+    :return: uint64 array with one 64-bit hash per image.
+    """
+    dct = _dct_matrix(thumbnails.shape[1])
+    coefficients = np.einsum("ij,njk,lk->nil", dct, thumbnails.astype(np.float64), dct)
+    low_frequencies = coefficients[:, :HASH_SIZE, :HASH_SIZE].reshape(len(thumbnails), -1)
+    # The DC term dominates the median, so compare against the median of the AC terms
+    medians = np.median(low_frequencies[:, 1:], axis=1, keepdims=True)
+    return _pack_bits(low_frequencies > medians)
+
+def _count_bits(values):
+    # Same result as np.bitwise_count, which only exists from NumPy 2.0
+    values = np.ascontiguousarray(values)
+    return np.unpackbits(values.view(np.uint8).reshape(*values.shape, -1), axis=-1).sum(axis=-1)
+
+def hamming_distances(hashes):
+    """
+    Pairwise Hamming distances between 64-bit hashes.
+    :param hashes: uint64 array of hashes.
+    :return: Integer matrix shaped (hashes, hashes).
+    """
+    differences = hashes[:, None] ^ hashes[None, :]
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(differences)
+    return _count_bits(differences)
+
+def estimate_image_tokens(width, height, detail="high"):
+    """
+    Estimate the input tokens of one image for OpenAI vision models (512px tile formula).
+    :param width: Image width in pixels.
+    :param height: Image height in pixels.
+    :param detail: Vision detail level, "high" or "low".
+    :return: Estimated token count.
+    """
+    if detail == "low":
+        return IMAGE_BASE_TOKENS
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+
+def deduplicate_frames(image_paths, threshold=DEFAULT_HAMMING_THRESHOLD, method="dhash", detail="high",
+                       max_edge=None):
+    """
+    Drop near-duplicate frames whose perceptual hash is within a Hamming distance of an earlier kept frame.
+    :param image_paths: Keyframe file paths, in video order.
+    :param threshold: Maximum Hamming distance (out of 64 bits) for two frames to count as duplicates.
+    :param method: Hash function, "dhash" or "phash".
+    :param detail: Vision detail level the frames are sent with, for the token savings estimate.
+    :param max_edge: Longest edge the frames are downscaled to before sending, or None.
+    :return: Dictionary with "kept" (indices of frames to analyze), "replaced" (kept index -> list of
+        dropped indices it stands for) and "stats" (frame and estimated token savings).
+    """
+    if not image_paths:
+        return {
+            "kept": [],
+            "replaced": {},
+            "stats": {"frames_total": 0, "frames_sent": 0, "frames_dropped": 0, "estimated_tokens_saved": 0},
+        }
+    if method == "phash":
+        thumbnails, sizes = load_grayscale_thumbnails(image_paths, PHASH_SAMPLE_SIZE, PHASH_SAMPLE_SIZE)
+        hashes = phash(thumbnails)
+    elif method == "dhash":
+        thumbnails, sizes = load_grayscale_thumbnails(image_paths, HASH_SIZE + 1, HASH_SIZE)
+        hashes = dhash(thumbnails)
+    else:
+        raise ValueError(f"Unknown hash method: {method}")
+
+    distances = hamming_distances(hashes)
+    kept, replaced = [], {}
+    for i in range(len(image_paths)):
+        matches = [k for k in kept if distances[i, k] <= threshold]
+        if matches:
+            replaced[min(matches, key=lambda k: distances[i, k])].append(i)
+        else:
+            kept.append(i)
+            replaced[i] = []
+
+    dropped = [i for i in range(len(image_paths)) if i not in replaced]
+
+    def sent_size(width, height):
+        scale = min(1.0, max_edge / max(width, height)) if max_edge else 1.0
+        return round(width * scale), round(height * scale)
+
+    return {
+        "kept": kept,
+        "replaced": replaced,
+        "stats": {
+            "frames_total": len(image_paths),
+            "frames_sent": len(kept),
+            "frames_dropped": len(dropped),
+            "estimated_tokens_saved": sum(estimate_image_tokens(*sent_size(*sizes[i]), detail) for i in dropped),
+        },
+    }
+
+def remap_scene_frames(scene_descriptions, image_paths, dedup):
+    """
+    Map scene descriptions of the kept frames back to the original keyframe numbering.
+    :param scene_descriptions: Vision result for the kept frames, numbered in the order they were sent.
+    :param image_paths: Original keyframe file paths.
+    :param dedup: Result of deduplicate_frames.
+    :return: Scene descriptions whose frame_number/frame_path refer to the original keyframes, each
+        listing the frames it replaced, plus the dedup stats.
+    """
+    if "error" in scene_descriptions:
+        return scene_descriptions
+
+    frames = []
+    for frame in scene_descriptions["frames"]:
+        index = dedup["kept"][frame["frame_number"] - 1]
+        frames.append({
+            **frame,
+            "frame_number": index + 1,
+            "frame_path": image_paths[index],
+            "replaces": [
+                {"frame_number": dropped + 1, "frame_path": image_paths[dropped]}
+                for dropped in dedup["replaced"][index]
+            ],
+        })
+
+    remapped = {**scene_descriptions, "frames": frames, "dedup": dedup["stats"]}
+    if "failed_frames" in scene_descriptions:
+        remapped["failed_frames"] = [dedup["kept"][number - 1] + 1 for number in scene_descriptions["failed_frames"]]
+    return remapped
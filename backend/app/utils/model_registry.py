@@ -0,0 +1,74 @@
+import threading
+import numpy as np
+
+WHISPER_MODEL_NAME = "base"
+WHISPER_PRECISIONS = ("fp32", "fp16")
+WARM_UP_SECONDS = 1
+
+_models = {}
+_models_lock = threading.Lock()
+
+def resolve_device(device=None):
+    """
+    Pick the device to run Whisper on.
+    :param device: "cpu", "cuda", "cuda:N", or None/"auto" to use CUDA when available.
+    :return: Device name.
+    """
+    if device and device != "auto":
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def get_whisper_model(name=WHISPER_MODEL_NAME, device=None, precision="fp32"):
+    """
+    Return the Whisper model for a size, device and precision, loading it on first use.
+    torch and the weights are only imported/loaded here, so importing the app stays cheap.
+    :param name: Model size (tiny, base, small, medium, large, ...).
+    :param device: Device name, or None/"auto" to pick one.
+    :param precision: "fp32", or "fp16" (CUDA only).
+    :return: Loaded Whisper model, shared by every caller in the process.
+    """
+    if precision not in WHISPER_PRECISIONS:
+        raise ValueError(f"Unknown Whisper precision: {precision}")
+    device = resolve_device(device)
+    if precision == "fp16" and not device.startswith("cuda"):
+        raise ValueError("fp16 precision requires a CUDA device")
+
+    key = (name, device, precision)
+    with _models_lock:
+        if key not in _models:
+            import whisper
+            model = whisper.load_model(name, device=device)
+            _models[key] = model.half() if precision == "fp16" else model
+        return _models[key]
+
+def loaded_models():
+    """
+    :return: List of (name, device, precision) keys of the models loaded in this process.
+    """
+    with _models_lock:
+        return list(_models)
+
+def warm_up_model(model, precision="fp32"):
+    """
+    Run one short transcription so lazy kernels, allocator pools and caches are set up before
+    the first real request.
+    :param model: Whisper model.
+    :param precision: Precision the model was loaded with.
+    """
+    model.transcribe(np.zeros(16000 * WARM_UP_SECONDS, dtype=np.float32), language="en", fp16=precision == "fp16")
+
+def preload_whisper_model(name=WHISPER_MODEL_NAME, device=None, precision="fp32", warm_up=False):
+    """
+    Load (and optionally warm up) a model ahead of the first request. Called before a pre-fork
+    server forks its workers, the weights are shared copy-on-write instead of loaded per worker.
+    :param name: Model size.
+    :param device: Device name, or None/"auto".
+    :param precision: "fp32" or "fp16".
+    :param warm_up: Whether to run a warm-up transcription.
+    :return: Loaded Whisper model.
+    """
+    model = get_whisper_model(name, device, precision)
+    if warm_up:
+        warm_up_model(model, precision)
+    return model
@@ -0,0 +1,350 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError
+from openai.types.chat import ChatCompletion
+
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", 500))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", 200000))
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", 4))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 120))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS_ESTIMATE = 765
+LOW_DETAIL_IMAGE_TOKENS = 85
+
+class TokenBucketLimiter:
+    """
+    Client-side requests-per-minute and tokens-per-minute limiter shared by every OpenAI call in the process.
+    Callers reserve capacity up front and sleep for the returned delay, so waiting callers are served in order.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        """
+        :param requests_per_minute: Request budget per minute (0 disables the limit).
+        :param tokens_per_minute: Token budget per minute (0 disables the limit).
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_balance = float(requests_per_minute)
+        self._token_balance = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._request_balance = min(
+                self.requests_per_minute, self._request_balance + elapsed * self.requests_per_minute / 60
+            )
+        if self.tokens_per_minute:
+            self._token_balance = min(
+                self.tokens_per_minute, self._token_balance + elapsed * self.tokens_per_minute / 60
+            )
+
+    def reserve(self, tokens):
+        """
+        Reserve one request and an estimated number of tokens.
+        :param tokens: Estimated tokens for the request.
+        :return: Seconds the caller must wait before sending.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0
+            if self.requests_per_minute:
+                self._request_balance -= 1
+                if self._request_balance < 0:
+                    wait = max(wait, -self._request_balance * 60 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                self._token_balance -= min(tokens, self.tokens_per_minute)
+                if self._token_balance < 0:
+                    wait = max(wait, -self._token_balance * 60 / self.tokens_per_minute)
+            return wait
+
+    def adjust(self, estimated_tokens, actual_tokens):
+        """
+        Correct the token balance once the real usage of a request is known.
+        :param estimated_tokens: Tokens reserved before the request.
+        :param actual_tokens: Tokens reported in the response usage.
+        """
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._token_balance = min(self.tokens_per_minute, self._token_balance + estimated_tokens - actual_tokens)
+
+class ClientMetrics:
+    """
+    Counters for OpenAI calls: requests, retries, errors, tokens, in-flight calls and limiter queue wait.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._values = {
+                "requests": 0,
+                "retries": 0,
+                "errors": 0,
+                "in_flight": 0,
+                "queue_wait_seconds_total": 0.0,
+                "queue_wait_seconds_max": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cache_hits": 0,
+            }
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self._values["queue_wait_seconds_total"] += seconds
+            self._values["queue_wait_seconds_max"] = max(self._values["queue_wait_seconds_max"], seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._values[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+RATE_LIMITER = TokenBucketLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT)
+CLIENT_METRICS = ClientMetrics()
+
+_clients = {}
+_clients_lock = threading.Lock()
+_loop = None
+_loop_lock = threading.Lock()
+_response_cache = None
+_usage_trackers = contextvars.ContextVar("usage_trackers", default=())
+
+def set_response_cache(cache):
+    """
+    Install the cache consulted by chat_completion before calling the API.
+    :param cache: Object with get(key) and put(key, model, value) storing serialized responses, or None to disable.
+    """
+    global _response_cache
+    _response_cache = cache
+
+def response_cache_key(**kwargs):
+    """
+    Build the response cache key of a chat request from everything that shapes the answer:
+    model, messages (the prompt), response format (the schema) and sampling parameters.
+    :param kwargs: Arguments for client.chat.completions.create.
+    :return: Hex digest.
+    """
+    payload = json.dumps(kwargs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _cached_response(kwargs):
+    if _response_cache is None:
+        return None, None
+    key = response_cache_key(**kwargs)
+    payload = _response_cache.get(key)
+    if payload is None:
+        return key, None
+    CLIENT_METRICS.increment("cache_hits")
+    return key, ChatCompletion.model_validate_json(payload)
+
+def _store_response(key, kwargs, response):
+    # Only real API responses are serializable; anything else (e.g. test doubles) is not cached
+    if key is not None and _response_cache is not None and isinstance(response, ChatCompletion):
+        _response_cache.put(key, kwargs.get("model"), response.model_dump_json())
+
+def get_client(api_key, base_url=None):
+    """
+    Return the process-wide synchronous client for an API key. Reusing one client keeps its
+    HTTP connection pool (and TLS sessions) alive across calls. SDK retries are disabled
+    because retries are handled by chat_completion.
+    :param api_key: OpenAI API key.
+    :param base_url: Optional API base URL (defaults to OPENAI_BASE_URL or the public API).
+    :return: OpenAI client.
+    """
+    key = ("sync", api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=OPENAI_TIMEOUT)
+        return _clients[key]
+
+def get_async_client(api_key, base_url=None):
+    """
+    Return the process-wide asynchronous client for an API key. It must only be used on the
+    loop driven by run_async, which owns its connection pool.
+    :param api_key: OpenAI API key.
+    :param base_url: Optional API base URL.
+    :return: AsyncOpenAI client.
+    """
+    key = ("async", api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=OPENAI_TIMEOUT)
+        return _clients[key]
+
+def run_async(coroutine):
+    """
+    Run a coroutine on the shared background event loop and wait for its result.
+    :param coroutine: Coroutine to run.
+    :return: The coroutine's result.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="openai-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _loop).result()
+
+def estimate_request_tokens(messages, max_tokens=0):
+    """
+    Roughly estimate the tokens a chat request will consume, for rate limiting.
+    :param messages: Chat messages.
+    :param max_tokens: Completion token limit.
+    :return: Estimated token count.
+    """
+    tokens = max_tokens or 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            tokens += len(content) // CHARS_PER_TOKEN
+            continue
+        for part in content:
+            if part.get("type") == "image_url":
+                low_detail = part["image_url"].get("detail") == "low"
+                tokens += LOW_DETAIL_IMAGE_TOKENS if low_detail else IMAGE_TOKENS_ESTIMATE
+            else:
+                tokens += len(json.dumps(part)) // CHARS_PER_TOKEN
+    return tokens
+
+def _retry_delay(error, attempt):
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after_ms = response.headers.get("retry-after-ms")
+        retry_after = response.headers.get("retry-after")
+        try:
+            if retry_after_ms is not None:
+                return float(retry_after_ms) / 1000
+            if retry_after is not None:
+                return float(retry_after)
+        except ValueError:
+            pass
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random() / 2)
+
+def _is_retryable(error):
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, APIConnectionError)
+
+@contextmanager
+def track_usage():
+    """
+    Collect the token usage of every chat completion made inside the block, including those run
+    through run_async, which carries the caller's context over to the event loop.
+    :return: Dictionary with requests, prompt_tokens and completion_tokens, and estimated_tokens (the
+        estimates the requests were rate limited with), filled as calls complete.
+    """
+    usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated_tokens": 0}
+    token = _usage_trackers.set(_usage_trackers.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _usage_trackers.reset(token)
+
+def _record_usage(response, estimated_tokens):
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if isinstance(prompt_tokens, int) and isinstance(completion_tokens, int):
+        CLIENT_METRICS.increment("prompt_tokens", prompt_tokens)
+        CLIENT_METRICS.increment("completion_tokens", completion_tokens)
+        RATE_LIMITER.adjust(estimated_tokens, prompt_tokens + completion_tokens)
+        for tracker in _usage_trackers.get():
+            tracker["requests"] += 1
+            tracker["prompt_tokens"] += prompt_tokens
+            tracker["completion_tokens"] += completion_tokens
+            tracker["estimated_tokens"] += estimated_tokens
+
+def chat_completion(client, max_attempts=OPENAI_MAX_ATTEMPTS, **kwargs):
+    """
+    Create a chat completion through the shared rate limiter, retrying rate limits, timeouts and
+    server errors with exponential backoff that honours Retry-After. Identical requests are answered
+    from the response cache (see set_response_cache) without calling the API.
+    :param client: Client from get_client.
+    :param max_attempts: Maximum number of attempts.
+    :param kwargs: Arguments for client.chat.completions.create.
+    :return: Chat completion response.
+    """
+    cache_key, cached = _cached_response(kwargs)
+    if cached is not None:
+        return cached
+
+    estimated_tokens = estimate_request_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+    for attempt in range(max_attempts):
+        wait = RATE_LIMITER.reserve(estimated_tokens)
+        CLIENT_METRICS.record_wait(wait)
+        if wait:
+            time.sleep(wait)
+
+        CLIENT_METRICS.increment("requests")
+        CLIENT_METRICS.increment("in_flight")
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if not _is_retryable(e) or attempt == max_attempts - 1:
+                CLIENT_METRICS.increment("errors")
+                raise
+            CLIENT_METRICS.increment("retries")
+            time.sleep(_retry_delay(e, attempt))
+            continue
+        finally:
+            CLIENT_METRICS.increment("in_flight", -1)
+
+        _record_usage(response, estimated_tokens)
+        _store_response(cache_key, kwargs, response)
+        return response
+
+async def chat_completion_async(client, max_attempts=OPENAI_MAX_ATTEMPTS, **kwargs):
+    """
+    Asynchronous counterpart of chat_completion, for clients from get_async_client.
+    :param client: Client from get_async_client.
+    :param max_attempts: Maximum number of attempts.
+    :param kwargs: Arguments for client.chat.completions.create.
+    :return: Chat completion response.
+    """
+    # The response cache reads and writes SQLite, so it runs in a worker thread instead of blocking the loop
+    cache_key, cached = await asyncio.to_thread(_cached_response, kwargs)
+    if cached is not None:
+        return cached
+
+    estimated_tokens = estimate_request_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+    for attempt in range(max_attempts):
+        wait = RATE_LIMITER.reserve(estimated_tokens)
+        CLIENT_METRICS.record_wait(wait)
+        if wait:
+            await asyncio.sleep(wait)
+
+        CLIENT_METRICS.increment("requests")
+        CLIENT_METRICS.increment("in_flight")
+        try:
+            response = await client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if not _is_retryable(e) or attempt == max_attempts - 1:
+                CLIENT_METRICS.increment("errors")
+                raise
+            CLIENT_METRICS.increment("retries")
+            await asyncio.sleep(_retry_delay(e, attempt))
+            continue
+        finally:
+            CLIENT_METRICS.increment("in_flight", -1)
+
+        _record_usage(response, estimated_tokens)
+        await asyncio.to_thread(_store_response, cache_key, kwargs, response)
+        return response
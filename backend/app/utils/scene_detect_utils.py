@@ -0,0 +1,195 @@
+import subprocess
+import numpy as np
+from .video_utils import extract_frames_at
+
+ANALYSIS_WIDTH = 64
+ANALYSIS_HEIGHT = 36
+ANALYSIS_FPS = 4
+HISTOGRAM_BINS = 16
+BATCH_SIZE = 256
+
+def iter_frame_batches(video_path, width=ANALYSIS_WIDTH, height=ANALYSIS_HEIGHT, fps=ANALYSIS_FPS,
+                       batch_size=BATCH_SIZE):
+    """
+    Stream low-resolution grayscale frames from an FFmpeg pipe in fixed-size batches.
+    The same buffer is refilled for every batch, so consumers must finish with a batch
+    before requesting the next one.
+    :param video_path: Path to the input video file.
+    :param width: Analysis frame width in pixels.
+    :param height: Analysis frame height in pixels.
+    :param fps: Frames per second sampled from the video.
+    :param batch_size: Number of frames per batch.
+    :return: Generator of uint8 arrays shaped (frames, height, width).
+    """
+    process = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", video_path, "-an",
+         "-vf", f"fps={fps},scale={width}:{height}", "-pix_fmt", "gray", "-f", "rawvideo", "pipe:1"],
+        stdout=subprocess.PIPE,
+    )
+    buffer = np.empty((batch_size, height, width), dtype=np.uint8)
+    raw = memoryview(buffer).cast("B")
+    frame_bytes = width * height
+
+    try:
+        while True:
+            filled = 0
+            while filled < len(raw):
+                read = process.stdout.readinto(raw[filled:])
+                if not read:
+                    break
+                filled += read
+            frames = filled // frame_bytes
+            if frames:
+                yield buffer[:frames]
+            if filled < len(raw):
+                break
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"FFmpeg error: scene analysis exited with code {process.returncode}")
+
+def batch_histograms(frames, bins=HISTOGRAM_BINS):
+    """
+    Compute normalized intensity histograms for a batch of frames in one vectorized pass.
+    :param frames: uint8 array shaped (frames, height, width).
+    :param bins: Number of histogram bins (must divide 256).
+    :return: float32 array shaped (frames, bins) whose rows sum to 1.
+    """
+    count = frames.shape[0]
+    pixels = frames.reshape(count, -1)
+    indices = (pixels // (256 // bins)).astype(np.intp) + (np.arange(count, dtype=np.intp) * bins)[:, None]
+    histograms = np.bincount(indices.ravel(), minlength=count * bins).reshape(count, bins)
+    return (histograms / pixels.shape[1]).astype(np.float32)
+
+def batch_scores(frames, previous_frame=None, previous_histogram=None, bins=HISTOGRAM_BINS):
+    """
+    Score the change between each frame and the one before it.
+    The score averages the histogram distance and the mean absolute pixel difference, both in [0, 1].
+    :param frames: uint8 array shaped (frames, height, width).
+    :param previous_frame: Last frame of the previous batch, or None for the first batch.
+    :param previous_histogram: Histogram of previous_frame.
+    :param bins: Number of histogram bins.
+    :return: Tuple of (scores array, last frame copy, last histogram) to carry into the next batch.
+    """
+    histograms = batch_histograms(frames, bins)
+    if previous_frame is None:
+        previous_frame, previous_histogram = frames[0], histograms[0]
+
+    reference_frames = np.concatenate([previous_frame[None], frames[:-1]])
+    reference_histograms = np.concatenate([previous_histogram[None], histograms[:-1]])
+
+    histogram_distance = 0.5 * np.abs(histograms - reference_histograms).sum(axis=1)
+    pixel_distance = np.abs(
+        frames.astype(np.int16) - reference_frames.astype(np.int16)
+    ).mean(axis=(1, 2)) / 255.0
+    scores = 0.5 * histogram_distance + 0.5 * pixel_distance
+
+    return scores.astype(np.float32), frames[-1].copy(), histograms[-1].copy()
+
+def compute_scene_scores(video_path, fps=ANALYSIS_FPS, batch_size=BATCH_SIZE):
+    """
+    Compute a scene-change score for every analysed frame of a video.
+    :param video_path: Path to the input video file.
+    :param fps: Frames per second sampled from the video.
+    :param batch_size: Number of frames decoded and scored per batch.
+    :return: Tuple of (timestamps in seconds, scores) as NumPy arrays.
+    """
+    score_batches = []
+    previous_frame, previous_histogram = None, None
+    for frames in iter_frame_batches(video_path, fps=fps, batch_size=batch_size):
+        scores, previous_frame, previous_histogram = batch_scores(frames, previous_frame, previous_histogram)
+        score_batches.append(scores)
+
+    scores = np.concatenate(score_batches) if score_batches else np.zeros(0, dtype=np.float32)
+    timestamps = np.arange(len(scores), dtype=np.float64) / fps
+    return timestamps, scores
+
+def select_scene_boundaries(timestamps, scores, num_frames=10, threshold=0.15, min_scene_length=1.0):
+    """
+    Choose scene boundaries under a frame budget: the strongest changes above the threshold,
+    at least min_scene_length apart. The start of the video is always a boundary.
+    :param timestamps: Timestamps of the scored frames.
+    :param scores: Scene-change score per frame.
+    :param num_frames: Maximum number of scenes to return.
+    :param threshold: Minimum score for a scene change.
+    :param min_scene_length: Minimum distance in seconds between boundaries.
+    :return: Sorted list of scene start times in seconds.
+    """
+    if len(timestamps) == 0:
+        return []
+
+    boundaries = [float(timestamps[0])]
+    candidates = np.flatnonzero(scores >= threshold)
+    for index in candidates[np.argsort(scores[candidates])[::-1]]:
+        if len(boundaries) >= num_frames:
+            break
+        t = float(timestamps[index])
+        if all(abs(t - boundary) >= min_scene_length for boundary in boundaries):
+            boundaries.append(t)
+    return sorted(boundaries)
+
+def fill_scene_budget(starts, end, num_frames=10, min_scene_length=1.0):
+    """
+    Split the longest scenes evenly until num_frames scenes remain, so videos with few (or no) cuts
+    above the threshold still spend their frame budget instead of returning a single frame.
+    :param starts: Sorted scene start times in seconds.
+    :param end: End of the last scene in seconds.
+    :param num_frames: Number of scenes wanted.
+    :param min_scene_length: Scenes are not split into parts shorter than this.
+    :return: Sorted list of scene start times in seconds.
+    """
+    if not starts:
+        return []
+
+    lengths = [next_start - start for start, next_start in zip(starts, starts[1:] + [end])]
+    parts = [1] * len(starts)
+    for _ in range(num_frames - len(starts)):
+        # Each extra scene goes to the scene whose parts are currently the longest
+        longest = max(range(len(starts)), key=lambda i: lengths[i] / parts[i])
+        if lengths[longest] / (parts[longest] + 1) < min_scene_length:
+            break
+        parts[longest] += 1
+    return [
+        start + length * part / count
+        for start, length, count in zip(starts, lengths, parts)
+        for part in range(count)
+    ]
+
+def detect_scenes(video_path, num_frames=10, threshold=0.15, min_scene_length=1.0, fps=ANALYSIS_FPS):
+    """
+    Detect scenes and pick one representative timestamp (the scene midpoint) per scene. When there are
+    fewer cuts than num_frames, the longest scenes are split evenly to use the rest of the budget.
+    :param video_path: Path to the input video file.
+    :param num_frames: Number of scenes to return (fewer only for videos too short to split further).
+    :param threshold: Minimum score for a scene change.
+    :param min_scene_length: Minimum scene length in seconds.
+    :param fps: Frames per second sampled for analysis.
+    :return: List of dictionaries with scene "start", "end" and representative "pts" in seconds.
+    """
+    timestamps, scores = compute_scene_scores(video_path, fps=fps)
+    if len(timestamps) == 0:
+        return []
+
+    end_of_video = float(timestamps[-1]) + 1.0 / fps
+    starts = select_scene_boundaries(timestamps, scores, num_frames, threshold, min_scene_length)
+    starts = fill_scene_budget(starts, end_of_video, num_frames, min_scene_length)
+    ends = starts[1:] + [end_of_video]
+    return [{"start": start, "end": end, "pts": (start + end) / 2} for start, end in zip(starts, ends)]
+
+def extract_scene_keyframes(video_path, output_dir, num_frames=10, max_edge=None, jpeg_quality=None,
+                            **detect_options):
+    """
+    Extract one frame per detected scene.
+    :param video_path: Path to the input video file.
+    :param output_dir: Directory to save the keyframes.
+    :param num_frames: Maximum number of keyframes to extract.
+    :param max_edge: Downscale frames so neither side exceeds this many pixels.
+    :param jpeg_quality: JPEG quality from 1 to 100.
+    :param detect_options: Extra options forwarded to detect_scenes.
+    :return: List of dictionaries with the frame "path" and its timestamp "pts" in seconds.
+    """
+    scenes = detect_scenes(video_path, num_frames=num_frames, **detect_options)
+    return extract_frames_at(
+        video_path, output_dir, [scene["pts"] for scene in scenes],
+        accurate=True, max_edge=max_edge, jpeg_quality=jpeg_quality,
+    )
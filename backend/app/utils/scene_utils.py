@@ -1,73 +1,213 @@
+import io
 import base64
 import json
-from openai import OpenAI
+import asyncio
+from PIL import Image, UnidentifiedImageError
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+from .openai_client import get_async_client, chat_completion_async, run_async
 
-def analyze_scenes_with_gpt_vision(images, api_key, language="English"):
+VISION_MODEL = "gpt-4o-mini"
+FRAME_MAX_EDGE = 1024
+FRAME_JPEG_QUALITY = 85
+VISION_BATCH_SIZE = 4
+VISION_MAX_CONCURRENCY = 4
+VISION_MAX_ATTEMPTS = 3
+VISION_TOKENS_PER_FRAME = 300
+VISION_RETRY_WAIT = wait_exponential(multiplier=1, min=2, max=10)
+
+def encode_frame(image_path, max_edge=FRAME_MAX_EDGE, jpeg_quality=FRAME_JPEG_QUALITY):
     """
-    Analyze scenes using GPT-4 Vision in a single batch request.
-    :param images: List of file paths for the keyframe images.
-    :param api_key: OpenAI API key.
-    :param language: Language for scene descriptions.
-    :return: Descriptions of the scenes.
+    Read a frame and base64-encode it, downscaling and re-encoding it first if it exceeds max_edge.
+    Frames already within bounds (e.g., scaled at extraction time) are sent as-is.
+    :param image_path: Path to the frame image.
+    :param max_edge: Maximum width/height in pixels, or None to never resize.
+    :param jpeg_quality: JPEG quality used when re-encoding.
+    :return: Tuple of (base64 string, bytes read from disk, bytes sent).
     """
-    client = OpenAI(api_key=api_key)
+    with open(image_path, "rb") as image_file:
+        data = image_file.read()
+    original_size = len(data)
 
-    base64_frames = []
-    for image_path in images:
-        with open(image_path, "rb") as image_file:
-            base64_frame = base64.b64encode(image_file.read()).decode("utf-8")
-            base64_frames.append(base64_frame)
-
-    json_schema = {
-        "name": "scene_analysis",
-        "strict": True,
-        "schema": {
-            "type": "object",
-            "properties": {
-                "frames": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "frame_number": {"type": "integer"},
-                            "description": {"type": "string"},
-                        },
-                        "required": ["frame_number", "description"],
-                        "additionalProperties": False
-                    }
+    if max_edge:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if max(image.size) > max_edge:
+                    image.draft("RGB", (max_edge, max_edge))
+                    image = image.convert("RGB")
+                    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+                    output = io.BytesIO()
+                    image.save(output, format="JPEG", quality=jpeg_quality, optimize=True)
+                    data = output.getvalue()
+        except UnidentifiedImageError:
+            pass
+
+    return base64.b64encode(data).decode("ascii"), original_size, len(data)
+
+SCENE_JSON_SCHEMA = {
+    "name": "scene_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "frames": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "frame_number": {"type": "integer"},
+                        "description": {"type": "string"},
+                    },
+                    "required": ["frame_number", "description"],
+                    "additionalProperties": False
                 }
-            },
-            "required": ["frames"],
-            "additionalProperties": False
-        }
+            }
+        },
+        "required": ["frames"],
+        "additionalProperties": False
     }
+}
 
+async def _analyze_batch(client, semaphore, batch, language, tokens_per_frame=VISION_TOKENS_PER_FRAME):
+    """
+    Describe one batch of frames, retrying only this batch when the reply cannot be parsed.
+    Rate limits and transient API errors are retried by chat_completion_async.
+    :param client: AsyncOpenAI client.
+    :param semaphore: Semaphore bounding concurrent vision requests.
+    :param batch: List of (frame index, image content part) tuples.
+    :param language: Language for scene descriptions.
+    :param tokens_per_frame: Output tokens allowed per frame description.
+    :return: Dictionary mapping frame index to its description; frames the last reply skipped are absent.
+    """
     prompt = [
-        f"These are frames from a video. Analyze each frame and provide a detailed description of the scene in {language}.",
-        *map(lambda x: {"image": x, "resize": 1024}, base64_frames),
+        {
+            "type": "text",
+            "text": f"These are frames from a video. Analyze each frame and provide a detailed description of the scene in {language}. "
+                    f"Use the number given before each frame as its frame_number.",
+        },
     ]
+    for index, image_part in batch:
+        prompt += [{"type": "text", "text": f"Frame {index + 1}:"}, image_part]
 
     PROMPT_MESSAGES = [
         {"role": "system", "content": "You are a scene analyzer who provides detailed descriptions for video frames."},
         {"role": "user", "content": prompt},
     ]
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=PROMPT_MESSAGES,
-            response_format={"type": "json_schema", "json_schema": json_schema},
-            max_tokens=1000,
-            temperature=0.5,
-        )
+    async for attempt in AsyncRetrying(
+        stop=stop_after_attempt(VISION_MAX_ATTEMPTS), wait=VISION_RETRY_WAIT,
+        retry=retry_if_exception_type((ValueError, KeyError)), reraise=True,
+    ):
+        with attempt:
+            async with semaphore:
+                response = await chat_completion_async(
+                    client,
+                    model=VISION_MODEL,
+                    messages=PROMPT_MESSAGES,
+                    response_format={"type": "json_schema", "json_schema": SCENE_JSON_SCHEMA},
+                    max_tokens=tokens_per_frame * len(batch),
+                    temperature=0.5,
+                )
+            # A truncated or malformed reply raises here and the batch is retried
+            frames = json.loads(response.choices[0].message.content)["frames"]
+            descriptions = _match_frames(frames, [index for index, _ in batch])
+            # So is a reply that skips frames; after the last attempt the frames it skipped are reported as failed
+            missing = [index + 1 for index, _ in batch if index not in descriptions]
+            if missing and attempt.retry_state.attempt_number < VISION_MAX_ATTEMPTS:
+                raise ValueError(f"Vision reply is missing frames {missing}")
+    return descriptions
+
+def _match_frames(frames, indices):
+    descriptions = {}
+    for position, frame in enumerate(frames):
+        index = frame["frame_number"] - 1
+        if index not in indices:
+            # Fall back to reply order when the model renumbers the frames
+            if position >= len(indices):
+                continue
+            index = indices[position]
+        descriptions[index] = frame["description"]
+    return descriptions
+
+async def _analyze_batches(image_parts, api_key, language, batch_size, max_concurrency, on_result=None,
+                           tokens_per_frame=VISION_TOKENS_PER_FRAME):
+    client = get_async_client(api_key)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    indexed_parts = list(enumerate(image_parts))
+    batches = [indexed_parts[i:i + batch_size] for i in range(0, len(indexed_parts), batch_size)]
 
-        # Parse and return the structured JSON response
-        structured_response = json.loads(response.choices[0].message.content)
-        
-        for i, frame in enumerate(structured_response["frames"]):
-            frame["frame_path"] = images[i]
+    async def analyze(batch):
+        descriptions = await _analyze_batch(client, semaphore, batch, language, tokens_per_frame)
+        if on_result is not None:
+            on_result(descriptions)
+        return descriptions
 
-        return structured_response
+    results = await asyncio.gather(*(analyze(batch) for batch in batches), return_exceptions=True)
+    return batches, results
+
+def analyze_scenes_with_gpt_vision(images, api_key, language="English", max_edge=FRAME_MAX_EDGE,
+                                   jpeg_quality=FRAME_JPEG_QUALITY, detail="auto",
+                                   batch_size=VISION_BATCH_SIZE, max_concurrency=VISION_MAX_CONCURRENCY,
+                                   on_batch=None, tokens_per_frame=VISION_TOKENS_PER_FRAME):
+    """
+    Analyze scenes using GPT-4 Vision, sending frames in concurrent batches.
+    :param images: List of file paths for the keyframe images.
+    :param api_key: OpenAI API key.
+    :param language: Language for scene descriptions.
+    :param max_edge: Frames larger than this are downscaled before upload.
+    :param jpeg_quality: JPEG quality used when a frame is re-encoded.
+    :param detail: Vision detail level (auto, low, high).
+    :param batch_size: Number of frames per vision request.
+    :param max_concurrency: Maximum number of vision requests in flight.
+    :param on_batch: Optional callback receiving the frames of each batch, in the shape of the result's
+        "frames", as soon as that batch is described (batches may complete out of order).
+    :param tokens_per_frame: Output tokens allowed per frame description.
+    :return: Descriptions of the scenes, in frame order. Frames of batches that still failed after
+        retries, or that the last reply of their batch left out, are listed in "failed_frames".
+    """
+    # Each frame is held once, as the base64 data URL embedded in the request
+    image_parts = []
+    bytes_before = bytes_after = 0
+    for image_path in images:
+        base64_frame, original_size, encoded_size = encode_frame(image_path, max_edge, jpeg_quality)
+        bytes_before += original_size
+        bytes_after += encoded_size
+        image_parts.append({
+            "type": "image_url",
+            "image_url": {"url": f"data:image/jpeg;base64,{base64_frame}", "detail": detail},
+        })
+
+    def frames_of(descriptions):
+        return [
+            {"frame_number": index + 1, "description": descriptions[index], "frame_path": images[index]}
+            for index in sorted(descriptions)
+        ]
+
+    on_result = None if on_batch is None else lambda descriptions: on_batch(frames_of(descriptions))
+    try:
+        # The shared loop keeps the pooled async client's connections alive between calls
+        batches, results = run_async(
+            _analyze_batches(image_parts, api_key, language, batch_size, max_concurrency, on_result, tokens_per_frame)
+        )
     except Exception as e:
         print(f"Error analyzing scenes with GPT Vision: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+    # Merge the batch results back by frame index
+    frames, failed_frames, errors = [], [], []
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            print(f"Error analyzing scenes with GPT Vision: {result}")
+            errors.append(str(result))
+            failed_frames += [index + 1 for index, _ in batch]
+            continue
+        frames += frames_of(result)
+        failed_frames += [index + 1 for index, _ in batch if index not in result]
+
+    if errors and not frames:
+        return {"error": errors[0]}
+
+    structured_response = {"frames": frames}
+    if failed_frames:
+        structured_response["failed_frames"] = failed_frames
+    structured_response["payload"] = {"bytes_before": bytes_before, "bytes_after": bytes_after}
+    return structured_response
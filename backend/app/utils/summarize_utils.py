@@ -1,76 +1,228 @@
+import re
 import json
-from openai import OpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+import asyncio
+import functools
+from .openai_client import get_client, get_async_client, chat_completion, chat_completion_async, run_async
+from .budget_utils import plan_summary_tokens
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-def call_gpt_with_retries(client, messages, json_schema):
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_CHUNK_TOKENS = 4000
+SUMMARY_MAX_CONCURRENCY = 4
+PARTIAL_SUMMARY_TOKENS = 500
+CHARS_PER_TOKEN = 4
+
+SUMMARY_JSON_SCHEMA = {
+    "name": "summary_with_tags",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "tags": {
+                "type": "array",
+                "items": {"type": "string"},
+            },
+        },
+        "required": ["summary", "tags"],
+        "additionalProperties": False
+    }
+}
+
+def call_gpt_with_retries(client, messages, json_schema, max_tokens=1000):
     """
-    Calls the GPT API with retries on failure.
+    Calls the GPT API through the shared rate limiter, with retries on failure.
     :param client: OpenAI API client instance.
     :param messages: Messages for GPT.
     :param json_schema: JSON schema for the response.
+    :param max_tokens: Output token limit.
     :return: GPT response.
     """
-    
-    return client.chat.completions.create(
-        model="gpt-4o-mini",
+
+    return chat_completion(
+        client,
+        model=SUMMARY_MODEL,
         messages=messages,
         response_format={"type": "json_schema", "json_schema": json_schema},
-        max_tokens=1000,
+        max_tokens=max_tokens,
         temperature=0.7,
     )
 
-def generate_summary_with_gpt(transcription, scene_descriptions, length, style, api_key, language):
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model):
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        print(f"Error loading tokenizer for {model}, estimating token counts instead: {e}")
+        return None
+
+def count_tokens(text, model=SUMMARY_MODEL):
+    """
+    Count the tokens of a text for a model, estimating from its length if no tokenizer is available.
+    :param text: Text to count.
+    :param model: Model whose tokenizer is used.
+    :return: Number of tokens.
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _format_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+def _time_range(part):
+    if part["start"] is None:
+        return ""
+    return f"[{_format_time(part['start'])} - {_format_time(part['end'])}] "
+
+def _split_long_text(text, max_tokens):
+    words = text.split()
+    words_per_piece = max(1, len(words) * max_tokens // max(count_tokens(text), 1))
+    return [" ".join(words[i:i + words_per_piece]) for i in range(0, len(words), words_per_piece)]
+
+def split_transcript(text, segments=None, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """
+    Split a transcript into consecutive chunks of at most max_tokens, keeping segment boundaries
+    so each chunk covers a contiguous time range.
+    :param text: Full transcription text, used when no segments are available.
+    :param segments: Transcription segments with start, end and text, or None.
+    :param max_tokens: Maximum tokens per chunk.
+    :return: List of chunks with start/end (None without segments) and text.
+    """
+    if not segments:
+        sentences = [sentence for sentence in re.split(r"(?<=[.!?])\s+", text) if sentence.strip()]
+        segments = [{"start": None, "end": None, "text": sentence} for sentence in sentences]
+
+    chunks, current, current_tokens = [], [], 0
+    for segment in segments:
+        pieces = [segment["text"]]
+        tokens = count_tokens(segment["text"])
+        if tokens > max_tokens:
+            pieces = _split_long_text(segment["text"], max_tokens)
+        for piece in pieces:
+            piece_tokens = count_tokens(piece) if len(pieces) > 1 else tokens
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append({**segment, "text": piece})
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(current)
+
+    return [
+        {"start": chunk[0]["start"], "end": chunk[-1]["end"], "text": " ".join(part["text"].strip() for part in chunk)}
+        for chunk in chunks
+    ]
+
+async def _summarize_part(client, semaphore, part, language, kind):
+    """
+    Summarize one chunk of the transcript (or a group of partial summaries).
+    :param client: AsyncOpenAI client.
+    :param semaphore: Semaphore bounding concurrent requests.
+    :param part: Chunk with start, end and text.
+    :param language: Output language.
+    :param kind: What the chunk holds, used in the prompt ("transcript" or "partial summaries").
+    :return: Partial summary with the chunk's start, end and tags.
+    """
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant for summarizing part of a video."},
+        {"role": "user", "content": (
+            f"Summarize this section of a video's {kind} in {language}, keeping names, facts and conclusions, "
+            f"and list up to 3 topic tags for it.\n\n"
+            f"### Section {_time_range(part)}\n{part['text']}\n"
+        )},
+    ]
+    async with semaphore:
+        response = await chat_completion_async(
+            client,
+            model=SUMMARY_MODEL,
+            messages=messages,
+            response_format={"type": "json_schema", "json_schema": SUMMARY_JSON_SCHEMA},
+            max_tokens=PARTIAL_SUMMARY_TOKENS,
+            temperature=0.3,
+        )
+    result = json.loads(response.choices[0].message.content)
+    return {"start": part["start"], "end": part["end"], "text": result["summary"], "tags": result["tags"]}
+
+async def _summarize_parts(parts, api_key, language, kind, max_concurrency):
+    client = get_async_client(api_key)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(*(_summarize_part(client, semaphore, part, language, kind) for part in parts))
+
+def _map_reduce(text, segments, api_key, language, max_tokens, max_concurrency):
+    """
+    Summarize transcript chunks concurrently, then merge the partial summaries until they fit in
+    one chunk.
+    :return: Tuple of (partial summaries in video order, candidate tags).
+    """
+    parts = split_transcript(text, segments, max_tokens)
+    partials = run_async(_summarize_parts(parts, api_key, language, "transcript", max_concurrency))
+    tags = [tag for partial in partials for tag in partial["tags"]]
+
+    # Hierarchical reduce: very long videos can produce more partial summaries than fit in one prompt
+    while len(partials) > 1 and count_tokens(" ".join(partial["text"] for partial in partials)) > max_tokens:
+        groups = split_transcript("", partials, max_tokens)
+        if len(groups) == len(partials):
+            break
+        partials = run_async(_summarize_parts(groups, api_key, language, "partial summaries", max_concurrency))
+    return partials, tags
+
+def generate_summary_with_gpt(transcription, scene_descriptions, length, style, api_key, language, segments=None,
+                              chunk_tokens=SUMMARY_CHUNK_TOKENS, max_concurrency=SUMMARY_MAX_CONCURRENCY, max_tokens=None,
+                              token_plan=None):
     """
     Generate a summary and video tags from transcription and scenes using GPT.
+    Transcriptions longer than chunk_tokens are summarized map-reduce style: time-aligned chunks are
+    summarized concurrently and the partial summaries are combined into the final summary.
     :param transcription: The transcription text.
     :param scene_descriptions: The list of scene descriptions.
     :param length: Summary length (e.g., concise, detailed).
     :param style: Summary style (e.g., formal, casual, technical).
     :param api_key: OpenAI API key.
     :param language: The language of the transcription.
+    :param segments: Transcription segments with start/end times, used to align chunks.
+    :param chunk_tokens: Maximum transcript tokens sent in one request.
+    :param max_concurrency: Maximum number of chunk summaries requested at once.
+    :param max_tokens: Output token limit of the final request, or None to scale it with the prompt's
+        size and the summary length (see budget_utils.plan_summary_tokens).
+    :param token_plan: Optional dictionary receiving the input_tokens and max_tokens of the final request.
     :return: Generated summary text and video tags.
     """
-    client = OpenAI(
-        api_key=api_key
-    )
+    client = get_client(api_key)
 
     try:
         scene_text = "\n".join(
-            [f"Frame {frame['frame_number']}: {frame['description']}" for frame in scene_descriptions["frames"]]
+            [f"Frame {frame['frame_number']}: {frame['description']}" for frame in scene_descriptions.get("frames", [])]
         )
-        
-        json_schema = {
-            "name": "summary_with_tags",
-            "strict": True,
-            "schema": {
-                "type": "object",
-                "properties": {
-                    "summary": {"type": "string"},
-                    "tags": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                    },
-                },
-                "required": ["summary", "tags"],
-                "additionalProperties": False
-            }
-        }
-        
+
+        if count_tokens(transcription) <= chunk_tokens:
+            source = f"### Transcription:\n{transcription}\n\n"
+            extra_instructions = ""
+        else:
+            partials, candidate_tags = _map_reduce(
+                transcription, segments, api_key, language, chunk_tokens, max_concurrency
+            )
+            partial_text = "\n".join(f"{_time_range(partial)}{partial['text']}" for partial in partials)
+            source = f"### Partial Summaries (in video order):\n{partial_text}\n\n"
+            extra_instructions = f"Candidate tags from the sections: {', '.join(dict.fromkeys(candidate_tags))}.\n"
+
         prompt = (
             f"Generate a structured summary and relevant topic tags for the video based on the input below:\n\n"
             f"### Input Details:\n"
             f"- Summary Length: {length}\n"
             f"- Summary Style: {style}\n"
             f"- Output Language: {language}\n"
-            f"### Transcription:\n"
-            f"{transcription}\n\n"
+            f"{source}"
             f"### Scene Descriptions:\n"
             f"{scene_text}\n\n"
             f"### Instructions:\n"
             f"1. Create a {length} summary of the video in a {style} style.\n"
             f"2. Extract and list up to 3 main topics discussed in the video as concise and specific topic tags.\n"
             f"3. Ensure the summary and tags are written in {language}.\n\n"
+            f"{extra_instructions}"
             f"### Output:\n"
         )
 
@@ -78,12 +230,14 @@ def generate_summary_with_gpt(transcription, scene_descriptions, length, style,
             {"role": "system", "content": "You are a helpful assistant for summarizing a video based on its transcription and scenes description."},
             {"role": "user", "content": prompt}
         ]
-        
-        response = call_gpt_with_retries(client, messages, json_schema)
-        result = json.loads(response.choices[0].message.content)
 
+        input_tokens = count_tokens(prompt)
+        max_tokens = max_tokens or plan_summary_tokens(input_tokens, length)
+        if token_plan is not None:
+            token_plan.update(input_tokens=input_tokens, max_tokens=max_tokens)
+        response = call_gpt_with_retries(client, messages, SUMMARY_JSON_SCHEMA, max_tokens)
         result = json.loads(response.choices[0].message.content)
         return result["summary"], result["tags"]
     except Exception as e:
         print(f"Error generating summary with GPT: {e}")
-        return None, []
+        raise RuntimeError(f"GPT summarization error: {str(e)}")
@@ -0,0 +1,167 @@
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from .model_registry import get_whisper_model, warm_up_model, WHISPER_MODEL_NAME
+
+DEFAULT_ENGINE = "whisper"
+FASTER_WHISPER_COMPUTE_TYPES = {
+    "int8": "int8",
+    "int8_float16": "int8_float16",
+    "int8_float32": "int8_float32",
+    "fp16": "float16",
+    "fp32": "float32",
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+def to_language_code(language):
+    """
+    Convert a Whisper language name (e.g., "spanish") to its code (e.g., "es"). openai-whisper
+    accepts both, other engines only take codes.
+    :param language: Language name or code, or None.
+    :return: Language code, or None when language is None.
+    """
+    if language is None:
+        return None
+    from whisper.tokenizer import LANGUAGES, TO_LANGUAGE_CODE
+    language = language.lower()
+    if language in LANGUAGES:
+        return language
+    if language in TO_LANGUAGE_CODE:
+        return TO_LANGUAGE_CODE[language]
+    raise ValueError(f"Unsupported language: {language}")
+
+class TranscriptionBackend(ABC):
+    """
+    Interface of a speech-to-text engine. transcribe returns {"text", "language", "segments"},
+    with segments as {"start", "end", "text"} in seconds from the start of the samples.
+    Engines that decode incrementally pass segments to on_segments as soon as they are produced.
+    """
+
+    name = None
+
+    @abstractmethod
+    def transcribe(self, samples, language=None, on_segments=None):
+        """
+        :param samples: 16 kHz mono float32 samples.
+        :param language: Language code or Whisper language name (e.g., "es" or "spanish"), or None to detect it.
+        :param on_segments: Optional callback receiving lists of new segments as they are transcribed.
+        :return: Dictionary with text, language and segments.
+        """
+
+    @abstractmethod
+    def detect_language(self, samples):
+        """
+        :param samples: 16 kHz mono float32 samples (the first 30 seconds are used).
+        :return: Detected language code.
+        """
+
+    def warm_up(self):
+        self.transcribe(np.zeros(16000, dtype=np.float32), language="en")
+
+class WhisperBackend(TranscriptionBackend):
+    """openai-whisper's PyTorch model, loaded through the model registry."""
+
+    name = "whisper"
+
+    def __init__(self, model_name=WHISPER_MODEL_NAME, device=None, precision="fp32", cpu_threads=0):
+        self.precision = precision
+        self.model = get_whisper_model(model_name, device, precision)
+        # Decoding installs kv-cache hooks on the shared model, so concurrent calls would corrupt each other
+        self._lock = threading.Lock()
+
+    def transcribe(self, samples, language=None, on_segments=None):
+        with self._lock:
+            result = self.model.transcribe(samples, language=language, fp16=self.precision == "fp16")
+        segments = [
+            {"start": segment["start"], "end": segment["end"], "text": segment["text"].strip()}
+            for segment in result["segments"]
+        ]
+        # openai-whisper only returns segments once the whole input is transcribed
+        if on_segments is not None and segments:
+            on_segments(segments)
+        return {"text": result["text"].strip(), "language": result["language"], "segments": segments}
+
+    def detect_language(self, samples):
+        import whisper
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(samples), self.model.dims.n_mels)
+        with self._lock:
+            _, probabilities = self.model.detect_language(mel.to(self.model.device))
+        return max(probabilities, key=probabilities.get)
+
+    def warm_up(self):
+        warm_up_model(self.model, self.precision)
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    CTranslate2 port of Whisper (faster-whisper). With int8 weights it runs several times
+    faster than the PyTorch model on CPU and needs a fraction of the memory.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name=WHISPER_MODEL_NAME, device=None, precision="int8", cpu_threads=0):
+        if precision not in FASTER_WHISPER_COMPUTE_TYPES:
+            raise ValueError(f"Unknown faster-whisper precision: {precision}")
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("The faster-whisper engine needs the faster-whisper package (pip install faster-whisper)")
+        self.model = WhisperModel(
+            model_name, device=device or "auto", compute_type=FASTER_WHISPER_COMPUTE_TYPES[precision],
+            cpu_threads=cpu_threads,
+        )
+
+    def transcribe(self, samples, language=None, on_segments=None):
+        # Greedy decoding, like openai-whisper's transcribe defaults, so both engines are comparable
+        generated, info = self.model.transcribe(samples, language=to_language_code(language), beam_size=1)
+        # Segments are decoded lazily as the generator is consumed, so each one is reported right away
+        segments = []
+        for segment in generated:
+            segments.append({"start": segment.start, "end": segment.end, "text": segment.text.strip()})
+            if on_segments is not None:
+                on_segments(segments[-1:])
+        return {
+            "text": " ".join(segment["text"] for segment in segments if segment["text"]),
+            "language": info.language,
+            "segments": segments,
+        }
+
+    def detect_language(self, samples):
+        language, _, _ = self.model.detect_language(samples)
+        return language
+
+TRANSCRIPTION_BACKENDS = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend)}
+
+def get_transcription_backend(engine=DEFAULT_ENGINE, model_name=WHISPER_MODEL_NAME, device=None, precision="fp32",
+                              cpu_threads=0):
+    """
+    Return the backend for an engine, model size, device and precision, creating it on first use.
+    :param engine: Engine name, one of TRANSCRIPTION_BACKENDS.
+    :param model_name: Model size, or a path to local model files.
+    :param device: Device name, or None/"auto" to pick one.
+    :param precision: fp32/fp16 for whisper; int8, int8_float16, int8_float32, fp16 or fp32 for faster-whisper.
+    :param cpu_threads: CPU threads for engines that take it at load time (0 lets the engine decide).
+    :return: TranscriptionBackend instance, shared by every caller in the process.
+    """
+    if engine not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription engine: {engine}")
+
+    key = (engine, model_name, device, precision)
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = TRANSCRIPTION_BACKENDS[engine](model_name, device, precision, cpu_threads)
+        return _backends[key]
+
+def preload_transcription_backend(engine=DEFAULT_ENGINE, model_name=WHISPER_MODEL_NAME, device=None,
+                                  precision="fp32", warm_up=False):
+    """
+    Load (and optionally warm up) a backend ahead of the first request; see
+    model_registry.preload_whisper_model for why this helps pre-fork servers.
+    :return: TranscriptionBackend instance.
+    """
+    backend = get_transcription_backend(engine, model_name, device, precision)
+    if warm_up:
+        backend.warm_up()
+    return backend
@@ -1,16 +1,158 @@
-import whisper
+import os
+import threading
+import multiprocessing
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from .video_utils import decode_audio, AUDIO_SAMPLE_RATE
+from .vad_utils import split_on_silence
+from .model_registry import WHISPER_MODEL_NAME
+from .transcription_backends import get_transcription_backend, DEFAULT_ENGINE
 
-WHISPER_MODEL = whisper.load_model("base")
+TRANSCRIPTION_CHUNK_SECONDS = 120
+DEFAULT_MODEL_SPEC = (DEFAULT_ENGINE, WHISPER_MODEL_NAME, None, "fp32")
+MAX_TRANSCRIPTION_POOLS = 2
 
-def transcribe_audio(audio_path, language=None):
+_pools = OrderedDict()  # (workers, model_spec) -> pool, least recently used first
+_pool_users = {}
+_pool_lock = threading.Lock()
+
+def transcribe_audio(audio, language=None, workers=1, chunk_seconds=TRANSCRIPTION_CHUNK_SECONDS,
+                     model_name=WHISPER_MODEL_NAME, device=None, precision="fp32", engine=DEFAULT_ENGINE,
+                     on_segments=None):
     """
     Transcribe audio using Whisper.
-    :param audio_path: Path to the audio file.
+    :param audio: Path to an audio or video file, or 16 kHz mono float32 samples from decode_audio.
+        Paths are decoded once through an FFmpeg pipe, so no intermediate WAV is needed.
     :param language: Language override for transcription.
-    :return: Transcription text and detected language.
+    :param workers: Number of worker processes; above 1 the audio is split at pauses and the
+        chunks are transcribed in parallel (see transcribe_chunked).
+    :param chunk_seconds: Maximum chunk length in seconds when workers is above 1.
+    :param model_name: Whisper model size.
+    :param device: Device to run on, or None/"auto" (see model_registry.resolve_device).
+    :param precision: Model precision, e.g. "fp32", "fp16" or (faster-whisper only) "int8".
+    :param engine: Transcription engine (see transcription_backends.TRANSCRIPTION_BACKENDS).
+    :param on_segments: Optional callback receiving lists of segments, in order, as they are transcribed.
+    :return: Transcription text, detected language and segments.
     """
+    model_spec = (engine, model_name, device, precision)
     try:
-        result = WHISPER_MODEL.transcribe(audio_path, language=language)
-        return {"text": result["text"], "language": result["language"]}
+        if isinstance(audio, str):
+            audio = decode_audio(audio)
+        if workers > 1:
+            return transcribe_chunked(audio, language, workers, chunk_seconds, model_spec, on_segments)
+        return get_transcription_backend(*model_spec).transcribe(audio, language, on_segments=on_segments)
     except Exception as e:
         raise RuntimeError(f"Whisper transcription error: {str(e)}")
+
+def _init_worker(threads, model_spec):
+    # Share the cores between workers instead of every worker spawning one thread per core
+    if model_spec[0] == "whisper":
+        import torch
+        torch.set_num_threads(threads)
+    get_transcription_backend(*model_spec, cpu_threads=threads)
+
+def _detect_language(samples, model_spec):
+    return get_transcription_backend(*model_spec).detect_language(samples)
+
+def _transcribe_chunk(samples, language, model_spec):
+    return get_transcription_backend(*model_spec).transcribe(samples, language)
+
+@contextmanager
+def transcription_pool(workers, model_spec=DEFAULT_MODEL_SPEC):
+    """
+    Borrow the process pool used for chunked transcription with a model. Each worker loads the
+    model once when it starts and keeps it for every chunk it handles afterwards. Pools of
+    different models are kept side by side, so concurrent requests never shut down each other's
+    pool; past MAX_TRANSCRIPTION_POOLS the least recently used pools are shut down once idle.
+    :param workers: Number of worker processes.
+    :param model_spec: Tuple of (engine, model name, device, precision) the workers load.
+    :return: Context manager yielding the ProcessPoolExecutor, in use until the block exits.
+    """
+    key = (workers, model_spec)
+    with _pool_lock:
+        pool = _pools.pop(key, None)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(max(1, (os.cpu_count() or 1) // workers), model_spec),
+            )
+        _pools[key] = pool
+        _pool_users[key] = _pool_users.get(key, 0) + 1
+        _shutdown_idle_pools()
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users[key] -= 1
+            _shutdown_idle_pools()
+
+def _shutdown_idle_pools():
+    # Called with _pool_lock held; pools still in use are kept even past the cap
+    for key in list(_pools):
+        if len(_pools) <= MAX_TRANSCRIPTION_POOLS:
+            break
+        if not _pool_users.get(key):
+            _pool_users.pop(key, None)
+            _pools.pop(key).shutdown(wait=False)
+
+def stitch_chunks(chunks, results, sample_rate=AUDIO_SAMPLE_RATE):
+    """
+    Join chunk transcriptions, shifting segment timestamps by each chunk's offset.
+    :param chunks: List of (start, end) sample offsets.
+    :param results: Chunk transcriptions from _transcribe_chunk, in the same order.
+    :param sample_rate: Sample rate of the offsets.
+    :return: Tuple of (full text, list of segments with absolute timestamps).
+    """
+    texts, segments = [], []
+    for (start, _), result in zip(chunks, results):
+        offset = start / sample_rate
+        if result["text"]:
+            texts.append(result["text"])
+        segments += [
+            {**segment, "start": segment["start"] + offset, "end": segment["end"] + offset}
+            for segment in result["segments"]
+        ]
+    return " ".join(texts), segments
+
+def transcribe_chunked(samples, language=None, workers=2, chunk_seconds=TRANSCRIPTION_CHUNK_SECONDS,
+                       model_spec=DEFAULT_MODEL_SPEC, on_segments=None):
+    """
+    Split audio at pauses and transcribe the chunks across worker processes.
+    The language is detected once, from the first chunk, and used for every chunk.
+    :param samples: 16 kHz mono float32 samples.
+    :param language: Language override, or None to detect it.
+    :param workers: Number of worker processes; 1 transcribes the chunks in this process.
+    :param chunk_seconds: Maximum chunk length in seconds.
+    :param model_spec: Tuple of (engine, model name, device, precision).
+    :param on_segments: Optional callback receiving each chunk's segments, with absolute timestamps,
+        as soon as that chunk and every chunk before it are transcribed.
+    :return: Transcription text, language and segments with absolute timestamps.
+    """
+    chunks = split_on_silence(samples, AUDIO_SAMPLE_RATE, chunk_seconds)
+    if not chunks:
+        return {"text": "", "language": language, "segments": []}
+
+    chunk_samples = [samples[start:end] for start, end in chunks]
+
+    def collect(results):
+        # Both iterators yield results in chunk order as they complete
+        collected = []
+        for chunk, result in zip(chunks, results):
+            collected.append(result)
+            if on_segments is not None and result["segments"]:
+                on_segments(stitch_chunks([chunk], [result])[1])
+        return collected
+
+    if workers > 1:
+        with transcription_pool(workers, model_spec) as pool:
+            language = language or pool.submit(_detect_language, chunk_samples[0], model_spec).result()
+            results = collect(pool.map(
+                _transcribe_chunk, chunk_samples, [language] * len(chunks), [model_spec] * len(chunks)
+            ))
+    else:
+        language = language or _detect_language(chunk_samples[0], model_spec)
+        results = collect(_transcribe_chunk(chunk, language, model_spec) for chunk in chunk_samples)
+
+    text, segments = stitch_chunks(chunks, results)
+    return {"text": text, "language": language, "segments": segments}
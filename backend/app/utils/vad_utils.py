@@ -0,0 +1,87 @@
+import numpy as np
+
+VAD_FRAME_SECONDS = 0.03
+VAD_SMOOTHING_SECONDS = 0.3
+VAD_MARGIN_DB = 10.0
+VAD_DYNAMIC_RANGE_DB = 20.0
+MIN_CHUNK_RATIO = 0.5
+
+def frame_energies(samples, sample_rate, frame_seconds=VAD_FRAME_SECONDS):
+    """
+    Compute the RMS energy of consecutive fixed-length frames in one vectorized pass.
+    :param samples: Mono float32 samples.
+    :param sample_rate: Sample rate in Hz.
+    :param frame_seconds: Frame length in seconds.
+    :return: Tuple of (energies in dBFS per frame, frame length in samples).
+    """
+    frame_length = max(1, int(sample_rate * frame_seconds))
+    frames = samples[:len(samples) // frame_length * frame_length].reshape(-1, frame_length)
+    # einsum sums the squares without materializing a squared copy of the audio
+    power = np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / frame_length
+    return 10 * np.log10(power + 1e-12), frame_length
+
+def speech_threshold(energies, margin_db=VAD_MARGIN_DB, dynamic_range_db=VAD_DYNAMIC_RANGE_DB):
+    """
+    Pick the energy above which a frame counts as speech: a margin over the noise floor, capped
+    below the loudest frames so recordings without pauses are not classified as silence.
+    :param energies: Frame energies in dBFS.
+    :param margin_db: Margin above the 10th percentile (noise floor) in dB.
+    :param dynamic_range_db: Maximum distance below the 99th percentile in dB.
+    :return: Threshold in dBFS.
+    """
+    noise_floor, peak = np.percentile(energies, [10, 99])
+    return min(noise_floor + margin_db, peak - dynamic_range_db)
+
+def split_on_silence(samples, sample_rate, chunk_seconds, frame_seconds=VAD_FRAME_SECONDS,
+                     smoothing_seconds=VAD_SMOOTHING_SECONDS, min_chunk_ratio=MIN_CHUNK_RATIO):
+    """
+    Split audio into chunks of at most chunk_seconds, cutting at the quietest stretch of each
+    window so words are not cut in half. Chunks that contain no speech are left out.
+    :param samples: Mono float32 samples.
+    :param sample_rate: Sample rate in Hz.
+    :param chunk_seconds: Maximum chunk length in seconds.
+    :param frame_seconds: Energy frame length in seconds.
+    :param smoothing_seconds: Length of the moving average used to find pauses.
+    :param min_chunk_ratio: Chunks are at least this fraction of chunk_seconds (except the last).
+    :return: List of (start, end) sample offsets.
+    """
+    energies, frame_length = frame_energies(samples, sample_rate, frame_seconds)
+    if len(energies) == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    window = max(1, int(smoothing_seconds / frame_seconds))
+    smoothed = np.convolve(energies, np.ones(window) / window, mode="same")
+    chunk_frames = max(1, int(chunk_seconds / frame_seconds))
+
+    cuts, start = [0], 0
+    while len(energies) - start > chunk_frames:
+        low = start + max(1, int(chunk_frames * min_chunk_ratio))
+        start = low + int(np.argmin(smoothed[low:start + chunk_frames]))
+        cuts.append(start)
+
+    speech = energies > speech_threshold(energies)
+    bounds = [cut * frame_length for cut in cuts[1:]] + [len(samples)]
+    return [
+        (begin * frame_length, end)
+        for begin, next_cut, end in zip(cuts, cuts[1:] + [len(energies)], bounds)
+        if speech[begin:next_cut].any()
+    ]
+
+def find_pause(samples, sample_rate, search_seconds, frame_seconds=VAD_FRAME_SECONDS,
+               smoothing_seconds=VAD_SMOOTHING_SECONDS):
+    """
+    Find the quietest stretch in the last search_seconds of the audio, to end a window there.
+    :param samples: Mono float32 samples.
+    :param sample_rate: Sample rate in Hz.
+    :param search_seconds: Length of the audio end searched for a pause.
+    :param frame_seconds: Energy frame length in seconds.
+    :param smoothing_seconds: Length of the moving average used to find pauses.
+    :return: Sample offset of the pause.
+    """
+    search_start = max(0, len(samples) - int(search_seconds * sample_rate))
+    energies, frame_length = frame_energies(samples[search_start:], sample_rate, frame_seconds)
+    if len(energies) == 0:
+        return len(samples)
+    window = max(1, int(smoothing_seconds / frame_seconds))
+    smoothed = np.convolve(energies, np.ones(window) / window, mode="same")
+    return search_start + int(np.argmin(smoothed)) * frame_length
@@ -1,6 +1,16 @@
 import os
+import re
 import math
+import bisect
 import subprocess
+import numpy as np
+from .vad_utils import find_pause
+
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_READ_SIZE = 1 << 20
+WINDOW_PAUSE_SEARCH_RATIO = 0.25
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+SHOWINFO_PTS_PATTERN = re.compile(r"\bpts_time:\s*(-?\d+(?:\.\d+)?)")
 
 def extract_audio(video_path, output_path):
     """
@@ -18,36 +28,347 @@ def extract_audio(video_path, output_path):
     except subprocess.CalledProcessError as e:
         raise RuntimeError(f"FFmpeg error: {str(e)}")
 
-def extract_keyframes(video_path, output_dir, num_frames=10):
+def decode_audio(media_path, sample_rate=AUDIO_SAMPLE_RATE):
+    """
+    Decode the audio track of a media file to mono float32 samples through an FFmpeg pipe,
+    resampling to sample_rate in the same pass and without writing anything to disk.
+    :param media_path: Path to a video or audio file.
+    :param sample_rate: Output sample rate in Hz (Whisper expects 16 kHz).
+    :return: float32 NumPy array of samples in [-1, 1].
+    """
+    process = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", media_path, "-vn", "-ac", "1", "-ar", str(sample_rate),
+         "-f", "f32le", "pipe:1"],
+        stdout=subprocess.PIPE,
+    )
+    # Grow one bytearray in place (large reallocations are remapped, not copied) and view it as
+    # samples, so the decoded audio is held once with no int16 -> float conversion pass
+    pcm = bytearray()
+    try:
+        while chunk := process.stdout.read(AUDIO_READ_SIZE):
+            pcm += chunk
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"FFmpeg error: audio decoding exited with code {process.returncode}")
+
+    return np.frombuffer(pcm, dtype=np.float32, count=len(pcm) // 4)
+
+def iter_audio_windows(media_path, window_seconds, sample_rate=AUDIO_SAMPLE_RATE):
+    """
+    Decode the audio track of a media file window by window through a single FFmpeg pipe, so only
+    about one window of samples is in memory whatever the duration. Each window ends at the
+    quietest stretch of its last quarter, so words are not cut in half; the rest is carried over
+    into the next window.
+    :param media_path: Path to a video or audio file.
+    :param window_seconds: Maximum window length in seconds.
+    :param sample_rate: Output sample rate in Hz (Whisper expects 16 kHz).
+    :return: Generator of (start time in seconds, float32 samples) tuples.
+    """
+    window = int(window_seconds * sample_rate)
+    process = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", media_path, "-vn", "-ac", "1", "-ar", str(sample_rate),
+         "-f", "f32le", "pipe:1"],
+        stdout=subprocess.PIPE,
+    )
+    offset = 0
+    carry = np.zeros(0, dtype=np.float32)
+    finished = False
+    try:
+        while True:
+            wanted = (window - len(carry)) * 4
+            data = process.stdout.read(wanted)
+            samples = np.concatenate([carry, np.frombuffer(data, dtype=np.float32, count=len(data) // 4)])
+            del data
+            if len(samples) < window:
+                if len(samples):
+                    yield offset / sample_rate, samples
+                break
+            cut = find_pause(samples, sample_rate, window_seconds * WINDOW_PAUSE_SEARCH_RATIO)
+            carry = samples[cut:].copy()
+            yield offset / sample_rate, samples[:cut]
+            offset += cut
+            del samples
+        finished = True
+    finally:
+        process.stdout.close()
+        if not finished:
+            # The consumer stopped early: FFmpeg may be blocked writing to the pipe
+            process.kill()
+            process.wait()
+        elif process.wait() != 0:
+            raise RuntimeError(f"FFmpeg error: audio decoding exited with code {process.returncode}")
+
+def frame_output_options(max_edge=None, jpeg_quality=None):
+    """
+    Build the FFmpeg scale filter and JPEG quality options for extracted frames.
+    :param max_edge: Maximum width/height in pixels; larger frames are downscaled keeping their aspect ratio.
+    :param jpeg_quality: JPEG quality from 1 (worst) to 100 (best), mapped onto FFmpeg's 31..2 qscale.
+    :return: Tuple of (list of filter expressions, list of output arguments).
+    """
+    filters, arguments = [], []
+    if max_edge:
+        filters.append(f"scale='min({max_edge},iw)':'min({max_edge},ih)':force_original_aspect_ratio=decrease")
+    if jpeg_quality:
+        arguments += ["-q:v", str(round(31 - (min(max(jpeg_quality, 1), 100) - 1) * 29 / 99))]
+    return filters, arguments
+
+def _keyframe_pattern(video_path, output_dir):
+    unique_id = os.path.basename(video_path).split("_")[0]
+    return os.path.join(output_dir, f"{unique_id}_frame_%04d.jpeg")
+
+def _sample_uniformly(keyframes, num_frames):
+    total_frames = len(keyframes)
+    if total_frames <= num_frames:
+        return keyframes
+
+    # Calculate indices for uniform sampling
+    step = total_frames / num_frames
+    sampled_indices = [math.floor(i * step) for i in range(num_frames)]
+    return [keyframes[i] for i in sampled_indices]
+
+def list_keyframes(output_dir, num_frames=10):
+    """
+    Collect keyframes previously extracted into a directory.
+    :param output_dir: Directory holding the extracted keyframes.
+    :param num_frames: Maximum number of keyframes to return.
+    :return: Uniformly sampled keyframe file paths, or an empty list if none exist.
+    """
+    if not os.path.isdir(output_dir):
+        return []
+    keyframes = sorted([os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.endswith(".jpeg")])
+    return _sample_uniformly(keyframes, num_frames)
+
+def extract_keyframes(video_path, output_dir, num_frames=10, strategy="iframes", max_edge=None, jpeg_quality=None):
     """
     Extract keyframes from a video using FFmpeg.
     :param video_path: Path to the input video file.
     :param output_dir: Directory to save the extracted keyframes.
     :param num_frames: Maximum number of keyframes to extract.
+    :param strategy: "iframes" decodes every I-frame and samples them uniformly;
+        "seek" decodes only the sampled frames (see sample_keyframes_by_seek);
+        "scene" picks one frame per detected scene (see scene_detect_utils).
+    :param max_edge: Downscale frames so neither side exceeds this many pixels.
+    :param jpeg_quality: JPEG quality from 1 to 100.
     :return: List of extracted keyframe file paths.
     """
+    frame_options = {"max_edge": max_edge, "jpeg_quality": jpeg_quality}
+    if strategy == "seek":
+        frames = sample_keyframes_by_seek(video_path, output_dir, num_frames, **frame_options)
+        return [frame["path"] for frame in frames]
+    if strategy == "scene":
+        from .scene_detect_utils import extract_scene_keyframes
+        frames = extract_scene_keyframes(video_path, output_dir, num_frames, **frame_options)
+        return [frame["path"] for frame in frames]
+    if strategy != "iframes":
+        raise ValueError(f"Unknown keyframe strategy: {strategy}")
+
     os.makedirs(output_dir, exist_ok=True)
-    unique_id = os.path.basename(video_path).split("_")[0]
-    keyframe_pattern = os.path.join(output_dir, f"{unique_id}_frame_%04d.jpeg")
+    keyframe_pattern = _keyframe_pattern(video_path, output_dir)
+    filters, output_arguments = frame_output_options(**frame_options)
     
     try:
         subprocess.run(
-            ["ffmpeg", "-i", video_path, "-vf", "select=eq(pict_type\\,I)", "-vsync", "vfr", keyframe_pattern],
+            ["ffmpeg", "-i", video_path, "-vf", ",".join(["select=eq(pict_type\\,I)", *filters]),
+             "-vsync", "vfr", *output_arguments, keyframe_pattern],
             check=True
         )
         
-        # Collect all keyframe file paths
-        keyframes = sorted([os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.endswith(".jpeg")])
-        
-        # Uniformly sample the keyframes
-        total_frames = len(keyframes)
-        if total_frames <= num_frames:
-            return keyframes
+        return list_keyframes(output_dir, num_frames)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg error: {str(e)}")
+
+def extract_media(video_path, audio_path, keyframes_dir, num_frames=10, strategy="iframes",
+                  max_edge=None, jpeg_quality=None):
+    """
+    Extract audio and keyframes with a single FFmpeg invocation, so the video is demuxed once and
+    only its keyframes are decoded.
+    :param video_path: Path to the input video file.
+    :param audio_path: Path to save the extracted audio, or None to skip writing an audio file
+        (transcription decodes the audio from the video itself, see decode_audio).
+    :param keyframes_dir: Directory to save the extracted keyframes.
+    :param num_frames: Maximum number of keyframes to return.
+    :param strategy: Keyframe strategy; with "seek" the audio pass decodes no video and frames
+        are sampled by seeking.
+    :param max_edge: Downscale frames so neither side exceeds this many pixels.
+    :param jpeg_quality: JPEG quality from 1 to 100.
+    :return: Tuple of (audio path or None, list of keyframe file paths).
+    """
+    if strategy != "iframes":
+        if audio_path:
+            extract_audio(video_path, audio_path)
+        keyframes = extract_keyframes(
+            video_path, keyframes_dir, num_frames, strategy=strategy, max_edge=max_edge, jpeg_quality=jpeg_quality
+        )
+        return audio_path, keyframes
+
+    os.makedirs(keyframes_dir, exist_ok=True)
+    keyframe_pattern = _keyframe_pattern(video_path, keyframes_dir)
+    filters, output_arguments = frame_output_options(max_edge, jpeg_quality)
+    audio_output = ["-map", "a", "-q:a", "0", audio_path] if audio_path else []
+
+    try:
+        subprocess.run(
+            [
+                "ffmpeg", "-skip_frame", "nokey", "-i", video_path,
+                *audio_output,
+                "-map", "0:v:0", "-vf", ",".join(["select=eq(pict_type\\,I)", *filters]),
+                "-vsync", "vfr", *output_arguments, keyframe_pattern,
+            ],
+            check=True
+        )
+        return audio_path, list_keyframes(keyframes_dir, num_frames)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg error: {str(e)}")
+
+def probe_duration(video_path):
+    """
+    Read the container duration of a video with FFprobe, or from FFmpeg's input banner where
+    FFprobe is not installed.
+    :param video_path: Path to the input video file.
+    :return: Duration in seconds.
+    """
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", video_path],
+            check=True, capture_output=True, text=True
+        )
+        return float(result.stdout.strip())
+    except FileNotFoundError:
+        pass
+    except (subprocess.CalledProcessError, ValueError) as e:
+        raise RuntimeError(f"FFprobe error: {str(e)}")
+
+    # Without an output file FFmpeg exits with an error after printing the input's details
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-i", video_path], capture_output=True, text=True)
+    match = DURATION_PATTERN.search(result.stderr)
+    if not match:
+        raise RuntimeError(f"FFmpeg error: no duration found for {video_path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def probe_keyframe_times(video_path):
+    """
+    List keyframe presentation timestamps by reading packet flags with FFprobe, without decoding any
+    frame. Where FFprobe is not installed, FFmpeg decodes only the keyframes and reports their times.
+    :param video_path: Path to the input video file.
+    :return: Sorted list of keyframe timestamps in seconds.
+    """
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+             "-of", "csv=p=0", video_path],
+            check=True, capture_output=True, text=True
+        )
+        times = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                times.append(float(pts_time))
+        return sorted(times)
+    except FileNotFoundError:
+        pass
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFprobe error: {str(e)}")
+
+    # showinfo logs the timestamp of every frame it receives, and only keyframes are decoded
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-nostdin", "-skip_frame", "nokey", "-i", video_path,
+             "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"],
+            check=True, capture_output=True, text=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg error: {str(e)}")
+    return sorted(float(match) for match in SHOWINFO_PTS_PATTERN.findall(result.stderr))
+
+def _nearest_keyframes(keyframe_times, targets):
+    """
+    Snap targets to their nearest keyframe, each keyframe being used once.
+    :return: Tuple of (selected keyframe times, targets whose nearest keyframe was already taken).
+    """
+    selected, leftover = [], []
+    for target in targets:
+        index = bisect.bisect_left(keyframe_times, target)
+        candidates = keyframe_times[max(index - 1, 0):index + 1]
+        nearest = min(candidates, key=lambda t: abs(t - target))
+        if nearest not in selected:
+            selected.append(nearest)
         else:
-            # Calculate indices for uniform sampling
-            step = total_frames / num_frames
-            sampled_indices = [math.floor(i * step) for i in range(num_frames)]
-            sampled_keyframes = [keyframes[i] for i in sampled_indices]
-            return sampled_keyframes
+            leftover.append(target)
+    return selected, leftover
+
+def sample_keyframes_by_seek(video_path, output_dir, num_frames=10, max_edge=None, jpeg_quality=None):
+    """
+    Sample frames at evenly spaced timestamps using fast input seeking and keyframe-only decoding,
+    so only the returned frames are decoded and written. Targets are snapped to the nearest keyframe,
+    so the reported timestamps are those of the decoded frames; when the video has fewer keyframes
+    than targets, the targets left over are decoded exactly instead.
+    :param video_path: Path to the input video file.
+    :param output_dir: Directory to save the sampled keyframes.
+    :param num_frames: Number of frames to sample.
+    :param max_edge: Downscale frames so neither side exceeds this many pixels.
+    :param jpeg_quality: JPEG quality from 1 to 100.
+    :return: List of dictionaries with the frame "path" and its presentation timestamp "pts" in seconds.
+    """
+    duration = probe_duration(video_path)
+    step = duration / num_frames
+    timestamps = [(i + 0.5) * step for i in range(num_frames)]
+
+    accurate = False
+    keyframe_times = probe_keyframe_times(video_path)
+    if keyframe_times:
+        keyframes, leftover = _nearest_keyframes(keyframe_times, timestamps)
+        timestamps = sorted(keyframes + leftover)
+        accurate = [t in leftover for t in timestamps]
+
+    return extract_frames_at(
+        video_path, output_dir, timestamps, accurate=accurate, max_edge=max_edge, jpeg_quality=jpeg_quality
+    )
+
+def _decode_frames(video_path, frames, output_arguments):
+    # One input per frame: each input seeks straight to its keyframe, or decodes up to its timestamp
+    command = ["ffmpeg", "-y"]
+    for frame in frames:
+        seek_options = [] if frame["accurate"] else ["-skip_frame", "nokey", "-noaccurate_seek"]
+        command += [*seek_options, "-ss", f"{frame['pts']:.3f}", "-i", video_path]
+    for i, frame in enumerate(frames):
+        command += ["-map", f"{i}:v:0", "-frames:v", "1", "-update", "1", *output_arguments, frame["path"]]
+    try:
+        subprocess.run(command, check=True)
     except subprocess.CalledProcessError as e:
         raise RuntimeError(f"FFmpeg error: {str(e)}")
+
+def extract_frames_at(video_path, output_dir, timestamps, accurate=False, max_edge=None, jpeg_quality=None):
+    """
+    Decode and save one frame per timestamp with a single FFmpeg process. Fast seeking finds no frame
+    past the last keyframe it can reach, so timestamps it misses are decoded exactly in a second pass.
+    :param video_path: Path to the input video file.
+    :param output_dir: Directory to save the frames.
+    :param timestamps: Timestamps in seconds.
+    :param accurate: Decode up to the exact timestamp instead of stopping at the keyframe before it;
+        either one flag for every timestamp or a list with one flag per timestamp.
+    :param max_edge: Downscale frames so neither side exceeds this many pixels.
+    :param jpeg_quality: JPEG quality from 1 to 100.
+    :return: List of dictionaries with the frame "path" and its timestamp "pts" in seconds (with fast
+        seeking, the frame is the keyframe at or before that timestamp).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    keyframe_pattern = _keyframe_pattern(video_path, output_dir)
+    if isinstance(accurate, bool):
+        accurate = [accurate] * len(timestamps)
+    frames = [
+        {"path": keyframe_pattern % (i + 1), "pts": round(t, 3), "accurate": exact}
+        for i, (t, exact) in enumerate(zip(timestamps, accurate))
+    ]
+    filters, output_arguments = frame_output_options(max_edge, jpeg_quality)
+    if filters:
+        output_arguments = ["-vf", ",".join(filters), *output_arguments]
+
+    if frames:
+        _decode_frames(video_path, frames, output_arguments)
+    missing = [frame for frame in frames if not frame["accurate"] and not os.path.exists(frame["path"])]
+    if missing:
+        _decode_frames(video_path, [{**frame, "accurate": True} for frame in missing], output_arguments)
+    return [{"path": frame["path"], "pts": frame["pts"]} for frame in frames if os.path.exists(frame["path"])]
@@ -0,0 +1,54 @@
+"""
+Compare the WAV round-trip audio path (extract a WAV, then let Whisper decode and resample it)
+against decoding the video's audio once to 16 kHz float32 samples through an FFmpeg pipe.
+Transcription itself is identical for both paths, so only the audio preparation is timed.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_audio --durations 60 600 3600
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from whisper.audio import load_audio
+from app.utils.video_utils import extract_audio, decode_audio
+from benchmarks.synthetic_media import generate_video
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    samples = function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(samples)
+
+def run(durations, width, height):
+    work_dir = tempfile.mkdtemp(prefix="bench_audio_")
+    try:
+        print(f"{'duration':>10} {'mode':>10} {'wall (s)':>10} {'peak MiB':>10} {'disk MiB':>10} {'samples':>12}")
+        for duration in durations:
+            video_path = generate_video(
+                os.path.join(work_dir, f"{duration}_video.mp4"), duration=duration, width=width, height=height, fps=5
+            )
+            wav_path = os.path.join(work_dir, f"{duration}_audio.wav")
+
+            wav = measure(lambda: load_audio(extract_audio(video_path, wav_path)))
+            wav_size = os.path.getsize(wav_path)
+            os.remove(wav_path)
+            pipe = measure(lambda: decode_audio(video_path))
+
+            for mode, (wall, peak, samples), disk in (("wav", wav, wav_size), ("pipe", pipe, 0)):
+                print(f"{duration:>10} {mode:>10} {wall:>10.2f} {peak / 2 ** 20:>10.1f} {disk / 2 ** 20:>10.1f} {samples:>12}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=int, nargs="+", default=[60, 600])
+    parser.add_argument("--width", type=int, default=320)
+    parser.add_argument("--height", type=int, default=240)
+    args = parser.parse_args()
+    run(args.durations, args.width, args.height)
@@ -0,0 +1,209 @@
+"""
+End-to-end benchmark: synthetic videos go through /upload and /generate_summary on a backend
+server running in its own process, with OpenAI replaced by a local stand-in (see fake_openai)
+that answers after a configurable latency. Reports per-stage and end-to-end latency, throughput
+with N concurrent clients and the server's peak RSS, and writes everything to a JSON file tagged
+with the current commit so runs can be compared with --compare.
+
+Every request uses a video with its own tone frequency, so no request is answered from the
+result cache of an earlier one; the LLM response cache is disabled in the server.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_e2e --duration 120 --clients 4 --rounds 2 --latency 0.8 \
+        --whisper-model tiny --output e2e.json [--compare baseline.json]
+"""
+import os
+import sys
+import json
+import time
+import math
+import socket
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.synthetic_media import generate_video
+from benchmarks.fake_openai import FakeOpenAIServer
+
+def serve(port):
+    from werkzeug.serving import make_server
+    from app import create_app
+    make_server("127.0.0.1", port, create_app(), threaded=True).serve_forever()
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _peak_rss_kib(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return None
+
+def _commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "mean": statistics.fmean(ordered),
+        "p50": statistics.median(ordered),
+        "p95": ordered[math.ceil(len(ordered) * 0.95) - 1],
+        "max": ordered[-1],
+    }
+
+def start_server(work_dir, fake_openai, whisper_model):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.getcwd(),
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": fake_openai.base_url,
+        "LLM_CACHE_ENABLED": "false",
+        "WHISPER_MODEL": whisper_model,
+    }
+    # The server's working directory holds its uploads, result cache and job database
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_e2e", "--serve", str(port)], cwd=work_dir, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(600):
+        try:
+            requests.get(f"{base_url}/metrics", timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                raise RuntimeError("Benchmark server exited during startup")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Benchmark server did not start")
+
+def run_request(base_url, video_path):
+    start = time.perf_counter()
+    with open(video_path, "rb") as video_file:
+        upload = requests.post(f"{base_url}/upload?timings=1", files={"file": (os.path.basename(video_path), video_file)})
+    if not upload.ok:
+        raise RuntimeError(f"/upload failed: {upload.text}")
+    uploaded = time.perf_counter()
+    upload = upload.json()
+
+    summary = requests.post(f"{base_url}/generate_summary?timings=1", json={
+        "video_path": upload["video_path"], "audio_path": upload["audio_path"], "content_hash": upload["content_hash"],
+    })
+    if not summary.ok:
+        raise RuntimeError(f"/generate_summary failed: {summary.text}")
+    finished = time.perf_counter()
+    return {
+        "upload_seconds": uploaded - start,
+        "summary_seconds": finished - uploaded,
+        "total_seconds": finished - start,
+        "timings": {**upload.get("timings", {}), **summary.json().get("timings", {})},
+    }
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    try:
+        count = args.clients * args.rounds
+        media_dir = os.path.join(work_dir, "media")
+        os.makedirs(media_dir)
+        videos = [
+            generate_video(
+                os.path.join(media_dir, f"video_{i}.mp4"), duration=args.duration, width=args.width,
+                height=args.height, gop=args.gop, frequency=300 + 10 * i,
+            )
+            for i in range(count)
+        ]
+
+        with FakeOpenAIServer(latency=args.latency, jitter=args.jitter) as fake_openai:
+            process, base_url = start_server(work_dir, fake_openai, args.whisper_model)
+            try:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.clients) as executor:
+                    samples = list(executor.map(lambda video: run_request(base_url, video), videos))
+                wall = time.perf_counter() - start
+                peak_rss = _peak_rss_kib(process.pid)
+            finally:
+                process.terminate()
+                process.wait()
+
+        stages = sorted({stage for sample in samples for stage in sample["timings"]})
+        return {
+            "commit": _commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {name: value for name, value in vars(args).items() if name not in ("serve", "output", "compare")},
+            "requests": count,
+            "wall_seconds": wall,
+            "throughput_videos_per_minute": count * 60 / wall,
+            "end_to_end_seconds": _percentiles([sample["total_seconds"] for sample in samples]),
+            "upload_seconds": _percentiles([sample["upload_seconds"] for sample in samples]),
+            "summary_seconds": _percentiles([sample["summary_seconds"] for sample in samples]),
+            "stage_seconds": {
+                stage: _percentiles([sample["timings"][stage] for sample in samples if stage in sample["timings"]])
+                for stage in stages
+            },
+            "openai_requests": fake_openai.requests,
+            "server_peak_rss_mib": peak_rss / 1024 if peak_rss else None,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _flatten(report):
+    values = {
+        "wall_seconds": report["wall_seconds"],
+        "throughput_videos_per_minute": report["throughput_videos_per_minute"],
+        "server_peak_rss_mib": report["server_peak_rss_mib"],
+        "end_to_end_p50": report["end_to_end_seconds"]["p50"],
+        "end_to_end_p95": report["end_to_end_seconds"]["p95"],
+    }
+    values.update({f"{stage}_p50": stats["p50"] for stage, stats in report["stage_seconds"].items()})
+    return values
+
+def print_report(report, baseline=None):
+    print(f"commit {report['commit']}: {report['requests']} videos, {report['config']['clients']} clients")
+    current = _flatten(report)
+    previous = _flatten(baseline) if baseline else {}
+    header = f"{'metric':>34} {'value':>10}"
+    print(header + (f" {'baseline':>10} {'change':>8}" if baseline else ""))
+    for name, value in current.items():
+        line = f"{name:>34} {value:>10.2f}" if value is not None else f"{name:>34} {'-':>10}"
+        if name in previous and previous[name] and value is not None:
+            line += f" {previous[name]:>10.2f} {(value - previous[name]) / previous[name]:>+8.1%}"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=60, help="Video duration in seconds")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--gop", type=int, default=250, help="Keyframe interval in frames")
+    parser.add_argument("--clients", type=int, default=2, help="Concurrent clients")
+    parser.add_argument("--rounds", type=int, default=1, help="Videos sent by each client")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stand-in OpenAI reply latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--whisper-model", default="tiny")
+    parser.add_argument("--output", help="JSON file for the results (default: bench_e2e_<commit>.json)")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve)
+    else:
+        report = run(args)
+        output = args.output or f"bench_e2e_{report['commit'] or 'local'}.json"
+        with open(output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        baseline = None
+        if args.compare:
+            with open(args.compare) as baseline_file:
+                baseline = json.load(baseline_file)
+        print_report(report, baseline)
+        print(f"results written to {output}")
@@ -0,0 +1,91 @@
+"""
+Compare transcription engines on the same audio: load time, real-time factor (transcription time
+divided by audio duration), peak memory, and word error rate against the first engine.
+Each engine runs in a fresh interpreter so peak RSS is not shared between them.
+
+Without --input a clip of tone bursts separated by pauses is generated with FFmpeg; it is
+enough for speed and memory, but output parity is only meaningful on real speech.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_engines --input talk.mp4 --model base \
+        --engines whisper:fp32 faster-whisper:int8 faster-whisper:fp32
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from benchmarks.bench_transcription import word_error_rate
+
+def generate_audio(output_path, duration=60):
+    """
+    Generate a mono test clip of 440 Hz bursts with pauses, so the audio has speech-like gaps.
+    :param output_path: Path of the generated WAV file.
+    :param duration: Duration in seconds.
+    :return: Path of the generated file.
+    """
+    subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-f", "lavfi",
+         "-i", f"aevalsrc='0.3*sin(2*PI*440*t)*lt(mod(t,4),3)':s=16000:d={duration}", output_path],
+        check=True
+    )
+    return output_path
+
+def child(audio_path, engine, precision, model):
+    from app.utils.video_utils import decode_audio
+    from app.utils.transcription_backends import get_transcription_backend
+
+    samples = decode_audio(audio_path)
+    start = time.perf_counter()
+    backend = get_transcription_backend(engine, model, "cpu", precision)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = backend.transcribe(samples)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "load": load_time,
+        "rtf": elapsed / (len(samples) / 16000),
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "text": result["text"],
+    }))
+
+def run(input_path, engines, model, duration):
+    work_dir = tempfile.mkdtemp(prefix="bench_engines_")
+    try:
+        audio_path = input_path or generate_audio(os.path.join(work_dir, "sample.wav"), duration)
+        print(f"{'engine':>22} {'load (s)':>9} {'RTF':>7} {'peak MiB':>9} {'WER':>7}")
+        reference = None
+        for spec in engines:
+            engine, _, precision = spec.partition(":")
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_engines", "--child", engine, precision,
+                 "--input", audio_path, "--model", model],
+                capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                print(f"{spec:>22} failed: {result.stderr.strip().splitlines()[-1]}")
+                continue
+            report = json.loads(result.stdout.strip().splitlines()[-1])
+            reference = report["text"] if reference is None else reference
+            print(f"{spec:>22} {report['load']:>9.2f} {report['rtf']:>7.3f} {report['peak_rss'] / 1024:>9.1f} "
+                  f"{word_error_rate(reference, report['text']):>7.3f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--engines", nargs="+", default=["whisper:fp32", "faster-whisper:int8"])
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--child", nargs=2, metavar=("ENGINE", "PRECISION"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.input, *args.child, args.model)
+    else:
+        run(args.input, args.engines, args.model, args.duration)
@@ -0,0 +1,65 @@
+"""
+Compare separate audio/keyframe FFmpeg runs against the single-decode extraction stage and
+seek-based keyframe sampling.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_extraction --durations 60 600 1800
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import resource
+from app.utils.video_utils import extract_audio, extract_keyframes, extract_media
+from benchmarks.synthetic_media import generate_video
+
+def _children_cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def measure(function):
+    start_wall, start_cpu = time.perf_counter(), _children_cpu_time()
+    function()
+    return time.perf_counter() - start_wall, _children_cpu_time() - start_cpu
+
+def run(durations, width, height):
+    work_dir = tempfile.mkdtemp(prefix="bench_extraction_")
+    try:
+        print(f"{'duration':>10} {'mode':>10} {'wall (s)':>10} {'cpu (s)':>10}")
+        for duration in durations:
+            video_path = generate_video(
+                os.path.join(work_dir, f"{duration}_video.mp4"), duration=duration, width=width, height=height
+            )
+
+            separate_dir = os.path.join(work_dir, f"separate_{duration}")
+            os.makedirs(separate_dir)
+            separate = measure(lambda: (
+                extract_audio(video_path, os.path.join(separate_dir, "audio.wav")),
+                extract_keyframes(video_path, os.path.join(separate_dir, "keyframes")),
+            ))
+
+            single_dir = os.path.join(work_dir, f"single_{duration}")
+            os.makedirs(single_dir)
+            single = measure(lambda: extract_media(
+                video_path, os.path.join(single_dir, "audio.wav"), os.path.join(single_dir, "keyframes")
+            ))
+
+            seek_dir = os.path.join(work_dir, f"seek_{duration}")
+            os.makedirs(seek_dir)
+            seek = measure(lambda: extract_media(
+                video_path, os.path.join(seek_dir, "audio.wav"), os.path.join(seek_dir, "keyframes"), strategy="seek"
+            ))
+
+            for mode, (wall, cpu) in (("separate", separate), ("single", single), ("seek", seek)):
+                print(f"{duration:>10} {mode:>10} {wall:>10.2f} {cpu:>10.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=int, nargs="+", default=[60, 600])
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+    run(args.durations, args.width, args.height)
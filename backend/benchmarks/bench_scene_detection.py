@@ -0,0 +1,50 @@
+"""
+Measure scene-detection throughput in analysed frames per second.
+
+Reports the end-to-end rate (FFmpeg decode + scoring) on a synthetic video and the
+scoring-only rate on in-memory frame batches.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_scene_detection --duration 600
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from app.utils.scene_detect_utils import (
+    ANALYSIS_WIDTH, ANALYSIS_HEIGHT, BATCH_SIZE, batch_scores, compute_scene_scores,
+)
+from benchmarks.synthetic_media import generate_video
+
+def scoring_throughput(batches=200, batch_size=BATCH_SIZE):
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, size=(batch_size, ANALYSIS_HEIGHT, ANALYSIS_WIDTH), dtype=np.uint8)
+    previous_frame, previous_histogram = None, None
+
+    start = time.perf_counter()
+    for _ in range(batches):
+        _, previous_frame, previous_histogram = batch_scores(frames, previous_frame, previous_histogram)
+    return batches * batch_size / (time.perf_counter() - start)
+
+def end_to_end_throughput(duration, fps):
+    work_dir = tempfile.mkdtemp(prefix="bench_scene_")
+    try:
+        video_path = generate_video(os.path.join(work_dir, "video.mp4"), duration=duration, with_audio=False)
+        start = time.perf_counter()
+        timestamps, _ = compute_scene_scores(video_path, fps=fps)
+        elapsed = time.perf_counter() - start
+        return len(timestamps) / elapsed, elapsed
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=120)
+    parser.add_argument("--fps", type=float, default=4)
+    args = parser.parse_args()
+
+    print(f"scoring only:  {scoring_throughput():,.0f} frames/s")
+    rate, elapsed = end_to_end_throughput(args.duration, args.fps)
+    print(f"decode+score:  {rate:,.0f} frames/s ({elapsed:.2f} s for {args.duration} s of video)")
@@ -0,0 +1,89 @@
+"""
+Report backend startup time and per-worker memory for the Whisper loading modes:
+    eager    the model is loaded while the app is imported (the previous behaviour)
+    lazy     nothing is loaded until the first transcription
+    preload  WHISPER_PRELOAD loads the model in create_app, before workers are forked
+For each mode the app is created in a fresh interpreter, then forked into workers that each make
+sure the model is available, as a pre-fork server would. Worker PSS counts shared pages
+proportionally, so weights shared copy-on-write show up as a lower PSS.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --workers 4 --model base
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+MODES = ("eager", "lazy", "preload")
+
+def _memory_kib():
+    values = {}
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name] = int(rest.split()[0])
+    return values
+
+def child(mode, workers, model):
+    os.environ["WHISPER_MODEL"] = model
+    os.environ["WHISPER_PRELOAD"] = "true" if mode == "preload" else "false"
+
+    start = time.perf_counter()
+    if mode == "eager":
+        # Stand-in for the old module-level whisper.load_model at import time
+        from app.utils.model_registry import get_whisper_model
+        get_whisper_model(model, device="cpu")
+    from app import create_app
+    create_app()
+    startup = time.perf_counter() - start
+    parent_rss = _memory_kib()["Rss"]
+
+    from app.utils import get_whisper_model
+    readers = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        if os.fork() == 0:
+            os.close(read_fd)
+            get_whisper_model(model, device="cpu")
+            os.write(write_fd, json.dumps(_memory_kib()).encode())
+            os._exit(0)
+        os.close(write_fd)
+        readers.append(read_fd)
+
+    # Keep every worker alive until all have reported, so shared pages are counted as shared
+    samples = [json.loads(os.read(fd, 4096)) for fd in readers]
+    for _ in readers:
+        os.wait()
+    print(json.dumps({"startup": startup, "parent_rss": parent_rss, "workers": samples}))
+
+def run(workers, model):
+    print(f"{'mode':>8} {'startup (s)':>12} {'parent RSS MiB':>15} {'worker RSS MiB':>15} {'worker PSS MiB':>15}")
+    for mode in MODES:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode,
+             "--workers", str(workers), "--model", model],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            print(f"{mode:>8} failed: {result.stderr.strip().splitlines()[-1]}")
+            continue
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        rss = sum(sample["Rss"] for sample in report["workers"]) / len(report["workers"])
+        pss = sum(sample["Pss"] for sample in report["workers"]) / len(report["workers"])
+        print(f"{mode:>8} {report['startup']:>12.2f} {report['parent_rss'] / 1024:>15.1f} "
+              f"{rss / 1024:>15.1f} {pss / 1024:>15.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.workers, args.model)
+    else:
+        run(args.workers, args.model)
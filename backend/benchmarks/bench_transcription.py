@@ -0,0 +1,66 @@
+"""
+Measure chunked transcription scaling from 1 to N worker processes against the single-pass
+transcription, reporting wall time, speedup and word error rate relative to the single pass.
+Needs a recording with real speech; the synthetic test videos have none.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_transcription --input talk.mp4 --max-workers 4
+"""
+import os
+import time
+import argparse
+from app.utils.video_utils import decode_audio
+from app.utils.transcription_utils import (
+    transcribe_audio, transcribe_chunked, transcription_pool, _detect_language,
+    TRANSCRIPTION_CHUNK_SECONDS, DEFAULT_MODEL_SPEC,
+)
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word-level Levenshtein distance divided by the reference length.
+    :param reference: Reference text.
+    :param hypothesis: Text to score.
+    :return: Word error rate (0 means identical).
+    """
+    reference, hypothesis = reference.lower().split(), hypothesis.lower().split()
+    previous = list(range(len(hypothesis) + 1))
+    for i, reference_word in enumerate(reference, 1):
+        current = [i]
+        for j, hypothesis_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (reference_word != hypothesis_word),
+            ))
+        previous = current
+    return previous[-1] / max(len(reference), 1)
+
+def run(input_path, max_workers, chunk_seconds):
+    samples = decode_audio(input_path)
+    print(f"audio: {len(samples) / 16000:.1f} s, cores: {os.cpu_count()}")
+
+    start = time.perf_counter()
+    reference = transcribe_audio(samples)
+    baseline = time.perf_counter() - start
+    print(f"{'workers':>8} {'wall (s)':>10} {'speedup':>8} {'WER':>8}")
+    print(f"{'single':>8} {baseline:>10.2f} {1.0:>8.2f} {0.0:>8.3f}")
+
+    for workers in range(1, max_workers + 1):
+        if workers > 1:
+            # Start the pool and load the models before timing, as a long-running server would
+            model_spec = DEFAULT_MODEL_SPEC
+            with transcription_pool(workers, model_spec) as pool:
+                list(pool.map(_detect_language, [samples[:16000 * 5]] * workers, [model_spec] * workers))
+        start = time.perf_counter()
+        result = transcribe_chunked(samples, reference["language"], workers, chunk_seconds)
+        elapsed = time.perf_counter() - start
+        wer = word_error_rate(reference["text"], result["text"])
+        print(f"{workers:>8} {elapsed:>10.2f} {baseline / elapsed:>8.2f} {wer:>8.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-seconds", type=int, default=TRANSCRIPTION_CHUNK_SECONDS)
+    args = parser.parse_args()
+    run(args.input, args.max_workers, args.chunk_seconds)
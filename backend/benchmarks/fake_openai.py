@@ -0,0 +1,110 @@
+"""
+Local stand-in for the OpenAI chat completions API, for benchmarks that must not depend on the
+network or spend tokens. Replies follow the JSON schema requested by the caller (scene analysis
+or summary) after a configurable latency, and report token usage like the real API.
+"""
+import re
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 765
+
+def _prompt_tokens(messages):
+    tokens = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            tokens += len(content) // CHARS_PER_TOKEN
+            continue
+        for part in content:
+            tokens += IMAGE_TOKENS if part["type"] == "image_url" else len(part["text"]) // CHARS_PER_TOKEN
+    return tokens
+
+def _reply(body):
+    schema = body.get("response_format", {}).get("json_schema", {}).get("name")
+    user_content = body["messages"][-1]["content"]
+    if schema == "scene_analysis":
+        numbers = [
+            int(match) for part in user_content if part["type"] == "text"
+            for match in re.findall(r"^Frame (\d+):", part["text"])
+        ]
+        return {"frames": [
+            {"frame_number": number, "description": f"A test pattern with a moving gradient, frame {number}."}
+            for number in numbers
+        ]}
+    if schema == "summary_with_tags":
+        return {"summary": "A synthetic test video showing a colour test pattern with a steady tone.",
+                "tags": ["test pattern", "synthetic", "benchmark"]}
+    return {"text": "ok"}
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server answering POST /v1/chat/completions. Use as a context manager; base_url
+    is what OPENAI_BASE_URL should be set to.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.0, port=0):
+        """
+        :param latency: Seconds every reply is delayed by, standing in for model time.
+        :param jitter: Extra random delay of up to this many seconds.
+        :param port: Port to listen on (0 picks a free one).
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency + random.random() * server.jitter)
+
+                content = json.dumps(_reply(body))
+                prompt_tokens = _prompt_tokens(body["messages"])
+                completion_tokens = len(content) // CHARS_PER_TOKEN
+                payload = json.dumps({
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,31 @@
+import subprocess
+
+def generate_video(output_path, duration=60, width=1280, height=720, fps=25, gop=250, with_audio=True, frequency=440):
+    """
+    Generate a synthetic test video with FFmpeg's lavfi sources.
+    :param output_path: Path of the generated MP4 file.
+    :param duration: Duration in seconds.
+    :param width: Frame width in pixels.
+    :param height: Frame height in pixels.
+    :param fps: Frame rate.
+    :param gop: Keyframe interval in frames (controls how many I-frames the video has).
+    :param with_audio: Whether to add a sine tone audio track.
+    :param frequency: Tone frequency in Hz; different tones give videos with different content hashes.
+    :return: Path of the generated video.
+    """
+    command = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=duration={duration}:size={width}x{height}:rate={fps}",
+    ]
+    if with_audio:
+        command += ["-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=44100:duration={duration}"]
+    command += [
+        "-c:v", "libx264", "-preset", "veryfast", "-g", str(gop), "-keyint_min", str(gop),
+        "-sc_threshold", "0", "-pix_fmt", "yuv420p",
+    ]
+    if with_audio:
+        command += ["-c:a", "aac", "-shortest"]
+    command.append(output_path)
+
+    subprocess.run(command, check=True)
+    return output_path
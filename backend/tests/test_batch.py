@@ -0,0 +1,117 @@
+import io
+import json
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.batch import BatchRunner, collect_videos, completed_videos, main
+from app.cache import ResultCache
+
+@pytest.fixture
+def result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    with patch("app.batch.RESULT_CACHE", cache):
+        yield cache
+
+@pytest.fixture
+def videos(tmp_path):
+    video_dir = tmp_path / "videos"
+    (video_dir / "nested").mkdir(parents=True)
+    paths = [video_dir / "a.mp4", video_dir / "nested" / "b.mkv", video_dir / "c.mov"]
+    for i, path in enumerate(paths):
+        path.write_bytes(f"video {i}".encode())
+    (video_dir / "notes.txt").write_text("not a video")
+    return video_dir
+
+def test_collect_videos_from_directory_and_manifest(tmp_path, videos):
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text('videos/a.mp4\n# comment\n{"video_path": "videos/c.mov", "style": "casual"}\n')
+
+    collected = collect_videos([str(videos)], str(manifest))
+
+    assert [entry["video_path"] for entry in collected[:3]] == [
+        str(videos / "a.mp4"), str(videos / "c.mov"), str(videos / "nested" / "b.mkv"),
+    ]
+    assert collected[3] == {"video_path": str(tmp_path / "videos/a.mp4")}
+    assert collected[4]["style"] == "casual"
+
+@patch("app.batch.summarize_results")
+@patch("app.batch.describe_scenes")
+@patch("app.pipeline.extract_keyframes")
+@patch("app.batch.transcribe_samples")
+@patch("app.batch.load_audio")
+def test_batch_runner_writes_jsonl_and_isolates_failures(mock_load_audio, mock_transcribe, mock_keyframes,
+                                                         mock_describe, mock_summarize, tmp_path, videos,
+                                                         result_cache):
+    mock_load_audio.side_effect = lambda path, timings: np.zeros(16000, dtype=np.float32)
+    mock_transcribe.side_effect = lambda samples, language, model, timings: (
+        {"text": "Hello", "language": "en", "segments": []}
+    )
+    mock_keyframes.side_effect = lambda video, output_dir, **kwargs: (
+        [] if video.endswith("b.mkv") else [f"{output_dir}/keyframe_0001.jpg"]
+    )
+    mock_describe.return_value = {"frames": [{"frame_number": 1, "description": "A desk"}]}
+    mock_summarize.return_value = {"summary": "A summary", "tags": ["desk"]}
+
+    runner = BatchRunner(str(tmp_path / "work"), api_key="test_api_key", whisper_model="base",
+                         transcribe_workers=2, queue_size=1)
+    output = io.StringIO()
+    report = runner.run(collect_videos([str(videos)]), output)
+
+    records = {json.loads(line)["video"].rsplit("/", 1)[-1]: json.loads(line) for line in output.getvalue().splitlines()}
+    assert set(records) == {"a.mp4", "b.mkv", "c.mov"}
+    assert records["a.mp4"]["summary"] == "A summary"
+    assert records["a.mp4"]["transcription"] == "Hello"
+    assert records["b.mkv"]["error"].startswith("extract: No keyframes")
+    assert report["failed"] == 1
+    assert report["stages"]["extract"]["items"] == 3
+    # The failed video skips the later stages
+    assert report["stages"]["describe"]["items"] == 2
+    assert set(report["stages"]["transcribe"]) >= {"busy_seconds", "utilization"}
+
+    # A second run is answered from the result cache
+    runner.run(collect_videos([str(videos / "a.mp4")]), io.StringIO())
+    assert mock_transcribe.call_count == 2
+    assert mock_summarize.call_count == 2
+
+@patch("app.batch.run_windowed_pipeline")
+@patch("app.batch.use_windowed_mode", return_value=True)
+@patch("app.batch.load_audio")
+def test_long_videos_go_through_the_windowed_pipeline(mock_load_audio, mock_use_windowed_mode, mock_windowed,
+                                                      tmp_path, videos, result_cache):
+    mock_windowed.return_value = {
+        "transcription": "Hello", "language": "en", "scene_descriptions": {"frames": []},
+        "summary": "A long lecture", "tags": ["lecture"], "usage": {"summary": {"total_tokens": 10}},
+    }
+
+    runner = BatchRunner(str(tmp_path / "work"), api_key="test_api_key", whisper_model="base")
+    output = io.StringIO()
+    report = runner.run(collect_videos([str(videos / "a.mp4")]), output)
+
+    record = json.loads(output.getvalue())
+    assert record["summary"] == "A long lecture"
+    assert record["transcription"] == "Hello"
+    assert record["usage"] == {"summary": {"total_tokens": 10}}
+    assert report["failed"] == 0
+    # The audio is decoded window by window, never whole
+    mock_load_audio.assert_not_called()
+    video_path = mock_windowed.call_args.args[0]
+    assert video_path.startswith(str(tmp_path / "work"))
+    assert mock_windowed.call_args.args[5] == record["content_hash"]
+    assert not (tmp_path / "work" / record["content_hash"]).exists()
+
+def test_resume_skips_completed_videos(tmp_path, videos):
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"video": str(videos / "a.mp4"), "error": None}) + "\n"
+        + json.dumps({"video": str(videos / "c.mov"), "error": "describe: timeout"}) + "\n"
+        + '{"video": "cut'
+    )
+    assert completed_videos(str(output)) == {str(videos / "a.mp4")}
+
+    with patch("app.batch.BatchRunner.run") as mock_run:
+        mock_run.return_value = {"videos": 0, "failed": 0, "wall_seconds": 0, "throughput_videos_per_minute": 0,
+                                 "stages": {}}
+        main([str(videos), "--output", str(output), "--resume"])
+    processed = [entry["video_path"] for entry in mock_run.call_args.args[0]]
+    assert str(videos / "a.mp4") not in processed
+    assert str(videos / "c.mov") in processed
@@ -0,0 +1,33 @@
+from app.utils.budget_utils import plan_scene_budget, plan_summary_tokens
+
+def test_short_clips_get_few_frames_in_parallel_requests():
+    plan = plan_scene_budget(duration=20, batch_size=4, max_concurrency=4)
+
+    assert plan["num_frames"] == 4
+    assert plan["max_edge"] == 1024 and plan["detail"] == "high"
+    # One frame per request, so the four descriptions are generated at the same time
+    assert plan["batch_size"] == 1
+    assert plan["estimated_seconds"] < plan_scene_budget(duration=None)["estimated_seconds"]
+
+def test_long_videos_keep_coverage_within_the_budget():
+    calm = plan_scene_budget(duration=1200, scene_changes_per_minute=0.5, token_budget=40000, latency_budget=60)
+    busy = plan_scene_budget(duration=1200, scene_changes_per_minute=3, token_budget=40000, latency_budget=60)
+
+    assert calm["num_frames"] == 40
+    assert busy["num_frames"] == 60
+    for plan in (calm, busy):
+        assert plan["estimated_tokens"] <= 40000 and plan["estimated_seconds"] <= 60
+    # The extra frames are paid for with a lower resolution and shorter descriptions
+    assert busy["max_edge"] < 1024 and busy["tokens_per_frame"] < calm["tokens_per_frame"]
+
+def test_frames_are_dropped_only_when_the_cheapest_level_is_over_budget():
+    plan = plan_scene_budget(duration=600, token_budget=2000)
+
+    assert plan["detail"] == "low"
+    assert 1 <= plan["num_frames"] < 20
+    assert plan["estimated_tokens"] <= 2000
+
+def test_summary_tokens_scale_with_the_input():
+    assert plan_summary_tokens(500, "concise") == 400
+    assert plan_summary_tokens(6000, "concise") == 600
+    assert plan_summary_tokens(100000, "detailed") == 2000
@@ -0,0 +1,107 @@
+import io
+import os
+import time
+import hashlib
+import pytest
+from werkzeug.datastructures import FileStorage
+from unittest.mock import patch
+from app.cache import ResultCache, LLMResponseCache, save_and_hash_upload, make_cache_key
+
+def test_save_and_hash_upload(tmp_path):
+    data = b"fake video bytes" * 1000
+    upload = FileStorage(stream=io.BytesIO(data), filename="video.mp4")
+    destination = tmp_path / "video.mp4"
+
+    content_hash, size = save_and_hash_upload(upload, str(destination), chunk_size=1024)
+    assert content_hash == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    assert destination.read_bytes() == data
+
+def test_make_cache_key_depends_on_params():
+    key = make_cache_key("summary", "abc", length="concise", style="formal")
+    assert key == make_cache_key("summary", "abc", style="formal", length="concise")
+    assert key != make_cache_key("summary", "abc", length="detailed", style="formal")
+
+def test_result_cache_hits_and_misses(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    key = make_cache_key("transcription", "abc", language=None, model="base")
+
+    assert cache.get_result(key) is None
+    cache.put_result(key, "abc", "transcription", {"text": "Hello", "language": "en"})
+    assert cache.get_result(key) == {"text": "Hello", "language": "en"}
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["result_entries"] == 1
+
+def test_result_cache_artifacts_and_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path / ".cache"), max_bytes=1500, upload_dir=str(tmp_path), upload_ttl_seconds=60)
+
+    old_dir = tmp_path / "old"
+    old_dir.mkdir()
+    (old_dir / "video.mp4").write_bytes(b"x" * 1000)
+    cache.put_artifacts("old", str(old_dir), {"video_path": str(old_dir / "video.mp4")})
+    assert cache.find_content_hash(str(old_dir)) == "old"
+
+    new_dir = tmp_path / "new"
+    new_dir.mkdir()
+    (new_dir / "video.mp4").write_bytes(b"y" * 1000)
+    cache.put_artifacts("new", str(new_dir), {"video_path": str(new_dir / "video.mp4")})
+
+    # The least recently used upload leaves the index, but its directory may still be in use
+    assert os.path.exists(old_dir)
+    assert cache.get_artifacts("old") is None
+    assert cache.get_artifacts("new") == {"video_path": str(new_dir / "video.mp4")}
+    assert cache.stats()["evictions"] == 1
+
+    # Only once it has been left untouched for the TTL is the evicted directory deleted
+    assert cache.purge_stale_uploads() == 0
+    with patch("app.cache.time.time", return_value=time.time() + 120):
+        assert cache.purge_stale_uploads() == 1
+    assert not os.path.exists(old_dir)
+    assert os.path.exists(new_dir)
+    assert os.path.exists(tmp_path / ".cache")
+
+def test_result_cache_artifacts_depend_on_extraction_settings(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    video_dir = tmp_path / "upload"
+    video_dir.mkdir()
+    payload = {"video_path": str(video_dir / "video.mp4"), "audio_path": None}
+    cache.put_artifacts("abc", str(video_dir), payload, write_audio=False, max_edge=1024)
+
+    assert cache.get_artifacts("abc", write_audio=False, max_edge=1024) == payload
+    # An upload asking for the WAV, or for larger keyframes, has to extract them again
+    assert cache.get_artifacts("abc", write_audio=True, max_edge=1024) is None
+    assert cache.get_artifacts("abc", write_audio=False, max_edge=512) is None
+
+def test_llm_response_cache_expires_entries(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"), max_bytes=1024 * 1024, ttl_seconds=60)
+    assert cache.get("key") is None
+    assert not os.path.exists(tmp_path / "llm.sqlite3")
+
+    with patch("app.cache.time.time", return_value=1000.0):
+        cache.put("key", "gpt-4o-mini", '{"id": "1"}')
+    with patch("app.cache.time.time", return_value=1059.0):
+        assert cache.get("key") == '{"id": "1"}'
+    with patch("app.cache.time.time", return_value=1061.0):
+        assert cache.get("key") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["expired"] == 1
+    assert stats["entries"] == 0
+
+def test_llm_response_cache_evicts_least_recently_used(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"), max_bytes=250, ttl_seconds=0)
+    with patch("app.cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+        cache.put("a", "gpt-4o-mini", "a" * 100)
+        cache.put("b", "gpt-4o-mini", "b" * 100)
+        assert cache.get("a") == "a" * 100
+        cache.put("c", "gpt-4o-mini", "c" * 100)
+
+    # "b" was used least recently once "a" was read again
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" * 100
+    assert cache.get("c") == "c" * 100
+    assert cache.stats()["evictions"] == 1
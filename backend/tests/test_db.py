@@ -0,0 +1,26 @@
+import sqlite3
+import pytest
+from app.db import connect
+
+def test_connect_commits_and_closes(tmp_path):
+    db_path = str(tmp_path / "test.sqlite3")
+    with connect(db_path) as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+        conn.execute("INSERT INTO items VALUES ('a')")
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    with connect(db_path) as conn:
+        assert conn.execute("SELECT name FROM items").fetchall() == [("a",)]
+
+def test_connect_rolls_back_on_error(tmp_path):
+    db_path = str(tmp_path / "test.sqlite3")
+    with connect(db_path) as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+
+    with pytest.raises(RuntimeError):
+        with connect(db_path) as conn:
+            conn.execute("INSERT INTO items VALUES ('a')")
+            raise RuntimeError("Failed halfway")
+    with connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from PIL import Image
+from unittest.mock import patch
+from app.utils.frame_utils import deduplicate_frames, remap_scene_frames, estimate_image_tokens, hamming_distances, _count_bits
+
+def save_image(path, array):
+    Image.fromarray(array).save(path, format="JPEG")
+    return str(path)
+
+@pytest.fixture
+def keyframes(tmp_path):
+    y, x = np.indices((240, 320))
+    gradient = (127 + 60 * np.sin(x / 25.0) + 60 * np.cos(y / 35.0)).astype(np.uint8)
+    noisy = np.clip(gradient.astype(np.int16) + 3, 0, 255).astype(np.uint8)
+    checker = ((np.indices((240, 320)).sum(axis=0) // 40) % 2 * 255).astype(np.uint8)
+    return [
+        save_image(tmp_path / "frame_0001.jpeg", gradient),
+        save_image(tmp_path / "frame_0002.jpeg", noisy),
+        save_image(tmp_path / "frame_0003.jpeg", checker),
+    ]
+
+@pytest.mark.parametrize("method", ["dhash", "phash"])
+def test_deduplicate_frames_drops_near_duplicates(keyframes, method):
+    dedup = deduplicate_frames(keyframes, method=method)
+
+    assert dedup["kept"] == [0, 2]
+    assert dedup["replaced"] == {0: [1], 2: []}
+    assert dedup["stats"]["frames_dropped"] == 1
+    assert dedup["stats"]["estimated_tokens_saved"] == estimate_image_tokens(320, 240)
+
+def test_deduplicate_frames_estimates_savings_at_the_sent_detail(keyframes):
+    low = deduplicate_frames(keyframes, detail="low")
+    assert low["stats"]["estimated_tokens_saved"] == estimate_image_tokens(320, 240, detail="low")
+
+    # Frames are estimated at the size they are downscaled to before sending
+    with patch("app.utils.frame_utils.estimate_image_tokens", return_value=255) as mock_estimate:
+        deduplicate_frames(keyframes, max_edge=160)
+    mock_estimate.assert_called_once_with(160, 120, "high")
+
+def test_deduplicate_frames_without_frames():
+    dedup = deduplicate_frames([])
+
+    assert dedup["kept"] == []
+    assert dedup["replaced"] == {}
+    assert dedup["stats"] == {"frames_total": 0, "frames_sent": 0, "frames_dropped": 0, "estimated_tokens_saved": 0}
+
+def test_remap_scene_frames_restores_original_numbering(keyframes):
+    dedup = {"kept": [0, 2], "replaced": {0: [1], 2: []}, "stats": {"frames_dropped": 1}}
+    scene_descriptions = {"frames": [
+        {"frame_number": 1, "description": "Gradient"},
+        {"frame_number": 2, "description": "Checkerboard"},
+    ]}
+
+    result = remap_scene_frames(scene_descriptions, keyframes, dedup)
+    assert [frame["frame_number"] for frame in result["frames"]] == [1, 3]
+    assert result["frames"][1]["frame_path"] == keyframes[2]
+    assert result["frames"][0]["replaces"] == [{"frame_number": 2, "frame_path": keyframes[1]}]
+    assert result["dedup"] == {"frames_dropped": 1}
+
+def test_estimate_image_tokens():
+    assert estimate_image_tokens(512, 512) == 85 + 170
+    assert estimate_image_tokens(3840, 2160) == 85 + 170 * 6
+    assert estimate_image_tokens(3840, 2160, detail="low") == 85
+
+def test_hamming_distances_without_numpy_bitwise_count():
+    hashes = np.array([0, 0b1011, 2 ** 64 - 1], dtype=np.uint64)
+    expected = [[0, 3, 64], [3, 0, 61], [64, 61, 0]]
+
+    assert hamming_distances(hashes).tolist() == expected
+    # The fallback used on NumPy 1.x gives the same distances
+    assert _count_bits(hashes[:, None] ^ hashes[None, :]).tolist() == expected
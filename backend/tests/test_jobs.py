@@ -0,0 +1,82 @@
+import time
+import pytest
+from unittest.mock import patch
+from app.jobs import JobStore, JobQueue, QueueFullError, run_job
+
+def wait_for(store, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("Job did not finish in time")
+
+@patch("app.jobs.run_summary_pipeline")
+def test_job_queue_runs_job_and_records_stages(mock_pipeline, tmp_path):
+    def fake_pipeline(on_stage=None, **params):
+        on_stage("transcription", "done")
+        return {"summary": "Test summary", "tags": ["Tag1"]}
+
+    mock_pipeline.side_effect = fake_pipeline
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")), backend="thread", max_workers=1)
+
+    job_id = queue.submit({"video_path": "video.mp4", "audio_path": "audio.wav"})
+    job = wait_for(queue.store, job_id)
+    queue.shutdown()
+
+    assert job["status"] == "done"
+    assert job["result"] == {"summary": "Test summary", "tags": ["Tag1"]}
+    assert job["stages"]["transcription"] == "done"
+    assert job["stages"]["summary"] == "pending"
+
+@patch("app.jobs.run_summary_pipeline")
+def test_run_job_records_failure(mock_pipeline, tmp_path):
+    mock_pipeline.side_effect = RuntimeError("Whisper transcription error")
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    job_id = store.create({"video_path": "video.mp4", "audio_path": "audio.wav"})
+    run_job(store.db_path, job_id)
+
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "Whisper transcription error"
+
+def test_job_queue_rejects_when_full(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(store, max_workers=1, max_pending=1)
+    store.create({"video_path": "video.mp4", "audio_path": "audio.wav"})
+
+    with pytest.raises(QueueFullError) as exc_info:
+        queue.submit({"video_path": "video.mp4", "audio_path": "audio.wav"})
+    assert exc_info.value.retry_after > 0
+
+def test_expired_leases_are_reclaimed_after_restart(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create({"video_path": "video.mp4", "audio_path": "audio.wav"}, owner="crashed", lease_seconds=-1)
+    assert store.claim(job_id, "crashed")
+
+    # A fresh store over the same database sees the interrupted job again once its lease has expired
+    restarted = JobStore(store.db_path)
+    assert restarted.reclaim_expired("restarted") == [job_id]
+    assert restarted.get(job_id)["status"] == "queued"
+    assert not restarted.claim(job_id, "crashed")
+    assert restarted.claim(job_id, "restarted")
+
+def test_jobs_of_live_workers_are_not_reclaimed(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    queued = store.create({"video_path": "video.mp4", "audio_path": "audio.wav"}, owner="worker-1")
+    running = store.create({"video_path": "video.mp4", "audio_path": "audio.wav"}, owner="worker-1")
+    assert store.claim(running, "worker-1")
+
+    # Another gunicorn worker starting up leaves both jobs with their owner
+    assert JobStore(store.db_path).reclaim_expired("worker-2") == []
+    assert store.get(queued)["status"] == "queued"
+    assert store.get(running)["status"] == "running"
+    assert store.renew_leases("worker-1") == 2
+
+def test_create_checks_depth_in_the_same_transaction(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    assert store.create({"video_path": "video.mp4"}, max_active=1) is not None
+    assert store.create({"video_path": "video.mp4"}, max_active=1) is None
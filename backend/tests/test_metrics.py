@@ -0,0 +1,50 @@
+import pytest
+from unittest.mock import MagicMock
+from app.metrics import MetricsRegistry, METRICS, stage_timer, record_token_usage
+from app.utils.openai_client import track_usage, run_async, _record_usage
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.observe("stage_duration_seconds", 0.05, stage="summary")
+    registry.observe("stage_duration_seconds", 0.5, stage="summary")
+    registry.increment("frames_total", 12, stage="keyframes")
+
+    text = registry.render({"openai_client_in_flight": 0})
+
+    assert 'frames_total{stage="keyframes"} 12' in text
+    assert 'stage_duration_seconds_bucket{stage="summary",le="0.1"} 1' in text
+    assert 'stage_duration_seconds_bucket{stage="summary",le="1"} 2' in text
+    assert 'stage_duration_seconds_bucket{stage="summary",le="+Inf"} 2' in text
+    assert 'stage_duration_seconds_count{stage="summary"} 2' in text
+    assert "# TYPE openai_client_in_flight gauge\nopenai_client_in_flight 0" in text
+
+def test_stage_timer_records_timings_and_errors():
+    METRICS.reset()
+    timings = {}
+    with stage_timer("transcription", timings):
+        pass
+    with pytest.raises(RuntimeError):
+        with stage_timer("summary", timings):
+            raise RuntimeError("boom")
+
+    assert set(timings) == {"transcription", "summary"}
+    assert METRICS.histogram("stage_duration_seconds", stage="transcription").count == 1
+    assert METRICS.counter("stage_errors_total", stage="summary") == 1
+    assert METRICS.counter("stage_errors_total", stage="transcription") == 0
+
+def test_track_usage_follows_calls_onto_the_event_loop():
+    METRICS.reset()
+    response = MagicMock(usage=MagicMock(prompt_tokens=100, completion_tokens=20))
+
+    async def call():
+        _record_usage(response, estimated_tokens=120)
+
+    with track_usage() as usage:
+        run_async(call())
+        _record_usage(response, estimated_tokens=120)
+    _record_usage(response, estimated_tokens=120)
+
+    # Only the two calls made inside the block are attributed to it
+    assert usage == {"requests": 2, "prompt_tokens": 200, "completion_tokens": 40, "estimated_tokens": 240}
+    record_token_usage("scenes", usage)
+    assert METRICS.counter("openai_prompt_tokens_total", stage="scenes") == 200
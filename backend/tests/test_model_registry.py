@@ -0,0 +1,42 @@
+import os
+import sys
+import pytest
+import subprocess
+from unittest.mock import patch, MagicMock
+from app.utils import model_registry
+from app.utils.model_registry import get_whisper_model, preload_whisper_model
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    model_registry._models.clear()
+    yield
+    model_registry._models.clear()
+
+def test_importing_the_app_does_not_load_whisper(tmp_path):
+    code = "import sys; from app import create_app; create_app(); print('whisper' in sys.modules, 'torch' in sys.modules)"
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=tmp_path, env={**os.environ, "PYTHONPATH": backend_dir},
+        capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["False", "False"]
+
+@patch("whisper.load_model")
+def test_models_are_cached_per_size_device_and_precision(mock_load_model):
+    mock_load_model.side_effect = lambda name, device: MagicMock(name=f"{name}-{device}")
+
+    base = get_whisper_model("tiny", device="cpu")
+    assert get_whisper_model("tiny", device="cpu") is base
+    assert get_whisper_model("small", device="cpu") is not base
+    assert mock_load_model.call_count == 2
+
+    with pytest.raises(ValueError):
+        get_whisper_model("tiny", device="cpu", precision="fp16")
+
+@patch("whisper.load_model")
+def test_preload_with_warm_up(mock_load_model):
+    model = preload_whisper_model("base", device="cpu", warm_up=True)
+
+    assert model is mock_load_model.return_value
+    # One short transcription runs before the first request
+    model.transcribe.assert_called_once()
@@ -0,0 +1,152 @@
+import json
+import asyncio
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from app.cache import LLMResponseCache
+from app.utils.openai_client import (
+    TokenBucketLimiter, CLIENT_METRICS, get_client, get_async_client, chat_completion, chat_completion_async,
+    run_async, set_response_cache, response_cache_key,
+)
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "pong"},
+        "finish_reason": "stop",
+    }],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+}
+
+@pytest.fixture(autouse=True)
+def no_response_cache():
+    set_response_cache(None)
+    yield
+    set_response_cache(None)
+
+@pytest.fixture
+def stand_in_server():
+    """Local OpenAI stand-in that rate-limits the first request and answers the rest."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            requests.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            if len(requests) == 1:
+                body, status, headers = b'{"error": {"message": "slow down"}}', 429, {"retry-after-ms": "10"}
+            else:
+                body, status, headers = json.dumps(COMPLETION).encode(), 200, {}
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1", requests
+    server.shutdown()
+    server.server_close()
+
+def test_chat_completion_retries_after_rate_limit(stand_in_server):
+    base_url, requests = stand_in_server
+    CLIENT_METRICS.reset()
+
+    client = get_client("test_api_key", base_url=base_url)
+    assert get_client("test_api_key", base_url=base_url) is client
+
+    messages = [{"role": "user", "content": "ping"}]
+    response = chat_completion(client, model="gpt-4o-mini", messages=messages)
+
+    assert response.choices[0].message.content == "pong"
+    assert len(requests) == 2
+    metrics = CLIENT_METRICS.snapshot()
+    assert metrics["requests"] == 2
+    assert metrics["retries"] == 1
+    assert metrics["errors"] == 0
+    assert metrics["in_flight"] == 0
+    assert metrics["prompt_tokens"] == 5
+
+def test_async_chat_completion_runs_on_shared_loop(stand_in_server):
+    base_url, requests = stand_in_server
+    CLIENT_METRICS.reset()
+
+    client = get_async_client("test_api_key", base_url=base_url)
+    messages = [{"role": "user", "content": "ping"}]
+    for _ in range(2):
+        response = run_async(chat_completion_async(client, model="gpt-4o-mini", messages=messages))
+        assert response.choices[0].message.content == "pong"
+
+    assert len(requests) == 3
+    assert CLIENT_METRICS.snapshot()["retries"] == 1
+
+def test_chat_completion_answers_repeated_requests_from_cache(stand_in_server, tmp_path):
+    base_url, requests = stand_in_server
+    CLIENT_METRICS.reset()
+    set_response_cache(LLMResponseCache(str(tmp_path / "llm.sqlite3"), max_bytes=1024 * 1024, ttl_seconds=60))
+
+    client = get_client("test_api_key", base_url=base_url)
+    messages = [{"role": "user", "content": "ping"}]
+    first = chat_completion(client, model="gpt-4o-mini", messages=messages)
+    second = run_async(chat_completion_async(
+        get_async_client("test_api_key", base_url=base_url), model="gpt-4o-mini", messages=messages
+    ))
+
+    assert second.choices[0].message.content == first.choices[0].message.content == "pong"
+    assert len(requests) == 2  # the rate-limited attempt and the answered one; the repeat never reached the server
+    assert CLIENT_METRICS.snapshot()["cache_hits"] == 1
+
+    # A different schema (or model, or prompt) is a different request
+    assert response_cache_key(model="gpt-4o-mini", messages=messages) != response_cache_key(
+        model="gpt-4o-mini", messages=messages, response_format={"type": "json_object"}
+    )
+
+def test_async_chat_completion_keeps_cache_io_off_the_event_loop(stand_in_server):
+    base_url, _ = stand_in_server
+    calls = []
+
+    class RecordingCache:
+        def _record(self, name):
+            try:
+                asyncio.get_running_loop()
+                calls.append((name, "event loop"))
+            except RuntimeError:
+                calls.append((name, "worker thread"))
+
+        def get(self, key):
+            self._record("get")
+            return None
+
+        def put(self, key, model, value):
+            self._record("put")
+
+    set_response_cache(RecordingCache())
+    client = get_async_client("test_api_key", base_url=base_url)
+    run_async(chat_completion_async(client, model="gpt-4o-mini", messages=[{"role": "user", "content": "ping"}]))
+
+    assert calls == [("get", "worker thread"), ("put", "worker thread")]
+
+def test_token_bucket_limiter_waits_for_capacity():
+    with patch("app.utils.openai_client.time.monotonic", return_value=100.0):
+        limiter = TokenBucketLimiter(requests_per_minute=2, tokens_per_minute=0)
+        assert limiter.reserve(100) == 0
+        assert limiter.reserve(100) == 0
+        # The request budget is spent: one more request needs half a minute to refill
+        assert limiter.reserve(100) == pytest.approx(30.0)
+
+        limiter = TokenBucketLimiter(requests_per_minute=0, tokens_per_minute=600)
+        assert limiter.reserve(500) == 0
+        assert limiter.reserve(400) == pytest.approx(30.0)
+        # Returning unused tokens from the estimate frees capacity for the next caller
+        limiter.adjust(estimated_tokens=400, actual_tokens=50)
+        assert limiter.reserve(50) == 0
@@ -0,0 +1,405 @@
+import os
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.cache import ResultCache
+from app.checkpoints import CheckpointStore, stage_manifest, input_digest
+from app.search import SearchIndex
+from app.pipeline import resummarize, run_summary_pipeline, run_windowed_pipeline, stage_cache_keys, summarize_results
+
+@pytest.fixture
+def result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    with patch("app.pipeline.RESULT_CACHE", cache):
+        yield cache
+
+@pytest.fixture(autouse=True)
+def search_index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search" / "index.sqlite3"))
+    with patch("app.pipeline.SEARCH_INDEX", index):
+        yield index
+
+@patch("app.pipeline.generate_summary_with_gpt")
+def test_resummarize_reuses_stored_stages(mock_generate_summary, result_cache):
+    keys = stage_cache_keys("abc", None, "detailed", "casual", "base")
+    transcription = {"text": "Hello world", "language": "en", "segments": []}
+    scenes = {"frames": [{"frame_number": 1, "description": "A desk"}]}
+    result_cache.put_result(keys["transcription"], "abc", "transcription", transcription)
+    result_cache.put_result(keys["scenes"], "abc", "scenes", scenes)
+    def generate_summary(token_plan=None, **kwargs):
+        token_plan.update(input_tokens=120, max_tokens=800)
+        return "A casual summary", ["desk"]
+
+    mock_generate_summary.side_effect = generate_summary
+
+    plans = []
+    for _ in range(2):
+        result = resummarize("abc", length="detailed", style="casual", api_key="test_api_key", whisper_model="base")
+        assert result["summary"] == "A casual summary"
+        assert result["transcription"] == "Hello world"
+        assert result["scene_descriptions"] == scenes
+        plans.append(result["summary_plan"])
+    assert plans == [{"input_tokens": 120, "max_tokens": 800}, None]
+
+    # The second call is answered from the stored summary
+    mock_generate_summary.assert_called_once()
+    assert mock_generate_summary.call_args.kwargs["style"] == "casual"
+
+def test_resummarize_needs_processed_video(result_cache):
+    with pytest.raises(LookupError):
+        resummarize("unknown", api_key="test_api_key")
+
+@patch("app.pipeline.summarize_results")
+@patch("app.pipeline.describe_scenes")
+@patch("app.pipeline.transcribe_samples")
+@patch("app.pipeline.load_audio")
+def test_retry_only_repeats_the_failed_stage(mock_load_audio, mock_transcribe, mock_describe, mock_summarize,
+                                             tmp_path, result_cache, search_index):
+    video_dir = tmp_path / "upload"
+    (video_dir / "keyframes").mkdir(parents=True)
+    (video_dir / "video.mp4").write_bytes(b"video")
+    for i in range(2):
+        (video_dir / "keyframes" / f"keyframe_{i:04d}.jpeg").write_bytes(b"jpeg")
+    mock_load_audio.return_value = np.zeros(16000, dtype=np.float32)
+    mock_transcribe.return_value = {"text": "Hello world", "language": "en", "segments": []}
+    mock_describe.return_value = {"frames": [{"frame_number": 1, "description": "A desk"}]}
+    mock_summarize.side_effect = [RuntimeError("GPT summarization error: timeout"), {"summary": "Done", "tags": []}]
+
+    def run(**options):
+        stages = []
+        result = run_summary_pipeline(
+            str(video_dir / "video.mp4"), None, api_key="test_api_key", whisper_model="base",
+            on_stage=lambda stage, status: stages.append((stage, status)), **options,
+        )
+        return result, stages
+
+    with pytest.raises(RuntimeError):
+        run()
+    assert set(os.listdir(video_dir / "checkpoints")) == {"transcription.json", "keyframes.json", "scenes.json"}
+
+    result, stages = run()
+    assert result["summary"] == "Done"
+    assert ("transcription", "cached") in stages and ("scenes", "cached") in stages
+    mock_transcribe.assert_called_once()
+    mock_describe.assert_called_once()
+    assert mock_summarize.call_count == 2
+
+    # A new style only changes the summary's manifest
+    mock_summarize.side_effect = None
+    mock_summarize.return_value = {"summary": "Casual", "tags": []}
+    result, _ = run(style="casual")
+    assert result["summary"] == "Casual"
+    mock_transcribe.assert_called_once()
+    mock_describe.assert_called_once()
+    # Finished runs are indexed under the upload id, re-indexing replaces the earlier entries
+    assert [hit["video_id"] for hit in search_index.search("casual")] == ["upload"]
+    assert search_index.stats() == {"videos": 1, "entries": 3}
+
+@patch("app.pipeline.summarize_results")
+@patch("app.pipeline.describe_scenes")
+@patch("app.pipeline.transcribe_samples")
+@patch("app.pipeline.load_audio")
+def test_summary_of_failed_scenes_is_not_reused(mock_load_audio, mock_transcribe, mock_describe, mock_summarize,
+                                                tmp_path, result_cache):
+    mock_load_audio.return_value = np.zeros(16000, dtype=np.float32)
+    mock_transcribe.return_value = {"text": "Hello world", "language": "en", "segments": []}
+    mock_describe.side_effect = [
+        {"error": "vision timeout"},
+        {"frames": [{"frame_number": 1, "description": "A desk"}]},
+    ]
+    mock_summarize.side_effect = [{"summary": "Speech only", "tags": []}, {"summary": "With scenes", "tags": []}]
+
+    results = []
+    # Two uploads of the same bytes share the result cache
+    for upload in ("first", "second"):
+        video_dir = tmp_path / upload
+        (video_dir / "keyframes").mkdir(parents=True)
+        (video_dir / "video.mp4").write_bytes(b"video")
+        (video_dir / "keyframes" / "keyframe_0001.jpeg").write_bytes(b"jpeg")
+        results.append(run_summary_pipeline(
+            str(video_dir / "video.mp4"), None, content_hash="abc", api_key="test_api_key", whisper_model="base",
+        ))
+
+    assert results[0]["summary"] == "Speech only"
+    assert results[1]["summary"] == "With scenes"
+    assert mock_summarize.call_count == 2
+
+@patch("app.pipeline.generate_summary_with_gpt")
+@patch("app.pipeline.analyze_scenes_with_gpt_vision")
+@patch("app.pipeline.transcribe_samples")
+@patch("app.pipeline.load_audio")
+def test_short_clip_is_planned_and_reports_token_usage(mock_load_audio, mock_transcribe, mock_vision, mock_summary,
+                                                       tmp_path, result_cache):
+    import subprocess
+    from unittest.mock import MagicMock
+    from app.utils.openai_client import _record_usage
+    video_dir = tmp_path / "upload"
+    (video_dir / "keyframes").mkdir(parents=True)
+    # A 7 second clip with an I-frame every second, extracted like /upload does
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=duration=7:size=160x120:rate=10",
+         "-g", "10", "-pix_fmt", "yuv420p", str(video_dir / "video.mp4")],
+        check=True
+    )
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(video_dir / "video.mp4"), "-vf", "select=eq(pict_type\\,I)",
+         "-vsync", "vfr", str(video_dir / "keyframes" / "keyframe_%04d.jpeg")],
+        check=True
+    )
+    mock_load_audio.return_value = np.zeros(16000, dtype=np.float32)
+    mock_transcribe.return_value = {"text": "Hello world", "language": "en", "segments": []}
+
+    def vision(images, *args, **kwargs):
+        _record_usage(MagicMock(usage=MagicMock(prompt_tokens=800, completion_tokens=90)), estimated_tokens=1100)
+        return {"frames": [{"frame_number": i + 1, "description": "A test card", "frame_path": path}
+                           for i, path in enumerate(images)]}
+
+    def summary(**kwargs):
+        _record_usage(MagicMock(usage=MagicMock(prompt_tokens=300, completion_tokens=60)), estimated_tokens=700)
+        return "A test card", ["test"]
+
+    mock_vision.side_effect = vision
+    mock_summary.side_effect = summary
+
+    result = run_summary_pipeline(str(video_dir / "video.mp4"), None, api_key="test_api_key", whisper_model="base")
+
+    plan = result["scene_plan"]
+    assert plan["duration"] == pytest.approx(7, abs=0.5)
+    assert plan["num_frames"] == 4 and plan["batch_size"] == 1
+    assert len(mock_vision.call_args.args[0]) <= 4
+    assert mock_vision.call_args.kwargs["detail"] == plan["detail"]
+    assert result["usage"]["summary"] == {
+        "requests": 1, "prompt_tokens": 300, "completion_tokens": 60, "estimated_tokens": 700,
+    }
+    assert result["usage"]["scenes"]["estimated_tokens"] == 1100
+
+def test_checkpoint_requires_matching_manifest(tmp_path):
+    checkpoints = CheckpointStore(str(tmp_path))
+    manifest = stage_manifest("summary", {"transcription": input_digest({"text": "a"})}, {"style": "formal"})
+    checkpoints.save("summary", manifest, {"summary": "A", "tags": []})
+
+    assert checkpoints.load("summary", manifest) == {"summary": "A", "tags": []}
+    changed = stage_manifest("summary", {"transcription": input_digest({"text": "b"})}, {"style": "formal"})
+    assert checkpoints.load("summary", changed) is None
+    assert checkpoints.load("scenes", manifest) is None
+
+@patch("app.pipeline.summarize_results")
+@patch("app.pipeline.describe_scenes")
+@patch("app.pipeline.extract_frames_at")
+@patch("app.pipeline.transcribe_samples")
+@patch("app.pipeline.iter_audio_windows")
+def test_windowed_pipeline_resumes_after_the_last_finished_window(mock_windows, mock_transcribe, mock_frames,
+                                                                  mock_describe, mock_summarize, tmp_path):
+    video_dir = tmp_path / "upload"
+    video_dir.mkdir()
+    (video_dir / "video.mp4").write_bytes(b"video")
+    mock_windows.side_effect = lambda source, window_seconds: iter(
+        [(i * 600.0, np.zeros(600 * 16000, dtype=np.float32)) for i in range(3)]
+    )
+    transcriptions = [
+        {"text": f"Part {i}.", "language": "en", "segments": [{"start": 1.0, "end": 2.0, "text": f"Part {i}."}]}
+        for i in range(3)
+    ]
+    mock_transcribe.side_effect = [*transcriptions[:2], RuntimeError("Whisper transcription error: OOM"),
+                                   transcriptions[2]]
+    mock_frames.side_effect = lambda video, output_dir, timestamps, **kwargs: [
+        {"path": f"{output_dir}/frame_{i}.jpeg", "pts": t} for i, t in enumerate(timestamps)
+    ]
+    mock_describe.side_effect = lambda paths, *args, **kwargs: {
+        "frames": [{"frame_number": i + 1, "frame_path": path, "description": "A slide"} for i, path in enumerate(paths)]
+    }
+    mock_summarize.return_value = {"summary": "A long lecture", "tags": ["lecture"]}
+
+    def run():
+        return run_windowed_pipeline(str(video_dir / "video.mp4"), None, api_key="test_api_key",
+                                     whisper_model="base", frames_per_window=2)
+
+    with pytest.raises(RuntimeError):
+        run()
+    result = run()
+
+    # The two finished windows come from their checkpoints
+    assert mock_transcribe.call_count == 4
+    assert mock_transcribe.call_args.args[1] == "en"
+    assert result["transcription"] == "Part 0. Part 1. Part 2."
+    frames = result["scene_descriptions"]["frames"]
+    assert [frame["frame_number"] for frame in frames] == [1, 2, 3, 4, 5, 6]
+    assert [frame["pts"] for frame in frames[:3]] == [150.0, 450.0, 750.0]
+
+    # Segments and scenes are summarized with absolute timestamps
+    assert [segment["start"] for segment in mock_summarize.call_args.args[0]["segments"]] == [1.0, 601.0, 1201.0]
+    assert mock_summarize.call_args.args[1] == result["scene_descriptions"]
+
+@patch("app.pipeline.generate_summary_with_gpt", return_value=("A lecture", []))
+def test_timestamped_scenes_are_summarized_in_the_timeline(mock_generate_summary):
+    transcription = {"text": "Hello. Bye.", "language": "en", "segments": [
+        {"start": 1.0, "end": 2.0, "text": "Hello."}, {"start": 601.0, "end": 602.0, "text": "Bye."},
+    ]}
+    scenes = {"frames": [{"frame_number": 1, "description": "A slide", "pts": 150.0}]}
+
+    summarize_results(transcription, scenes, "concise", "formal", "test_api_key")
+
+    kwargs = mock_generate_summary.call_args.kwargs
+    assert [part["start"] for part in kwargs["segments"]] == [1.0, 150.0, 601.0]
+    assert kwargs["transcription"] == "Hello. [Scene] A slide Bye."
+    assert kwargs["scene_descriptions"] == {"frames": []}
+
+@patch("app.pipeline.generate_summary_with_gpt")
+@patch("app.pipeline.describe_scenes")
+@patch("app.pipeline.extract_frames_at")
+@patch("app.pipeline.transcribe_samples")
+@patch("app.pipeline.iter_audio_windows")
+def test_windowed_results_can_be_resummarized(mock_windows, mock_transcribe, mock_frames, mock_describe,
+                                              mock_generate_summary, tmp_path, result_cache):
+    video_dir = tmp_path / "upload"
+    video_dir.mkdir()
+    (video_dir / "video.mp4").write_bytes(b"video")
+    mock_windows.return_value = iter([(i * 600.0, np.zeros(600 * 16000, dtype=np.float32)) for i in range(2)])
+    mock_transcribe.return_value = {"text": "Words.", "language": "en", "segments": []}
+    mock_frames.side_effect = lambda video, output_dir, timestamps, **kwargs: [
+        {"path": f"{output_dir}/frame_{i}.jpeg", "pts": t} for i, t in enumerate(timestamps)
+    ]
+    mock_describe.side_effect = lambda paths, *args, **kwargs: {
+        "frames": [{"frame_number": i + 1, "frame_path": path, "description": "A slide"} for i, path in enumerate(paths)]
+    }
+    mock_generate_summary.side_effect = lambda style=None, **kwargs: (f"A {style} lecture", [])
+
+    result = run_windowed_pipeline(str(video_dir / "video.mp4"), None, api_key="test_api_key",
+                                   content_hash="abc", whisper_model="base", frames_per_window=2)
+    assert result["summary"] == "A formal lecture"
+
+    # The stored summary answers the same request, another style only costs the summary
+    assert resummarize("abc", api_key="test_api_key", whisper_model="base")["summary"] == "A formal lecture"
+    casual = resummarize("abc", style="casual", api_key="test_api_key", whisper_model="base")
+    assert casual["summary"] == "A casual lecture"
+    assert casual["scene_descriptions"] == result["scene_descriptions"]
+    assert mock_generate_summary.call_count == 2
+    assert mock_generate_summary.call_args.kwargs["scene_descriptions"] == {"frames": []}
+
+@patch("app.pipeline.summarize_results")
+@patch("app.pipeline.describe_scenes")
+@patch("app.pipeline.extract_frames_at")
+@patch("app.pipeline.transcribe_samples")
+@patch("app.pipeline.iter_audio_windows")
+def test_windowed_pipeline_sums_the_window_plans(mock_windows, mock_transcribe, mock_frames, mock_describe,
+                                                 mock_summarize, tmp_path):
+    video_dir = tmp_path / "upload"
+    video_dir.mkdir()
+    (video_dir / "video.mp4").write_bytes(b"video")
+    mock_windows.return_value = iter([(i * 600.0, np.zeros(600 * 16000, dtype=np.float32)) for i in range(2)])
+    mock_transcribe.return_value = {"text": "Words.", "language": "en", "segments": []}
+    mock_frames.side_effect = lambda video, output_dir, timestamps, **kwargs: [
+        {"path": f"{output_dir}/frame_{i}.jpeg", "pts": t} for i, t in enumerate(timestamps)
+    ]
+    mock_describe.side_effect = lambda paths, *args, **kwargs: {
+        "frames": [{"frame_number": i + 1, "frame_path": path, "description": "A slide"} for i, path in enumerate(paths)]
+    }
+
+    def summarize(*args, plan=None, **kwargs):
+        plan.update(input_tokens=900, max_tokens=400)
+        return {"summary": "A lecture", "tags": []}
+
+    mock_summarize.side_effect = summarize
+
+    result = run_windowed_pipeline(str(video_dir / "video.mp4"), None, api_key="test_api_key",
+                                   whisper_model="base", frames_per_window=3)
+
+    window_plan = mock_describe.call_args.kwargs["plan"]
+    assert window_plan["num_frames"] == 3
+    assert result["scene_plan"]["windows"] == 2
+    assert result["scene_plan"]["num_frames"] == 6
+    assert result["scene_plan"]["duration"] == 1200
+    assert result["scene_plan"]["estimated_tokens"] == 2 * window_plan["estimated_tokens"]
+    assert result["summary_plan"] == {"input_tokens": 900, "max_tokens": 400}
+
+@patch("app.pipeline.summarize_results")
+@patch("app.pipeline.describe_scenes")
+@patch("app.pipeline.extract_frames_at")
+@patch("app.pipeline.transcribe_samples")
+@patch("app.pipeline.probe_duration", return_value=3 * 3600.0)
+@patch("app.pipeline.iter_audio_windows")
+def test_windowed_pipeline_stays_within_the_scene_budget(mock_windows, mock_probe_duration, mock_transcribe,
+                                                         mock_frames, mock_describe, mock_summarize, tmp_path):
+    from app.config import SCENE_TOKEN_BUDGET, SCENE_LATENCY_BUDGET_SECONDS
+    video_dir = tmp_path / "upload"
+    video_dir.mkdir()
+    (video_dir / "video.mp4").write_bytes(b"video")
+    mock_windows.return_value = iter([(i * 600.0, np.zeros(600 * 16000, dtype=np.float32)) for i in range(18)])
+    mock_transcribe.return_value = {"text": "Words.", "language": "en", "segments": []}
+    mock_frames.side_effect = lambda video, output_dir, timestamps, **kwargs: [
+        {"path": f"{output_dir}/frame_{i}.jpeg", "pts": t} for i, t in enumerate(timestamps)
+    ]
+    mock_describe.side_effect = lambda paths, *args, **kwargs: {
+        "frames": [{"frame_number": i + 1, "frame_path": path, "description": "A slide"} for i, path in enumerate(paths)]
+    }
+    mock_summarize.return_value = {"summary": "A lecture", "tags": []}
+
+    result = run_windowed_pipeline(str(video_dir / "video.mp4"), None, api_key="test_api_key",
+                                   whisper_model="base", frames_per_window=3)
+
+    # 18 windows at 3 full-detail frames each would take about 61k tokens and 104 seconds
+    plan = result["scene_plan"]
+    assert plan["estimated_tokens"] <= SCENE_TOKEN_BUDGET
+    assert plan["estimated_seconds"] <= SCENE_LATENCY_BUDGET_SECONDS
+    # Windows whose share does not pay for a frame leave it to the next one
+    assert 9 <= plan["windows"] < 18
+    assert len(result["scene_descriptions"]["frames"]) == plan["num_frames"]
+    for extract_call, describe_call in zip(mock_frames.call_args_list, mock_describe.call_args_list):
+        assert len(extract_call.args[2]) == describe_call.kwargs["plan"]["num_frames"]
+    frames = result["scene_descriptions"]["frames"]
+    assert frames[0]["pts"] < 1200 and frames[-1]["pts"] > 10200
+
+MEMORY_SCRIPT = """
+import sys
+import numpy as np
+from unittest.mock import patch
+from app.pipeline import run_windowed_pipeline
+from app.search import SearchIndex
+
+decoded = []
+def transcribe(samples, language, whisper_model, timings=None):
+    decoded.append(len(samples))
+    return {"text": "words", "language": "en", "segments": [{"start": 0.0, "end": 1.0, "text": "words"}]}
+
+with patch("app.pipeline.transcribe_samples", transcribe), \\
+        patch("app.pipeline.extract_frames_at", return_value=[]), \\
+        patch("app.pipeline.summarize_results", return_value={"summary": "", "tags": []}), \\
+        patch("app.pipeline.SEARCH_INDEX", SearchIndex(sys.argv[2])):
+    run_windowed_pipeline(sys.argv[1], None, api_key="test_api_key", whisper_model="base", window_seconds=300)
+
+with open("/proc/self/status") as status:
+    peak = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+print(sum(decoded) / 16000, peak)
+"""
+
+def test_windowed_pipeline_memory_is_flat_for_a_3_hour_video(tmp_path):
+    import sys
+    import subprocess
+    # A one-minute clip concatenated by FFmpeg's concat demuxer stands in for hours of video
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc2=duration=60:size=64x48:rate=5",
+         "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=16000:duration=60",
+         "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest",
+         str(tmp_path / "clip.mp4")],
+        check=True
+    )
+
+    def measure(minutes):
+        upload_dir = tmp_path / f"upload_{minutes}"
+        upload_dir.mkdir()
+        (upload_dir / "clip.mp4").symlink_to(tmp_path / "clip.mp4")
+        video_path = upload_dir / "video.ffconcat"
+        video_path.write_text("ffconcat version 1.0\n" + "file clip.mp4\n" * minutes)
+        result = subprocess.run(
+            [sys.executable, "-c", MEMORY_SCRIPT, str(video_path), str(tmp_path / "search.sqlite3")],
+            capture_output=True, text=True, check=True,
+        )
+        seconds, peak_kib = result.stdout.split()[-2:]
+        return float(seconds), int(peak_kib) / 1024
+
+    short_seconds, short_peak = measure(30)
+    long_seconds, long_peak = measure(180)
+
+    assert long_seconds == pytest.approx(3 * 3600, rel=0.01)
+    # Decoding the whole 3 hours at once would take 690 MiB
+    assert long_peak - short_peak < 16
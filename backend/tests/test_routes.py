@@ -0,0 +1,171 @@
+import json
+import pytest
+from flask import Flask
+from unittest.mock import patch
+from app.routes import main
+from app.cache import ResultCache
+
+@pytest.fixture(autouse=True)
+def result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path / ".cache"), max_bytes=1024 * 1024, upload_dir=str(tmp_path))
+    with patch("app.routes.RESULT_CACHE", cache):
+        yield cache
+
+def parse_events(body):
+    events = []
+    for message in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.splitlines() if not line.startswith(":"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+@patch("app.routes.run_summary_pipeline")
+def test_generate_summary_stream_sends_partial_results(mock_pipeline, tmp_path):
+    video_path = tmp_path / "video.mp4"
+    video_path.write_bytes(b"video")
+
+    def pipeline(on_stage, on_event, **params):
+        on_stage("transcription", "running")
+        on_event("transcript_segments", {"segments": [{"start": 0.0, "end": 1.5, "text": "Hello"}]})
+        on_event("scene_batch", {"frames": [{"frame_number": 1, "description": "A desk"}]})
+        on_stage("transcription", "done")
+        return {"transcription": "Hello", "summary": "A greeting", "tags": ["greeting"]}
+
+    mock_pipeline.side_effect = pipeline
+    app = Flask(__name__)
+    app.register_blueprint(main)
+
+    response = app.test_client().post(
+        "/generate_summary/stream", json={"video_path": str(video_path), "style": "casual"}
+    )
+
+    assert response.mimetype == "text/event-stream"
+    events = parse_events(response.get_data(as_text=True))
+    assert [event for event, _ in events] == [
+        "stage", "transcript_segments", "scene_batch", "stage", "summary",
+    ]
+    assert events[1][1]["segments"][0]["text"] == "Hello"
+    assert events[-1][1]["summary"] == "A greeting"
+    assert mock_pipeline.call_args.kwargs["style"] == "casual"
+
+@patch("app.routes.run_summary_pipeline", side_effect=RuntimeError("GPT summarization error: boom"))
+def test_generate_summary_stream_reports_errors(mock_pipeline, tmp_path):
+    video_path = tmp_path / "video.mp4"
+    video_path.write_bytes(b"video")
+    app = Flask(__name__)
+    app.register_blueprint(main)
+
+    response = app.test_client().post("/generate_summary/stream", json={"video_path": str(video_path)})
+
+    assert parse_events(response.get_data(as_text=True)) == [("error", {"error": "GPT summarization error: boom"})]
+
+def test_metrics_endpoint_exposes_stage_metrics(tmp_path):
+    from app.metrics import METRICS, stage_timer
+    METRICS.reset()
+    with stage_timer("transcription"):
+        pass
+    app = Flask(__name__)
+    app.register_blueprint(main)
+
+    with patch("app.routes.RESULT_CACHE", ResultCache(str(tmp_path / "cache"), max_bytes=1024)):
+        response = app.test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'stage_duration_seconds_count{stage="transcription"} 1' in text
+    assert "openai_client_requests" in text
+
+def make_upload(tmp_path):
+    video_dir = tmp_path / "20240101120000_abcd1234"
+    (video_dir / "keyframes").mkdir(parents=True)
+    (video_dir / "audio").mkdir()
+    (video_dir / "20240101120000_abcd1234_clip.mp4").write_bytes(b"0123456789" * 100)
+    (video_dir / "keyframes" / "keyframe_0001.jpeg").write_bytes(b"jpeg")
+    (video_dir / "audio" / "20240101120000_abcd1234_audio.wav").write_bytes(b"RIFF")
+    return video_dir
+
+def test_artifacts_support_ranges_and_conditional_requests(tmp_path):
+    make_upload(tmp_path)
+    app = Flask(__name__)
+    app.register_blueprint(main)
+    client = app.test_client()
+
+    with patch("app.routes.UPLOAD_BASE_DIR", str(tmp_path)):
+        response = client.get("/videos/20240101120000_abcd1234/video")
+        assert response.status_code == 200
+        assert response.mimetype == "video/mp4"
+        assert response.headers["Accept-Ranges"] == "bytes"
+        assert response.cache_control.public and response.cache_control.max_age == 365 * 24 * 3600
+        etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+        response = client.get("/videos/20240101120000_abcd1234/video", headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.data == b"0123456789"
+        assert response.headers["Content-Range"] == "bytes 10-19/1000"
+
+        assert client.get("/videos/20240101120000_abcd1234/video", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get(
+            "/videos/20240101120000_abcd1234/video", headers={"If-Modified-Since": last_modified}
+        ).status_code == 304
+
+        assert client.get("/videos/20240101120000_abcd1234/keyframes/keyframe_0001.jpeg").data == b"jpeg"
+        assert client.get("/videos/20240101120000_abcd1234/audio").data == b"RIFF"
+        # Nothing outside the upload's own artifacts is reachable
+        assert client.get("/videos/20240101120000_abcd1234/keyframes/../20240101120000_abcd1234_clip.mp4").status_code == 404
+        assert client.get("/videos/..%2F20240101120000_abcd1234/video").status_code == 404
+        assert client.get("/videos/unknown/video").status_code == 404
+
+@patch("app.routes.run_summary_pipeline")
+def test_generate_summary_by_video_id_returns_frame_urls(mock_pipeline, tmp_path):
+    video_dir = make_upload(tmp_path)
+    mock_pipeline.return_value = {
+        "summary": "A clip", "tags": [],
+        "scene_descriptions": {"frames": [
+            {"frame_number": 1, "description": "A desk", "frame_path": str(video_dir / "keyframes" / "keyframe_0001.jpeg")},
+        ]},
+    }
+    app = Flask(__name__)
+    app.register_blueprint(main)
+
+    with patch("app.routes.UPLOAD_BASE_DIR", str(tmp_path)):
+        response = app.test_client().post("/generate_summary", json={"video_id": "20240101120000_abcd1234"})
+
+    assert response.status_code == 200
+    assert mock_pipeline.call_args.kwargs["video_path"] == str(video_dir / "20240101120000_abcd1234_clip.mp4")
+    assert mock_pipeline.call_args.kwargs["audio_path"] == str(video_dir / "audio" / "20240101120000_abcd1234_audio.wav")
+    frame = response.get_json()["scene_descriptions"]["frames"][0]
+    assert frame["frame_url"] == "/videos/20240101120000_abcd1234/keyframes/keyframe_0001.jpeg"
+
+@patch("app.routes.run_summary_pipeline")
+def test_content_hash_is_resolved_from_the_upload(mock_pipeline, tmp_path, result_cache):
+    video_dir = make_upload(tmp_path)
+    result_cache.put_artifacts("hash_of_clip", str(video_dir), {"video_path": str(video_dir / "clip.mp4")})
+    mock_pipeline.return_value = {"summary": "A clip", "tags": []}
+    app = Flask(__name__)
+    app.register_blueprint(main)
+
+    with patch("app.routes.UPLOAD_BASE_DIR", str(tmp_path)):
+        app.test_client().post(
+            "/generate_summary", json={"video_id": "20240101120000_abcd1234", "content_hash": "hash_of_another_video"}
+        )
+
+    assert mock_pipeline.call_args.kwargs["content_hash"] == "hash_of_clip"
+
+@patch("app.routes.resummarize")
+def test_resummarize_looks_up_the_upload(mock_resummarize, tmp_path, result_cache):
+    video_dir = make_upload(tmp_path)
+    mock_resummarize.return_value = {"summary": "A clip", "tags": [], "scene_descriptions": {"frames": []}}
+    app = Flask(__name__)
+    app.register_blueprint(main)
+    client = app.test_client()
+
+    with patch("app.routes.UPLOAD_BASE_DIR", str(tmp_path)):
+        assert client.post("/resummarize", json={"content_hash": "hash_of_clip"}).status_code == 400
+        assert client.post("/resummarize", json={"video_id": "20240101120000_abcd1234"}).status_code == 404
+
+        result_cache.put_artifacts("hash_of_clip", str(video_dir), {"video_path": str(video_dir / "clip.mp4")})
+        response = client.post("/resummarize", json={"video_id": "20240101120000_abcd1234", "length": "detailed"})
+
+    assert response.status_code == 200
+    assert mock_resummarize.call_args.args == ("hash_of_clip",)
+    assert mock_resummarize.call_args.kwargs["length"] == "detailed"
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.utils.scene_detect_utils import batch_histograms, batch_scores, select_scene_boundaries, detect_scenes
+from app.utils.video_utils import extract_keyframes
+
+def test_batch_histograms_are_normalized():
+    frames = np.zeros((3, 4, 4), dtype=np.uint8)
+    frames[1] = 255
+    frames[2, :2] = 255
+
+    histograms = batch_histograms(frames, bins=16)
+    assert histograms.shape == (3, 16)
+    np.testing.assert_allclose(histograms.sum(axis=1), 1.0)
+    assert histograms[2, 0] == pytest.approx(0.5)
+
+def test_batch_scores_detect_cut_across_batches():
+    dark = np.zeros((4, 8, 8), dtype=np.uint8)
+    bright = np.full((4, 8, 8), 200, dtype=np.uint8)
+
+    scores, last_frame, last_histogram = batch_scores(dark)
+    assert np.all(scores == 0)
+
+    # The first frame of the next batch is compared with the carried-over last frame
+    scores, _, _ = batch_scores(bright, last_frame, last_histogram)
+    assert scores[0] > 0.5
+    assert np.all(scores[1:] == 0)
+
+def test_select_scene_boundaries_respects_budget_and_spacing():
+    timestamps = np.arange(20) / 2.0
+    scores = np.zeros(20, dtype=np.float32)
+    scores[[4, 5, 12, 16]] = [0.9, 0.8, 0.5, 0.4]
+
+    assert select_scene_boundaries(timestamps, scores, num_frames=10, min_scene_length=1.0) == [0.0, 2.0, 6.0, 8.0]
+    assert select_scene_boundaries(timestamps, scores, num_frames=2) == [0.0, 2.0]
+
+@patch("app.utils.scene_detect_utils.compute_scene_scores")
+def test_detect_scenes_fills_the_budget_without_cuts(mock_compute_scene_scores):
+    # 60 seconds analysed at 4 fps with no change above the threshold, like a testsrc2 clip
+    mock_compute_scene_scores.return_value = (np.arange(240) / 4.0, np.full(240, 0.01, dtype=np.float32))
+
+    scenes = detect_scenes("path/to/video.mp4", num_frames=6)
+    assert [scene["pts"] for scene in scenes] == [5.0, 15.0, 25.0, 35.0, 45.0, 55.0]
+
+    # With one cut, the extra frames go to the longer scene
+    scores = np.full(240, 0.01, dtype=np.float32)
+    scores[40] = 0.9
+    mock_compute_scene_scores.return_value = (np.arange(240) / 4.0, scores)
+    assert [scene["start"] for scene in detect_scenes("path/to/video.mp4", num_frames=6)] == [0.0, 10.0, 20.0, 30.0, 40.0, 50.0]
+
+    # Short clips are not split into scenes shorter than min_scene_length
+    mock_compute_scene_scores.return_value = (np.arange(8) / 4.0, np.zeros(8, dtype=np.float32))
+    assert len(detect_scenes("path/to/video.mp4", num_frames=6, min_scene_length=1.0)) == 2
+
+@patch("app.utils.scene_detect_utils.extract_frames_at")
+@patch("app.utils.scene_detect_utils.detect_scenes")
+def test_extract_keyframes_scene_strategy(mock_detect_scenes, mock_extract_frames_at):
+    mock_detect_scenes.return_value = [{"start": 0.0, "end": 4.0, "pts": 2.0}]
+    mock_extract_frames_at.return_value = [{"path": "output/keyframes/frame_0001.jpeg", "pts": 2.0}]
+
+    result = extract_keyframes("path/to/video.mp4", "output/keyframes", strategy="scene")
+    assert result == ["output/keyframes/frame_0001.jpeg"]
+    mock_extract_frames_at.assert_called_once_with(
+        "path/to/video.mp4", "output/keyframes", [2.0], accurate=True, max_edge=None, jpeg_quality=None
+    )
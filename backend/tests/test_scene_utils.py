@@ -1,27 +1,25 @@
 import pytest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock, AsyncMock, mock_open
+from tenacity import wait_none
 from app.utils.scene_utils import analyze_scenes_with_gpt_vision
 
+def vision_response(content):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
 @patch("app.utils.scene_utils.open", new_callable=mock_open, read_data=b"fake_image_data")
-@patch("app.utils.scene_utils.OpenAI")
+@patch("app.utils.scene_utils.get_async_client")
 def test_analyze_scenes_with_gpt_vision(mock_openai, mock_open_file):
     # Mock OpenAI Client
     mock_client = MagicMock()
     mock_openai.return_value = mock_client
 
     # Mock API Response
-    mock_client.chat.completions.create.return_value = MagicMock(
-        choices=[
-            MagicMock(
-                message=MagicMock(
-                    content='{"frames": [{"frame_number": 1, "description": "Test Scene Description"}]}'
-                )
-            )
-        ]
-    )
+    mock_client.chat.completions.create = AsyncMock(return_value=vision_response(
+        '{"frames": [{"frame_number": 1, "description": "Test Scene Description"}]}'
+    ))
 
     # Simulate Input Frames
-    images = ["frame1.jpg", "frame2.jpg"]
+    images = ["frame1.jpg"]
 
     result = analyze_scenes_with_gpt_vision(images, api_key="test_api_key", language="English")
 
@@ -30,3 +28,94 @@ def test_analyze_scenes_with_gpt_vision(mock_openai, mock_open_file):
     assert result["frames"][0]["description"] == "Test Scene Description"
     
     mock_client.chat.completions.create.assert_called_once()
+
+@patch("app.utils.scene_utils.VISION_RETRY_WAIT", wait_none())
+@patch("app.utils.scene_utils.open", new_callable=mock_open, read_data=b"fake_image_data")
+@patch("app.utils.scene_utils.get_async_client")
+def test_analyze_scenes_in_batches_retries_failed_batch(mock_openai, mock_open_file):
+    mock_client = MagicMock()
+    mock_openai.return_value = mock_client
+
+    def reply(numbers):
+        frames = ", ".join(f'{{"frame_number": {n}, "description": "Scene {n}"}}' for n in numbers)
+        return vision_response(f'{{"frames": [{frames}]}}')
+
+    calls = {"count": 0}
+
+    async def create(**kwargs):
+        labels = [
+            part["text"] for part in kwargs["messages"][1]["content"]
+            if part["type"] == "text" and part["text"].startswith("Frame ")
+        ]
+        numbers = [int(label.split()[1].rstrip(":")) for label in labels]
+        calls["count"] += 1
+        # The batch holding frames 3 and 4 fails once with a truncated reply
+        if numbers == [3, 4] and not calls.get("failed"):
+            calls["failed"] = True
+            return vision_response('{"frames": [{"frame_number": 3, "descr')
+        return reply(numbers)
+
+    mock_client.chat.completions.create = AsyncMock(side_effect=create)
+
+    images = [f"frame{i}.jpg" for i in range(1, 6)]
+    batches = []
+    result = analyze_scenes_with_gpt_vision(
+        images, api_key="test_api_key", batch_size=2, max_concurrency=2, on_batch=batches.append
+    )
+
+    assert [frame["frame_number"] for frame in result["frames"]] == [1, 2, 3, 4, 5]
+    # Every batch is reported once it is described, the retried one only after it succeeded
+    assert sorted(frame["frame_number"] for batch in batches for frame in batch) == [1, 2, 3, 4, 5]
+    assert len(batches) == 3
+    assert [frame["frame_path"] for frame in result["frames"]] == images
+    assert "failed_frames" not in result
+    # Three batches plus a single retry of the failed one
+    assert calls["count"] == 4
+
+@patch("app.utils.scene_utils.VISION_RETRY_WAIT", wait_none())
+@patch("app.utils.scene_utils.open", new_callable=mock_open, read_data=b"fake_image_data")
+@patch("app.utils.scene_utils.get_async_client")
+def test_frames_left_out_of_the_reply_are_retried_then_failed(mock_openai, mock_open_file):
+    mock_client = MagicMock()
+    mock_openai.return_value = mock_client
+    calls = []
+
+    async def create(**kwargs):
+        labels = [
+            part["text"] for part in kwargs["messages"][1]["content"]
+            if part["type"] == "text" and part["text"].startswith("Frame ")
+        ]
+        numbers = [int(label.split()[1].rstrip(":")) for label in labels]
+        calls.append(numbers)
+        # Frame 2 is left out of the first reply only, frame 3 out of every reply
+        described = [n for n in numbers if n != 3 and (n != 2 or calls.count(numbers) > 1)]
+        frames = ", ".join(f'{{"frame_number": {n}, "description": "Scene {n}"}}' for n in described)
+        return vision_response(f'{{"frames": [{frames}]}}')
+
+    mock_client.chat.completions.create = AsyncMock(side_effect=create)
+
+    images = [f"frame{i}.jpg" for i in range(1, 5)]
+    result = analyze_scenes_with_gpt_vision(images, api_key="test_api_key", batch_size=2, max_concurrency=1)
+
+    assert [frame["frame_number"] for frame in result["frames"]] == [1, 2, 4]
+    assert result["failed_frames"] == [3]
+    # One retry for the first batch, every attempt for the second
+    assert sorted(calls) == [[1, 2], [1, 2], [3, 4], [3, 4], [3, 4]]
+
+def test_encode_frame_downscales_large_frames(tmp_path):
+    import io
+    import base64
+    from PIL import Image
+    from app.utils.scene_utils import encode_frame
+
+    image_path = tmp_path / "frame.jpeg"
+    Image.new("RGB", (3840, 2160), color=(200, 30, 30)).save(image_path, format="JPEG", quality=100)
+
+    encoded, bytes_before, bytes_after = encode_frame(str(image_path), max_edge=1024, jpeg_quality=80)
+    assert bytes_before == image_path.stat().st_size
+    assert bytes_after < bytes_before
+    assert Image.open(io.BytesIO(base64.b64decode(encoded))).size == (1024, 576)
+
+    # Frames already within bounds are sent unchanged
+    encoded, bytes_before, bytes_after = encode_frame(str(image_path), max_edge=4096)
+    assert bytes_after == bytes_before
@@ -0,0 +1,70 @@
+import pytest
+from flask import Flask
+from unittest.mock import patch
+from app.routes import main
+from app.search import SearchIndex
+
+TRANSCRIPTION = {
+    "text": "Welcome to the kitchen. Today we bake sourdough bread.",
+    "language": "en",
+    "segments": [
+        {"start": 0.0, "end": 4.0, "text": " Welcome to the kitchen."},
+        {"start": 4.0, "end": 10.0, "text": " Today we bake sourdough bread."},
+    ],
+}
+SCENES = {
+    "frames": [
+        {"frame_number": 1, "frame_path": "/uploads/a/keyframes/keyframe_0001.jpeg", "description": "A chef in an apron",
+         "replaces": [{"frame_number": 2, "frame_path": "/uploads/a/keyframes/keyframe_0002.jpeg"}]},
+    ],
+}
+SUMMARY = {"summary": "A baking tutorial.", "tags": ["baking", "crème brûlée"]}
+
+@pytest.fixture
+def index(tmp_path):
+    return SearchIndex(str(tmp_path / "search" / "index.sqlite3"))
+
+def test_search_ranks_segments_with_timestamp_and_keyframe(index):
+    index.index_video("a", "/uploads/a/video.mp4", "hash_a", TRANSCRIPTION, SCENES, SUMMARY)
+    index.index_video("b", "/uploads/b/video.mp4", "hash_b", {"text": "Bread prices rose.", "language": "en"},
+                      {"frames": []}, {"summary": "Economy news.", "tags": []})
+
+    hits = index.search("sourdough bread")
+    assert len(hits) == 1
+    assert hits[0]["video_id"] == "a"
+    assert hits[0]["start"] == 4.0
+    # Second half of the video maps to the second keyframe
+    assert hits[0]["keyframe"].endswith("keyframe_0002.jpeg")
+    assert "[sourdough]" in hits[0]["snippet"]
+
+    assert {hit["video_id"] for hit in index.search("bread")} == {"a", "b"}
+    assert index.search("bread", video_id="b")[0]["kind"] == "transcript"
+    # Past max_candidates matches only the newest entries are ranked
+    assert [hit["video_id"] for hit in index.search("bread", max_candidates=1)] == ["b"]
+    scene = index.search("apron")[0]
+    assert scene["kind"] == "scene" and scene["start"] == 2.5
+    # Diacritics are folded and FTS5 syntax in the query is matched literally
+    assert index.search("creme")[0]["kind"] == "tags"
+    assert index.search('bread" OR (') == []
+
+def test_reindexing_replaces_entries(index):
+    index.index_video("a", "/uploads/a/video.mp4", "hash_a", TRANSCRIPTION, SCENES, SUMMARY)
+    index.index_video("a", "/uploads/a/video.mp4", "hash_a", TRANSCRIPTION, SCENES,
+                      {"summary": "A pastry lesson.", "tags": []})
+
+    assert index.search("tutorial") == []
+    assert len(index.search("pastry")) == 1
+    assert index.stats() == {"videos": 1, "entries": 4}
+
+def test_search_route(index):
+    index.index_video("a", "/uploads/a/video.mp4", "hash_a", TRANSCRIPTION, SCENES, SUMMARY)
+    app = Flask(__name__)
+    app.register_blueprint(main)
+    client = app.test_client()
+    with patch("app.routes.SEARCH_INDEX", index):
+        response = client.get("/search?q=kitchen&limit=5")
+        missing = client.get("/search")
+
+    assert response.status_code == 200
+    assert response.get_json()["hits"][0]["start"] == 0.0
+    assert missing.status_code == 400
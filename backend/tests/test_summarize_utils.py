@@ -1,8 +1,9 @@
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 from app.utils.summarize_utils import generate_summary_with_gpt
 
-@patch("app.utils.summarize_utils.OpenAI")
+@patch("app.utils.summarize_utils.get_client")
 @patch("app.utils.summarize_utils.call_gpt_with_retries")
 def test_generate_summary_with_gpt(mock_call_gpt_with_retries, mock_openai):
     # Mock OpenAI Client
@@ -34,17 +35,20 @@ def test_generate_summary_with_gpt(mock_call_gpt_with_retries, mock_openai):
     api_key = "test_api_key"
     language = "English"
     
+    token_plan = {}
     summary, tags = generate_summary_with_gpt(
         transcription=transcription,
         scene_descriptions=scene_descriptions,
         length=length,
         style=style,
         api_key=api_key,
-        language=language
+        language=language,
+        token_plan=token_plan
     )
     
     assert summary == "This is a test summary."
     assert tags == ["Tag1", "Tag2", "Tag3"]
+    assert token_plan["max_tokens"] == 400 and token_plan["input_tokens"] > 0
     
     
     mock_call_gpt_with_retries.assert_called_once_with(
@@ -78,5 +82,70 @@ def test_generate_summary_with_gpt(mock_call_gpt_with_retries, mock_openai):
                 "required": ["summary", "tags"],
                 "additionalProperties": False
             }
-        }
+        },
+        # A short concise prompt gets the smallest output limit
+        400,
     )
+
+def test_split_transcript_keeps_time_ranges():
+    from app.utils.summarize_utils import split_transcript
+
+    segments = [{"start": i * 10.0, "end": i * 10.0 + 10.0, "text": f"Sentence number {i}. " * 20} for i in range(6)]
+    with patch("app.utils.summarize_utils.count_tokens", side_effect=lambda text: len(text.split())):
+        chunks = split_transcript("", segments, max_tokens=130)
+
+    # 60 words per segment, so two segments fit in each chunk
+    assert [(chunk["start"], chunk["end"]) for chunk in chunks] == [(0.0, 20.0), (20.0, 40.0), (40.0, 60.0)]
+    assert chunks[0]["text"].startswith("Sentence number 0.")
+
+@patch("app.utils.summarize_utils.get_async_client")
+@patch("app.utils.summarize_utils.get_client")
+@patch("app.utils.summarize_utils.call_gpt_with_retries")
+@patch("app.utils.summarize_utils.chat_completion_async")
+def test_generate_summary_map_reduce_for_long_transcripts(mock_chat_completion_async, mock_call_gpt_with_retries,
+                                                          mock_get_client, mock_get_async_client):
+    import asyncio
+
+    state = {"in_flight": 0, "max_in_flight": 0}
+
+    async def summarize_chunk(client, **kwargs):
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        section = kwargs["messages"][1]["content"].split("### Section ")[1].split("]")[0] + "]"
+        return MagicMock(choices=[MagicMock(message=MagicMock(
+            content=json.dumps({"summary": f"Partial {section}", "tags": ["Topic"]})
+        ))])
+
+    mock_chat_completion_async.side_effect = summarize_chunk
+    mock_call_gpt_with_retries.return_value = MagicMock(choices=[MagicMock(message=MagicMock(
+        content='{"summary": "Final summary.", "tags": ["Topic"]}'
+    ))])
+
+    segments = [{"start": i * 60.0, "end": i * 60.0 + 60.0, "text": "word " * 100} for i in range(8)]
+    transcription = " ".join(segment["text"] for segment in segments)
+
+    with patch("app.utils.summarize_utils.count_tokens", side_effect=lambda text: len(text.split())):
+        summary, tags = generate_summary_with_gpt(
+            transcription=transcription, scene_descriptions={"frames": []}, length="concise", style="formal",
+            api_key="test_api_key", language="English", segments=segments, chunk_tokens=200, max_concurrency=2,
+        )
+
+    assert (summary, tags) == ("Final summary.", ["Topic"])
+    # Four time-aligned chunks, summarized at most two at a time
+    assert mock_chat_completion_async.call_count == 4
+    assert state["max_in_flight"] == 2
+    final_prompt = mock_call_gpt_with_retries.call_args[0][1][1]["content"]
+    assert "### Partial Summaries (in video order):" in final_prompt
+    assert "[06:00 - 08:00] Partial [06:00 - 08:00]" in final_prompt
+    assert "### Transcription:" not in final_prompt
+
+@patch("app.utils.summarize_utils.get_client")
+@patch("app.utils.summarize_utils.call_gpt_with_retries", side_effect=ValueError("context length exceeded"))
+def test_generate_summary_surfaces_errors(mock_call_gpt_with_retries, mock_get_client):
+    with pytest.raises(RuntimeError, match="context length exceeded"):
+        generate_summary_with_gpt(
+            transcription="Short.", scene_descriptions={"frames": []}, length="concise", style="formal",
+            api_key="test_api_key", language="English",
+        )
@@ -0,0 +1,94 @@
+import sys
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+from app.utils import transcription_backends
+from app.utils.transcription_backends import get_transcription_backend
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    transcription_backends._backends.clear()
+    yield
+    transcription_backends._backends.clear()
+
+@patch("app.utils.transcription_backends.get_whisper_model")
+def test_whisper_backend_normalizes_output(mock_get_whisper_model):
+    mock_get_whisper_model.return_value.transcribe.return_value = {
+        "text": " Hello world",
+        "language": "en",
+        "segments": [{"id": 0, "start": 0.0, "end": 1.5, "text": " Hello world", "tokens": [1, 2]}],
+    }
+
+    backend = get_transcription_backend("whisper", "base", "cpu", "fp32")
+    result = backend.transcribe(np.zeros(16000, dtype=np.float32))
+
+    assert result == {
+        "text": "Hello world",
+        "language": "en",
+        "segments": [{"start": 0.0, "end": 1.5, "text": "Hello world"}],
+    }
+    assert get_transcription_backend("whisper", "base", "cpu", "fp32") is backend
+
+@patch("app.utils.transcription_backends.get_whisper_model")
+def test_whisper_backend_serializes_concurrent_calls(mock_get_whisper_model):
+    import time
+    import threading
+    active, overlaps = [], []
+
+    def transcribe(samples, **kwargs):
+        active.append(1)
+        overlaps.append(len(active))
+        time.sleep(0.05)
+        active.pop()
+        return {"text": "", "language": "en", "segments": []}
+
+    mock_get_whisper_model.return_value.transcribe.side_effect = transcribe
+    backend = get_transcription_backend("whisper", "base", "cpu", "fp32")
+
+    threads = [threading.Thread(target=backend.transcribe, args=(np.zeros(16000, dtype=np.float32),)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The shared PyTorch model is never decoding two inputs at once
+    assert overlaps == [1, 1, 1]
+
+def test_faster_whisper_backend_loads_int8_and_matches_interface():
+    # Stand-in module, so the test does not need faster-whisper or its model files
+    faster_whisper = MagicMock()
+    mock_whisper_model = faster_whisper.WhisperModel
+    mock_whisper_model.return_value.transcribe.return_value = (
+        iter([
+            MagicMock(start=0.0, end=1.0, text=" Hola"),
+            MagicMock(start=1.0, end=2.5, text=" mundo"),
+        ]),
+        MagicMock(language="es"),
+    )
+
+    with patch.dict(sys.modules, {"faster_whisper": faster_whisper}):
+        backend = get_transcription_backend("faster-whisper", "base", "cpu", "int8")
+    result = backend.transcribe(np.zeros(16000, dtype=np.float32))
+
+    assert mock_whisper_model.call_args.kwargs["compute_type"] == "int8"
+    assert result["text"] == "Hola mundo"
+    assert result["language"] == "es"
+    assert result["segments"][1] == {"start": 1.0, "end": 2.5, "text": "mundo"}
+
+def test_faster_whisper_backend_takes_language_names():
+    faster_whisper = MagicMock()
+    mock_model = faster_whisper.WhisperModel.return_value
+    mock_model.transcribe.return_value = (iter([]), MagicMock(language="es"))
+
+    with patch.dict(sys.modules, {"faster_whisper": faster_whisper}):
+        backend = get_transcription_backend("faster-whisper", "base", "cpu", "int8")
+    backend.transcribe(np.zeros(16000, dtype=np.float32), language="spanish")
+
+    # faster-whisper rejects names, so the frontend's "spanish" reaches it as "es"
+    assert mock_model.transcribe.call_args.kwargs["language"] == "es"
+
+def test_unknown_engine_or_precision_is_rejected():
+    with pytest.raises(ValueError):
+        get_transcription_backend("vosk")
+    with pytest.raises(ValueError):
+        get_transcription_backend("faster-whisper", precision="int4")
@@ -1,21 +1,100 @@
 import pytest
+import numpy as np
 from app.utils.transcription_utils import transcribe_audio
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
 # Mock Whisper Model
-@patch("app.utils.transcription_utils.WHISPER_MODEL.transcribe")
-def test_transcribe_audio(mock_transcribe):
+@patch("app.utils.transcription_utils.decode_audio")
+@patch("app.utils.transcription_utils.get_transcription_backend")
+def test_transcribe_audio(mock_get_backend, mock_decode_audio):
     # Mock Response
+    mock_transcribe = mock_get_backend.return_value.transcribe
     mock_transcribe.return_value = {"text": "Hello World", "language": "English"}
     
     result = transcribe_audio("path/to/audio/file.wav")
     assert result["text"] == "Hello World"
     assert result["language"] == "English"
 
-@patch("app.utils.transcription_utils.WHISPER_MODEL.transcribe")
-def test_transcribe_audio_with_language(mock_transcribe):
+@patch("app.utils.transcription_utils.decode_audio")
+@patch("app.utils.transcription_utils.get_transcription_backend")
+def test_transcribe_audio_with_language(mock_get_backend, mock_decode_audio):
+    mock_transcribe = mock_get_backend.return_value.transcribe
     mock_transcribe.return_value = {"text": "Hola Mundo", "language": "Spanish"}
     
     result = transcribe_audio("path/to/audio/file.wav", language="Spanish")
     assert result["text"] == "Hola Mundo"
     assert result["language"] == "Spanish"
+
+@patch("app.utils.transcription_utils.decode_audio")
+@patch("app.utils.transcription_utils.get_transcription_backend")
+def test_transcribe_audio_accepts_samples(mock_get_backend, mock_decode_audio):
+    mock_transcribe = mock_get_backend.return_value.transcribe
+    mock_transcribe.return_value = {"text": "Hello World", "language": "English"}
+    samples = np.zeros(16000, dtype=np.float32)
+
+    transcribe_audio(samples)
+
+    # Decoded samples go straight to Whisper without another FFmpeg pass
+    mock_decode_audio.assert_not_called()
+    assert mock_transcribe.call_args[0][0] is samples
+
+@patch("app.utils.transcription_utils._detect_language", return_value="es")
+@patch("app.utils.transcription_utils.get_transcription_backend")
+def test_transcribe_chunked_stitches_segments(mock_get_backend, mock_detect_language):
+    from app.utils.transcription_utils import transcribe_chunked
+
+    mock_transcribe = mock_get_backend.return_value.transcribe
+    rate = 16000
+    t = np.arange(30 * rate, dtype=np.float32) / rate
+    speech = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    samples = np.concatenate([speech, np.zeros(2 * rate, dtype=np.float32), speech])
+
+    mock_transcribe.side_effect = [
+        {"text": "Hola", "language": "es", "segments": [{"start": 0.0, "end": 2.0, "text": "Hola"}]},
+        {"text": "Mundo", "language": "es", "segments": [{"start": 1.0, "end": 3.0, "text": "Mundo"}]},
+    ]
+
+    streamed = []
+    result = transcribe_chunked(samples, workers=1, chunk_seconds=40, on_segments=streamed.append)
+
+    assert result["text"] == "Hola Mundo"
+    assert result["language"] == "es"
+    # Language is detected once and reused for every chunk
+    mock_detect_language.assert_called_once()
+    assert [call.args[1] for call in mock_transcribe.call_args_list] == ["es", "es"]
+    # Segment times of the second chunk are shifted by where that chunk starts (inside the pause)
+    assert result["segments"][0]["start"] == 0.0
+    assert 31.0 <= result["segments"][1]["start"] <= 33.0
+    assert result["segments"][1]["end"] - result["segments"][1]["start"] == pytest.approx(2.0)
+    # Each chunk's segments are reported as soon as it is transcribed, already shifted
+    assert streamed == [result["segments"][:1], result["segments"][1:]]
+
+@patch("app.utils.transcription_utils.MAX_TRANSCRIPTION_POOLS", 2)
+@patch("app.utils.transcription_utils.ProcessPoolExecutor")
+def test_transcription_pools_of_other_models_stay_open(mock_executor):
+    from collections import OrderedDict
+    from app.utils.transcription_utils import transcription_pool
+
+    mock_executor.side_effect = lambda **kwargs: MagicMock(name=kwargs["initargs"][1][1])
+    specs = [("whisper", name, None, "fp32") for name in ("base", "small", "medium")]
+    with patch("app.utils.transcription_utils._pools", OrderedDict()) as pools:
+        with transcription_pool(2, specs[0]) as base_pool, transcription_pool(2, specs[1]) as small_pool:
+            # A third model over the cap does not shut down the pools still in use
+            with transcription_pool(2, specs[2]) as medium_pool:
+                assert len(pools) == 3
+            # It is shut down itself once idle, as the only pool past the cap that can be
+            medium_pool.shutdown.assert_called_once()
+            base_pool.shutdown.assert_not_called()
+            small_pool.shutdown.assert_not_called()
+
+            # The same model reuses its pool, which becomes the most recently used
+            with transcription_pool(2, specs[0]) as pool:
+                assert pool is base_pool
+        assert list(pools) == [(2, specs[1]), (2, specs[0])]
+
+        with transcription_pool(2, specs[2]):
+            pass
+        # The least recently used idle pool makes room
+        small_pool.shutdown.assert_called_once()
+        base_pool.shutdown.assert_not_called()
+        assert list(pools) == [(2, specs[0]), (2, specs[2])]
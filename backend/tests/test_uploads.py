@@ -0,0 +1,61 @@
+import io
+import hashlib
+import pytest
+from flask import Flask
+from unittest.mock import patch
+from app.uploads import ChunkedUploadStore, UploadOffsetError
+
+def test_chunked_upload_resumes_and_hashes_incrementally(tmp_path):
+    data = bytes(range(256)) * 40
+    store = ChunkedUploadStore(str(tmp_path / "partial"), ttl_seconds=3600)
+    upload_id = store.create("video.mp4", len(data))
+
+    assert store.write_chunk(upload_id, 0, io.BytesIO(data[:4000]), chunk_size=1024)["offset"] == 4000
+    # A retried chunk that the backend already has is refused with the offset to resume from
+    with pytest.raises(UploadOffsetError) as error:
+        store.write_chunk(upload_id, 0, io.BytesIO(data[:4000]))
+    assert error.value.offset == 4000
+    with pytest.raises(UploadOffsetError):
+        store.complete(upload_id, str(tmp_path / "video.mp4"))
+
+    # A new process has no running hash and rebuilds it from the bytes on disk
+    restarted = ChunkedUploadStore(str(tmp_path / "partial"), ttl_seconds=3600)
+    assert restarted.get(upload_id)["offset"] == 4000
+    with pytest.raises(ValueError):
+        restarted.write_chunk(upload_id, 4000, io.BytesIO(data[4000:] + b"extra"))
+    restarted.write_chunk(upload_id, 4000, io.BytesIO(data[4000:]))
+
+    content_hash, size = restarted.complete(upload_id, str(tmp_path / "video.mp4"))
+    assert content_hash == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    assert (tmp_path / "video.mp4").read_bytes() == data
+    assert restarted.get(upload_id) is None
+
+def test_upload_routes_accept_chunks_by_offset(tmp_path):
+    from app.routes import main
+    store = ChunkedUploadStore(str(tmp_path / "partial"), ttl_seconds=3600)
+    app = Flask(__name__)
+    app.register_blueprint(main)
+    client = app.test_client()
+    data = b"v" * 3000
+
+    with patch("app.routes.UPLOAD_STORE", store), patch("app.routes.UPLOAD_BASE_DIR", str(tmp_path)), \
+            patch("app.routes._process_upload", return_value=({"cached": False}, 200)) as mock_process:
+        response = client.post("/uploads", json={"filename": "clip.mp4", "size": len(data)})
+        assert response.status_code == 201
+        upload_id = response.get_json()["upload_id"]
+
+        assert client.put(f"/uploads/{upload_id}", data=data[:1000], headers={"Upload-Offset": "0"}).status_code == 200
+        conflict = client.put(f"/uploads/{upload_id}", data=data[:1000], headers={"Upload-Offset": "0"})
+        assert conflict.status_code == 409
+        assert conflict.get_json()["offset"] == 1000
+        assert client.get(f"/uploads/{upload_id}").get_json()["offset"] == 1000
+        assert client.post(f"/uploads/{upload_id}/complete").status_code == 409
+
+        client.put(f"/uploads/{upload_id}", data=data[1000:], headers={"Upload-Offset": "1000"})
+        assert client.post(f"/uploads/{upload_id}/complete").status_code == 200
+
+    unique_id, video_path, content_hash, write_audio, _ = mock_process.call_args.args
+    assert video_path.endswith("_clip.mp4")
+    assert content_hash == hashlib.sha256(data).hexdigest()
+    assert open(video_path, "rb").read() == data
@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+from app.utils.vad_utils import frame_energies, split_on_silence, find_pause
+
+SAMPLE_RATE = 16000
+
+def tone(seconds, amplitude=0.3, frequency=220):
+    t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+def silence(seconds):
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 1e-4).astype(np.float32)
+
+def test_frame_energies_in_dbfs():
+    samples = np.concatenate([tone(1.0, amplitude=1.0), np.zeros(SAMPLE_RATE, dtype=np.float32)])
+    energies, frame_length = frame_energies(samples, SAMPLE_RATE)
+
+    assert frame_length == 480
+    # A full-scale sine has an RMS of 1/sqrt(2), i.e. about -3 dBFS
+    assert energies[:30].mean() == pytest.approx(-3.0, abs=0.1)
+    assert energies[-30:].max() < -100
+
+def test_split_on_silence_cuts_in_pauses():
+    samples = np.concatenate([tone(50), silence(2), tone(40), silence(1), tone(20)])
+    chunks = split_on_silence(samples, SAMPLE_RATE, chunk_seconds=60)
+
+    assert len(chunks) == 3
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(samples)
+    # Each cut lands inside a pause, not in the middle of the tone
+    assert 50 <= chunks[1][0] / SAMPLE_RATE <= 52
+    assert 92 <= chunks[2][0] / SAMPLE_RATE <= 93
+    assert all(end - start <= 60 * SAMPLE_RATE for start, end in chunks)
+
+def test_split_on_silence_drops_chunks_without_speech():
+    samples = np.concatenate([tone(10), silence(50), tone(10)])
+    chunks = split_on_silence(samples, SAMPLE_RATE, chunk_seconds=20)
+
+    # The silent middle is not sent to the model: every kept chunk overlaps one of the tones
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(samples)
+    assert sum(end - start for start, end in chunks) < 45 * SAMPLE_RATE
+    for start, end in chunks:
+        assert start < 10 * SAMPLE_RATE or end > 60 * SAMPLE_RATE
+
+def test_find_pause_searches_the_end_of_the_audio():
+    samples = np.concatenate([tone(10), silence(1), tone(20), silence(1), tone(8)])
+    cut = find_pause(samples, SAMPLE_RATE, search_seconds=10)
+
+    # The pause at 10 s is outside the searched end, the one at 31 s is found
+    assert 31 <= cut / SAMPLE_RATE <= 32
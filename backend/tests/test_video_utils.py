@@ -1,5 +1,8 @@
+import os
 import pytest
-from app.utils.video_utils import extract_audio, extract_keyframes
+from app.utils.video_utils import (
+    extract_audio, extract_keyframes, extract_media, probe_duration, probe_keyframe_times, sample_keyframes_by_seek,
+)
 from unittest.mock import patch, MagicMock
 
 @patch("subprocess.run")
@@ -25,3 +28,142 @@ def test_extract_keyframes(mock_listdir, mock_run):
     result = extract_keyframes("path/to/video.mp4", "output/keyframes")
     assert result == ["output/keyframes/frame_0001.jpeg", "output/keyframes/frame_0002.jpeg"]
     mock_run.assert_called_once()
+
+@patch("subprocess.run")
+@patch("os.listdir")
+def test_extract_media_single_invocation(mock_listdir, mock_run, tmp_path):
+    mock_run.return_value = MagicMock()
+    mock_listdir.return_value = ["frame_0001.jpeg", "frame_0002.jpeg"]
+    keyframes_dir = str(tmp_path / "keyframes")
+
+    audio_path, keyframes = extract_media("path/to/video.mp4", "output/audio.wav", keyframes_dir)
+    assert audio_path == "output/audio.wav"
+    assert keyframes == [f"{keyframes_dir}/frame_0001.jpeg", f"{keyframes_dir}/frame_0002.jpeg"]
+
+    # Audio and keyframes come out of one FFmpeg process
+    mock_run.assert_called_once()
+    command = mock_run.call_args[0][0]
+    assert command.count("-i") == 1
+    assert "output/audio.wav" in command
+
+@patch("subprocess.run")
+@patch("os.listdir")
+def test_extract_media_without_audio_file(mock_listdir, mock_run, tmp_path):
+    mock_run.return_value = MagicMock()
+    mock_listdir.return_value = ["frame_0001.jpeg"]
+
+    audio_path, keyframes = extract_media("path/to/video.mp4", None, str(tmp_path / "keyframes"))
+    assert audio_path is None
+    assert len(keyframes) == 1
+
+    # Only the keyframe output is written; the audio stream is not mapped
+    command = mock_run.call_args[0][0]
+    assert command.count("-map") == 1
+    assert command[command.index("-map") + 1] == "0:v:0"
+
+def test_decode_audio_pipes_float_samples(tmp_path):
+    import subprocess
+    import numpy as np
+    from app.utils.video_utils import decode_audio
+
+    audio_path = str(tmp_path / "tone.wav")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100:duration=2", audio_path],
+        check=True
+    )
+
+    samples = decode_audio(audio_path)
+    assert samples.dtype == np.float32
+    assert len(samples) == pytest.approx(2 * 16000, abs=160)
+    assert 0.05 < np.abs(samples).max() <= 1.0
+
+def test_iter_audio_windows_ends_windows_in_pauses(tmp_path):
+    import subprocess
+    import numpy as np
+    from app.utils.video_utils import iter_audio_windows
+
+    # 3 s tone bursts separated by 1 s pauses
+    audio_path = str(tmp_path / "bursts.wav")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi",
+         "-i", "aevalsrc='0.3*sin(2*PI*440*t)*lt(mod(t,4),3)':s=16000:d=30", audio_path],
+        check=True
+    )
+
+    windows = list(iter_audio_windows(audio_path, window_seconds=10))
+    assert len(windows) == 4
+    assert sum(len(samples) for _, samples in windows) == pytest.approx(30 * 16000, abs=160)
+    for (start, samples), (next_start, _) in zip(windows, windows[1:]):
+        assert len(samples) <= 10 * 16000
+        assert next_start == pytest.approx(start + len(samples) / 16000)
+        assert next_start % 4 >= 3
+
+    # Stopping early does not leave FFmpeg blocked on the pipe
+    first = next(iter_audio_windows(audio_path, window_seconds=10))
+    assert first[0] == 0.0
+
+@patch("subprocess.run")
+def test_probe_keyframe_times(mock_run):
+    mock_run.return_value = MagicMock(stdout="0.000000,K__\n0.040000,___\n10.000000,K__\nN/A,K__\n")
+
+    assert probe_keyframe_times("path/to/video.mp4") == [0.0, 10.0]
+
+@patch("subprocess.run")
+def test_probe_duration_falls_back_to_ffmpeg(mock_run):
+    # No FFprobe installed: the duration is read from FFmpeg's description of the input
+    mock_run.side_effect = [
+        FileNotFoundError("ffprobe"),
+        MagicMock(stderr="Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'video.mp4':\n  Duration: 01:02:03.50, start: 0.000000\n"),
+    ]
+
+    assert probe_duration("path/to/video.mp4") == 3723.5
+    assert mock_run.call_args[0][0][0] == "ffmpeg"
+
+@patch("subprocess.run")
+def test_probe_keyframe_times_falls_back_to_ffmpeg(mock_run):
+    mock_run.side_effect = [
+        FileNotFoundError("ffprobe"),
+        MagicMock(stderr="[Parsed_showinfo_0 @ 0x1] n:   0 pts:      0 pts_time:0       duration_time:0.04\n"
+                         "[Parsed_showinfo_0 @ 0x1] n:   1 pts: 256000 pts_time:2.5     duration_time:0.04\n"),
+    ]
+
+    assert probe_keyframe_times("path/to/video.mp4") == [0.0, 2.5]
+    assert "nokey" in mock_run.call_args[0][0]
+
+@patch("os.path.exists", return_value=True)
+@patch("app.utils.video_utils.probe_keyframe_times", return_value=[float(t) for t in range(0, 100, 10)])
+@patch("app.utils.video_utils.probe_duration", return_value=100.0)
+@patch("subprocess.run")
+def test_sample_keyframes_by_seek(mock_run, mock_probe_duration, mock_probe_keyframe_times, mock_exists, tmp_path):
+    mock_run.return_value = MagicMock()
+    output_dir = str(tmp_path / "keyframes")
+
+    frames = sample_keyframes_by_seek("path/to/video.mp4", output_dir, num_frames=4)
+    # Targets are snapped to the keyframes that are actually decoded
+    assert [frame["pts"] for frame in frames] == [10.0, 40.0, 60.0, 90.0]
+    assert frames[0]["path"] == f"{output_dir}/video.mp4_frame_0001.jpeg"
+
+    # A single FFmpeg process seeks once per sampled frame
+    mock_run.assert_called_once()
+    command = mock_run.call_args[0][0]
+    assert command.count("-ss") == 4
+    assert command.count("nokey") == 4
+
+def test_sample_keyframes_by_seek_returns_every_requested_frame(tmp_path):
+    import subprocess
+    video_path = str(tmp_path / "clip.mp4")
+    # 20 seconds with a keyframe every 2 seconds
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc2=duration=20:size=160x120:rate=25",
+         "-g", "50", "-pix_fmt", "yuv420p", video_path],
+        check=True
+    )
+
+    frames = sample_keyframes_by_seek(video_path, str(tmp_path / "ten"), num_frames=10)
+    assert [frame["pts"] for frame in frames] == [float(t) for t in range(0, 20, 2)]
+
+    # More frames than keyframes: the targets left over are decoded exactly
+    frames = sample_keyframes_by_seek(video_path, str(tmp_path / "twelve"), num_frames=12)
+    assert len(frames) == 12
+    assert len({frame["pts"] for frame in frames}) == 12
+    assert all(os.path.exists(frame["path"]) for frame in frames)
@@ -7,6 +7,10 @@ from streamlit_tags import st_tags
 
 load_dotenv()
 BACKEND_URL = os.getenv("BACKEND_URL")
+# Backend address as seen by the browser (e.g. http://localhost:5000 or a CDN); when set, videos and
+# keyframes are loaded by the browser straight from the backend and can be cached there
+PUBLIC_BACKEND_URL = os.getenv("PUBLIC_BACKEND_URL")
+UPLOAD_MAX_RETRIES = 5
 
 st.set_page_config(page_title="Video Analyzer", layout="wide")
 
@@ -19,6 +23,106 @@ def reset_session_state():
     st.session_state["summary"] = None
     st.session_state["tags"] = []
     st.session_state["uploaded_file_id"] = None
+    st.session_state["video_id"] = None
+    st.session_state["processed_language"] = None
+    st.session_state["video_url"] = None
+
+def store_results(result):
+    st.session_state["transcription"] = result.get("transcription")
+    st.session_state["scene_descriptions"] = result.get("scene_descriptions", {}).get("frames", [])
+    st.session_state["summary"] = result.get("summary")
+    st.session_state["tags"] = result.get("tags")
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def fetch_artifact(url):
+    """Download an artifact from the backend; artifact URLs never change content, so they are cached."""
+    response = requests.get(f"{BACKEND_URL}{url}", timeout=60)
+    response.raise_for_status()
+    return response.content
+
+def artifact_source(url):
+    """
+    Source for st.image/st.video from an artifact URL returned by the backend: the public URL when the
+    browser can reach the backend, otherwise the bytes fetched over HTTP by this server.
+    """
+    if not url:
+        return None
+    if PUBLIC_BACKEND_URL:
+        return f"{PUBLIC_BACKEND_URL}{url}"
+    return fetch_artifact(url)
+
+def show_frame(frame, **kwargs):
+    source = artifact_source(frame.get("frame_url"))
+    if source is not None:
+        st.image(source, **kwargs)
+
+def upload_in_chunks(uploaded_file, progress_bar):
+    """
+    Send a file through the resumable upload API one chunk at a time, resuming from the last
+    offset the backend confirmed when a chunk fails.
+    Returns the response of the completion request.
+    """
+    init_response = requests.post(
+        f"{BACKEND_URL}/uploads", json={"filename": uploaded_file.name, "size": uploaded_file.size}
+    )
+    if init_response.status_code != 201:
+        return init_response
+    upload_id = init_response.json()["upload_id"]
+    chunk_size = init_response.json()["chunk_size"]
+
+    offset, failures = 0, 0
+    while offset < uploaded_file.size:
+        uploaded_file.seek(offset)
+        chunk = uploaded_file.read(chunk_size)
+        try:
+            chunk_response = requests.put(
+                f"{BACKEND_URL}/uploads/{upload_id}", data=chunk, headers={"Upload-Offset": str(offset)}, timeout=300
+            )
+        except requests.RequestException:
+            if failures >= UPLOAD_MAX_RETRIES:
+                raise
+            chunk_response = None
+        if chunk_response is not None and chunk_response.status_code == 200:
+            offset = chunk_response.json()["offset"]
+            failures = 0
+        else:
+            failures += 1
+            if chunk_response is not None and failures > UPLOAD_MAX_RETRIES:
+                return chunk_response
+            # Ask the backend how far it got and continue from there
+            try:
+                offset = requests.get(f"{BACKEND_URL}/uploads/{upload_id}", timeout=30).json()["offset"]
+            except (requests.RequestException, KeyError, ValueError):
+                pass
+        progress_bar.progress(offset / uploaded_file.size)
+
+    return requests.post(f"{BACKEND_URL}/uploads/{upload_id}/complete", json={})
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+def render_progress(placeholder, progress):
+    # Only plain elements here: the placeholder is redrawn on every event, and widgets would clash
+    with placeholder.container():
+        st.subheader("Progress")
+        st.caption(" · ".join(f"{stage}: {status}" for stage, status in progress["stages"].items()))
+        if progress["transcript"]:
+            st.markdown("**Transcript so far**")
+            st.write(" ".join(progress["transcript"]))
+        for number in sorted(progress["frames"]):
+            frame = progress["frames"][number]
+            show_frame(frame, caption=f"Frame {number}", width=240)
+            st.write(frame.get("description"))
 
 left_column, right_column = st.columns(2)
 
@@ -40,49 +144,100 @@ with left_column:
         summary_style = st.selectbox("Summary Style", ["Formal", "Casual", "Technical"], key="style")
         
     if st.button("Generate Summary"):
+        language_param = None if language == "Video's default" else language.lower()
+        file_id = uploaded_file.name + str(uploaded_file.size) if uploaded_file is not None else None
+
         if uploaded_file is None:
             st.error("Please upload a video file first.")
+        elif (
+            st.session_state.get("video_id")
+            and st.session_state.get("uploaded_file_id") == file_id
+            and st.session_state.get("processed_language") == language_param
+        ):
+            # Same video and language: only the summary depends on length and style, so reuse the
+            # stored transcription and scenes instead of uploading and processing the video again
+            with st.spinner("Regenerating summary..."):
+                summary_response = requests.post(
+                    f"{BACKEND_URL}/resummarize",
+                    json={
+                        "video_id": st.session_state["video_id"],
+                        "length": summary_length.lower(),
+                        "style": summary_style.lower(),
+                        "language": language_param,
+                    }
+                )
+
+            if summary_response.status_code == 200:
+                store_results(summary_response.json())
+            else:
+                st.error(f"Error: {summary_response.json().get('error')}")
         else:
             reset_session_state()
 
             # Set a unique ID for the uploaded file
-            st.session_state["uploaded_file_id"] = uploaded_file.name + str(uploaded_file.size)
+            st.session_state["uploaded_file_id"] = file_id
 
             with st.spinner("Uploading and processing..."):
-                files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                upload_response = requests.post(f"{BACKEND_URL}/upload", files=files)
+                upload_progress = st.progress(0.0)
+                upload_response = upload_in_chunks(uploaded_file, upload_progress)
+                upload_progress.empty()
             
             if upload_response.status_code == 200:
-                st.success("Video uploaded and audio extracted successfully!")
+                st.success("Video uploaded successfully!")
                 
-                audio_path = upload_response.json().get("audio_path")
-                video_path = upload_response.json().get("video_path")
+                video_id = upload_response.json().get("video_id")
+                st.session_state["video_url"] = upload_response.json().get("video_url")
                 
+                # Partial results are streamed and drawn as they arrive, then replaced by the final results
+                live = right_column.empty()
+                progress = {"stages": {}, "transcript": [], "frames": {}}
+                result, error = None, None
                 with st.spinner("Generating summary..."):
-                    summary_response = requests.post(
-                        f"{BACKEND_URL}/generate_summary",
+                    with requests.post(
+                        f"{BACKEND_URL}/generate_summary/stream",
                         json={
-                            "audio_path": audio_path,
-                            "video_path": video_path,
+                            "video_id": video_id,
                             "length": summary_length.lower(),
                             "style": summary_style.lower(),
-                            "language": None if language == "Video's default" else language.lower(),
-                        }
-                    )
-                
-                if summary_response.status_code == 200:
-                    result = summary_response.json()
-                    st.session_state["transcription"] = result.get("transcription")
-                    st.session_state["scene_descriptions"] = result.get("scene_descriptions", {}).get("frames", [])
-                    st.session_state["summary"] = result.get("summary")
-                    st.session_state["tags"] = result.get("tags")
+                            "language": language_param,
+                        },
+                        stream=True,
+                    ) as summary_response:
+                        if summary_response.status_code != 200:
+                            error = summary_response.json().get("error")
+                        else:
+                            for event, data in iter_sse(summary_response):
+                                if event == "summary":
+                                    result = data
+                                    continue
+                                if event == "error":
+                                    error = data["error"]
+                                    continue
+                                if event == "stage":
+                                    progress["stages"][data["stage"]] = data["status"]
+                                elif event == "transcript_segments":
+                                    progress["transcript"] += [segment["text"] for segment in data["segments"]]
+                                elif event == "transcription" and not progress["transcript"]:
+                                    progress["transcript"] = [data["text"]]
+                                elif event == "scene_batch":
+                                    progress["frames"].update({frame["frame_number"]: frame for frame in data["frames"]})
+                                render_progress(live, progress)
+                live.empty()
+
+                if result is not None:
+                    store_results(result)
+                    st.session_state["video_id"] = video_id
+                    st.session_state["processed_language"] = language_param
                 else:
-                    st.error(f"Error: {summary_response.json().get('error')}")
+                    st.error(f"Error: {error or 'The summary stream ended before a result was sent'}")
             else:
                 st.error(f"Error: {upload_response.json().get('error')}")
 
     if uploaded_file is not None:
-        st.video(uploaded_file)
+        # Once uploaded, the browser streams the video from the backend with range requests
+        uploaded_here = st.session_state.get("uploaded_file_id") == uploaded_file.name + str(uploaded_file.size)
+        video_url = st.session_state.get("video_url") if uploaded_here else None
+        st.video(artifact_source(video_url) if PUBLIC_BACKEND_URL and video_url else uploaded_file)
 
 with right_column:
     st.header("Results")
@@ -118,7 +273,7 @@ with right_column:
         st.subheader("Scene Descriptions")
         with st.expander("View Scene Descriptions"):
             for frame in st.session_state["scene_descriptions"]:
-                st.image(frame.get("frame_path"), caption=f"Frame {frame.get('frame_number')}")
+                show_frame(frame, caption=f"Frame {frame.get('frame_number')}")
                 st.write(frame.get("description"))
                 
     if "transcription" in st.session_state: